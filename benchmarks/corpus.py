@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# `corpus.py` - Synthetic JavaScript and CSS for the benchmarks.
+#
+# Every corpus is made by repeating one generated unit until the wanted size
+# is reached, so the same name and size always give the same text.
+#
+#     python benchmarks/corpus.py js nested 1M > nested.js
+
+import sys
+
+
+def color_heavy_rule(i):
+	return (".c%d { color: rgb(%d, %d, %d); background-color: #%.2x%.2x%.2x;"
+		" border: 1px solid #AABBCC; }\n") % (i, i % 256, i * 7 % 256, i * 13 % 256,
+		i % 16 * 17, i % 256, i % 16 * 17)
+
+
+def comment_heavy_rule(i):
+	return ("/* rule %d\n * generated */\n.k%d { margin: 0px 0px 0px 0px; /* spacing */"
+		" padding: 0.5em; }\n") % (i, i)
+
+
+def nested_rule(i):
+	# at-rules a few levels deep around long descendant selectors
+	return ("@media screen and (min-width: %dpx) {\n"
+		"\t@supports (display: grid) {\n"
+		"\t\t@media (orientation: landscape) {\n"
+		"\t\t\thtml body div.n%d > ul li + li a:hover span, .n%d :first-child { margin: 0 0 0 0; }\n"
+		"\t\t}\n"
+		"\t}\n"
+		"}\n") % (i % 1200, i, i)
+
+
+def color_heavy_js(i):
+	return ("var palette%d = { fg: \"#AABBCC\", bg: 'rgb(%d, %d, %d)', border: \"#%.2x%.2x%.2x\" };\n"
+		"palette%d.shade = palette%d.fg.replace(/#(\\w)\\w/g, '#$1') + \"; color: #fff\";\n") % (
+		i, i % 256, i * 7 % 256, i * 13 % 256, i % 256, i * 3 % 256, i * 5 % 256, i, i)
+
+
+def comment_heavy_js(i):
+	return ("/**\n * Adds two numbers, generated function %d.\n */\n"
+		"function add%d(a, b) { // the sum\n"
+		"    /* no checks */\n"
+		"    return a + b; // done\n"
+		"}\n") % (i, i)
+
+
+def nested_js(i, depth=12):
+	# functions, conditions and loops nested depth levels deep
+	lines = ["function nested%d(x) {" % i]
+	for level in range(1, depth + 1):
+		indent = "    " * level
+		if level % 3 == 1:
+			lines.append("%sif (x > %d) {" % (indent, level))
+		elif level % 3 == 2:
+			lines.append("%sfor (var i%d = 0; i%d < x; i%d += 1) {" % (indent, level, level, level))
+		else:
+			lines.append("%sx = (function (y) {" % indent)
+	lines.append("%sx += %d;" % ("    " * (depth + 1), i))
+	for level in range(depth, 0, -1):
+		indent = "    " * level
+		if level % 3 == 0:
+			lines.append("%sreturn y - 1;\n%s}(x));" % ("    " * (level + 1), indent))
+		else:
+			lines.append("%s}" % indent)
+	lines.append("    return x;\n}\n")
+	return '\n'.join(lines)
+
+
+CORPORA = {
+	'css': {
+		'color': color_heavy_rule,
+		'comment': comment_heavy_rule,
+		'nested': nested_rule,
+	},
+	'js': {
+		'color': color_heavy_js,
+		'comment': comment_heavy_js,
+		'nested': nested_js,
+	},
+}
+
+
+def make_text(unit, size):
+	"""unit(0), unit(1), ... joined until the text is at least size bytes."""
+
+	parts = []
+	length = 0
+	i = 0
+	while length < size:
+		text = unit(i)
+		parts.append(text)
+		length += len(text)
+		i += 1
+	return ''.join(parts)
+
+
+def make_corpus(lang, name, size):
+	return make_text(CORPORA[lang][name], size)
+
+
+def parse_size(text):
+	units = { 'K': 1024, 'M': 1024 * 1024 }
+	text = text.strip().upper()
+	if text[-1:] in units:
+		return int(float(text[:-1]) * units[text[-1]])
+	return int(text)
+
+
+if __name__ == '__main__':
+	if len(sys.argv) != 4 or sys.argv[1] not in CORPORA or sys.argv[2] not in CORPORA[sys.argv[1]]:
+		print >> sys.stderr, "usage: corpus.py {js|css} {color|comment|nested} SIZE"
+		sys.exit(2)
+	sys.stdout.write(make_corpus(sys.argv[1], sys.argv[2], parse_size(sys.argv[3])))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# `cssmin_scaling.py` - Check that CSSMin.minify runs in linear time.
+#
+# Minifies generated color heavy and comment heavy stylesheets from 10 KB up
+# to 50 MB and prints the time per KB for each size.  The script exits with a
+# non-zero status when the time per KB of the largest size is more than
+# `--tolerance` times that of the smallest size measured.
+#
+#     python benchmarks/cssmin_scaling.py [--sizes 10K,1M]
+
+import optparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'clientside'))
+from cssmin import CSSMin
+from corpus import color_heavy_rule, comment_heavy_rule, make_text, parse_size
+
+
+CORPORA = [
+	('color', color_heavy_rule),
+	('comment', comment_heavy_rule),
+]
+
+
+def time_minify(cssmin, css):
+	"""Best of a few runs for small inputs, a single run for large ones."""
+	
+	best = None
+	spent = 0.0
+	runs = 0
+	while runs < 1 or (spent < 1.0 and runs < 5):
+		start = time.time()
+		cssmin.minify(css)
+		elapsed = time.time() - start
+		spent += elapsed
+		runs += 1
+		if best is None or elapsed < best:
+			best = elapsed
+	return best
+
+
+def main():
+	p = optparse.OptionParser(
+		usage="%prog [options]",
+		description="Times CSSMin.minify on generated stylesheets of growing size.")
+	p.add_option('-s', '--sizes', default='10K,100K,1M,10M,50M',
+		help="Comma separated input sizes (default: %default).")
+	p.add_option('-t', '--tolerance', type='float', default=2.0,
+		help="Allowed growth of the time per KB (default: %default).")
+	options, args = p.parse_args()
+	
+	sizes = [parse_size(s) for s in options.sizes.split(',')]
+	cssmin = CSSMin()
+	failed = False
+	
+	for name, rule in CORPORA:
+		per_kb = []
+		for size in sizes:
+			css = make_text(rule, size)
+			elapsed = time_minify(cssmin, css)
+			per_kb.append(elapsed * 1024 / len(css))
+			print "%-8s %12d bytes %10.3f s %10.2f us/KB" % (name, len(css), elapsed, per_kb[-1] * 1e6)
+		
+		growth = per_kb[-1] / per_kb[0]
+		print "%-8s time per KB grew %.2fx from %d to %d bytes" % (name, growth, sizes[0], sizes[-1])
+		if growth > options.tolerance:
+			print "%-8s NOT LINEAR (tolerance %.2fx)" % (name, options.tolerance)
+			failed = True
+	
+	sys.exit(failed and 1 or 0)
+
+
+if __name__ == '__main__':
+	main()
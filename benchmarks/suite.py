@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# `suite.py` - Throughput, latency and memory of the minify, format and lint
+# entry points.
+#
+# Each entry point is run on the generated corpora of `corpus.py` at every
+# size, each case in a fresh Python process so its peak memory is its own.
+# Small inputs are run `--repeat` times and large ones as often as fit in
+# `--budget` seconds, at least once.  Results are printed as a table and
+# written as JSON with `--output`; with `--baseline` every case is compared
+# against an earlier results file and the script exits with a non-zero
+# status when one got slower or bigger by more than `--threshold`.
+#
+#     python benchmarks/suite.py --sizes 1K,1M --output new.json
+#     python benchmarks/suite.py --baseline old.json --threshold 0.2
+#     python benchmarks/suite.py --entries beautify,beautify-python --sizes 1K,100K
+#
+# The beautify entries and the node backed lint entries are only run when
+# named.  beautify is JS-Beautify in node and beautify-python the in-process
+# port, whatever format_js_engine would pick.  The peak memory of the node
+# backed entries (beautify, jslint, csslint) is that of the node process.
+
+import hashlib
+import json
+import optparse
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'clientside'))
+from corpus import CORPORA, make_corpus, parse_size
+
+# entry point: the language of its corpora
+ENTRIES = {
+	'jsmin': 'js',
+	'cssmin': 'css',
+	'cssformat': 'css',
+	'beautify': 'js',
+	'beautify-python': 'js',
+	'jslint': 'js',
+	'csslint': 'css',
+}
+DEFAULT_ENTRIES = 'jsmin,cssmin,cssformat'
+
+# differences smaller than these are noise, whatever the threshold
+TIME_SLACK = 0.002 # seconds
+MEMORY_SLACK = 1024 # kilobytes
+
+
+def make_entry(name, timeout):
+	"""The function to time for entry point name, and the node worker it uses."""
+
+	from tools import DEFAULT_SETTINGS, node_limits
+
+	if name == 'jsmin':
+		from jsmin import jsmin
+		return jsmin, None
+	if name in ('cssmin', 'cssformat'):
+		from cssmin import CSSMin
+		if name == 'cssformat':
+			return CSSMin().format, None
+		return CSSMin().minify, None
+	if name == 'beautify-python':
+		from jsbeautifier import js_beautify
+		from tools import beautify_options
+		options = beautify_options(DEFAULT_SETTINGS)
+		return lambda code: js_beautify(code, options), None
+
+	from nodeworker import NodeWorker
+	from tools import format_js, lint_js, lint_css, lint_options
+
+	# node's beautify, not the engine 'auto' would choose for the size
+	settings = dict(DEFAULT_SETTINGS, format_js_engine='node')
+	if timeout is not None:
+		settings['node_timeout'] = timeout
+	worker = NodeWorker(settings['nodejs'], *node_limits(settings))
+	if name == 'beautify':
+		return lambda code: format_js(code, settings, worker), worker
+	if name == 'jslint':
+		return lambda code: lint_js(code, worker, lint_options('js', settings)), worker
+	return lambda code: lint_css(code, worker, lint_options('css', settings)), worker
+
+
+def _kilobytes(key, pid='self'):
+	# a field like VmHWM from /proc, None where it is not available
+	try:
+		f = open('/proc/%s/status' % pid)
+		try:
+			for line in f:
+				if line.startswith(key + ':'):
+					return int(line.split()[1])
+		finally:
+			f.close()
+	except (IOError, OSError, ValueError):
+		pass
+	return None
+
+
+def percentile(values, p):
+	"""The nearest rank p-th percentile of the sorted list values."""
+
+	rank = max(int(round(p / 100.0 * len(values) + 0.5)) - 1, 0)
+	return values[min(rank, len(values) - 1)]
+
+
+def run_case(entry, path, repeat, budget, timeout):
+	"""Time entry on the file at path, in this process.  Returns a result dict."""
+
+	f = open(path, 'rb')
+	try:
+		code = f.read()
+	finally:
+		f.close()
+
+	func, worker = make_entry(entry, timeout)
+	result = { 'size': len(code), 'sha1': hashlib.sha1(code).hexdigest(), 'error': None }
+
+	try:
+		# the first node request starts node, which is not what is measured
+		if worker is not None:
+			func(code[:0])
+
+		# memory held before the first run, the input and the modules
+		base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+		times = []
+		spent = 0.0
+		while not times or (len(times) < repeat and spent < budget):
+			start = time.time()
+			func(code)
+			elapsed = time.time() - start
+			times.append(elapsed)
+			spent += elapsed
+	except Exception, err:
+		result['error'] = "%s: %s" % (err.__class__.__name__, err)
+		return result
+	finally:
+		if worker is not None:
+			node_peak = worker.is_running() and _kilobytes('VmHWM', worker._proc.pid)
+			worker.stop()
+
+	times.sort()
+	median = percentile(times, 50)
+	result.update({
+		'runs': len(times),
+		'seconds': {
+			'min': times[0],
+			'p50': median,
+			'p90': percentile(times, 90),
+			'p99': percentile(times, 99),
+			'max': times[-1],
+		},
+		'throughput': median and len(code) / median / (1024 * 1024) or None,
+	})
+
+	# ru_maxrss is in kilobytes on Linux and bytes on OS X
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if sys.platform == 'darwin':
+		peak, base = peak / 1024, base / 1024
+	if worker is not None:
+		result['peak_memory'] = node_peak or None
+	else:
+		result['peak_memory'] = max(peak - base, 0)
+	return result
+
+
+def case_name(entry, corpus, size):
+	return "%s/%s/%d" % (entry, corpus, size)
+
+
+def run_child(entry, path, options):
+	"""run_case in a new interpreter, so every case starts from a fresh peak."""
+
+	args = [sys.executable, os.path.abspath(__file__), '--case', entry, path,
+		'--repeat', str(options.repeat), '--budget', str(options.budget)]
+	if options.timeout is not None:
+		args += ['--timeout', str(options.timeout)]
+
+	proc = subprocess.Popen(args, stdout=subprocess.PIPE)
+	out = proc.communicate()[0]
+	if proc.returncode != 0:
+		return { 'error': "Benchmark process exited with status %d" % proc.returncode }
+	return json.loads(out)
+
+
+def compare(results, baseline, threshold):
+	"""
+	The cases in results that are slower, by their median, or use more
+	memory than the same case in baseline by more than threshold (0.2 for
+	20%), as a list of messages.
+	"""
+
+	old_cases = dict((case['name'], case) for case in baseline['cases'])
+	regressions = []
+	for case in results['cases']:
+		old = old_cases.get(case['name'])
+		if old is None or old.get('error') or case.get('error'):
+			continue
+
+		old_time, new_time = old['seconds']['p50'], case['seconds']['p50']
+		if new_time > old_time * (1 + threshold) and new_time - old_time > TIME_SLACK:
+			regressions.append("%s: median %.4f s, was %.4f s (+%.0f%%)" % (
+				case['name'], new_time, old_time, (new_time / old_time - 1) * 100))
+
+		old_memory, new_memory = old.get('peak_memory'), case.get('peak_memory')
+		if old_memory and new_memory and new_memory > old_memory * (1 + threshold) and new_memory - old_memory > MEMORY_SLACK:
+			regressions.append("%s: peak memory %d KB, was %d KB (+%.0f%%)" % (
+				case['name'], new_memory, old_memory, (float(new_memory) / old_memory - 1) * 100))
+	return regressions
+
+
+def main():
+	p = optparse.OptionParser(
+		usage="%prog [options]",
+		description="Benchmarks the minify, format and lint entry points on generated corpora.")
+	p.add_option('-e', '--entries', default=DEFAULT_ENTRIES,
+		help="Comma separated entry points, of %s (default: %%default)." % ', '.join(sorted(ENTRIES)))
+	p.add_option('-c', '--corpora', default='color,comment,nested',
+		help="Comma separated corpora (default: %default).")
+	p.add_option('-s', '--sizes', default='1K,100K,1M,10M,50M',
+		help="Comma separated input sizes (default: %default).")
+	p.add_option('-r', '--repeat', type='int', default=20,
+		help="Most runs of one case (default: %default).")
+	p.add_option('--budget', type='float', default=2.0,
+		help="Seconds to spend on more runs of one case (default: %default).")
+	p.add_option('--timeout', type='float', default=None,
+		help="Seconds a node request may run, overrides the plugin default.")
+	p.add_option('-o', '--output', default=None,
+		help="Write the results as JSON to this file.")
+	p.add_option('-b', '--baseline', default=None,
+		help="Compare the results with this earlier JSON results file.")
+	p.add_option('-t', '--threshold', type='float', default=0.2,
+		help="Allowed slowdown or memory growth against the baseline (default: %default).")
+	p.add_option('--case', nargs=2, default=None, metavar='ENTRY PATH',
+		help=optparse.SUPPRESS_HELP)
+	options, args = p.parse_args()
+
+	if options.case:
+		entry, path = options.case
+		json.dump(run_case(entry, path, options.repeat, options.budget, options.timeout), sys.stdout)
+		return
+
+	entries = options.entries.split(',')
+	for entry in entries:
+		if entry not in ENTRIES:
+			p.error("unknown entry point: %s" % entry)
+	corpora = options.corpora.split(',')
+	for corpus in corpora:
+		if corpus not in CORPORA['js']:
+			p.error("unknown corpus: %s" % corpus)
+	sizes = [parse_size(s) for s in options.sizes.split(',')]
+
+	results = {
+		'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+		'python': platform.python_version(),
+		'platform': platform.platform(),
+		'cases': [],
+	}
+
+	print "%-36s %10s %6s %10s %10s %10s %10s %10s" % (
+		'case', 'bytes', 'runs', 'p50 s', 'p90 s', 'p99 s', 'MB/s', 'peak KB')
+
+	corpus_dir = tempfile.mkdtemp(prefix='clientside-bench-')
+	try:
+		for corpus in corpora:
+			for size in sizes:
+				paths = {}
+				for entry in entries:
+					lang = ENTRIES[entry]
+					if lang not in paths:
+						# written once and shared by the entries for the language
+						paths[lang] = os.path.join(corpus_dir, "%s-%d.%s" % (corpus, size, lang))
+						f = open(paths[lang], 'wb')
+						try:
+							f.write(make_corpus(lang, corpus, size))
+						finally:
+							f.close()
+
+					case = run_child(entry, paths[lang], options)
+					case.update({ 'name': case_name(entry, corpus, size), 'entry': entry, 'corpus': corpus })
+					results['cases'].append(case)
+
+					if case.get('error'):
+						print "%-36s error: %s" % (case['name'], case['error'])
+						continue
+					print "%-36s %10d %6d %10.4f %10.4f %10.4f %10.2f %10s" % (case['name'], case['size'],
+						case['runs'], case['seconds']['p50'], case['seconds']['p90'], case['seconds']['p99'],
+						case['throughput'] or 0, case['peak_memory'] is None and '-' or case['peak_memory'])
+					sys.stdout.flush()
+
+				for path in paths.values():
+					os.remove(path)
+	finally:
+		shutil.rmtree(corpus_dir, True)
+
+	if options.output:
+		f = open(options.output, 'w')
+		try:
+			json.dump(results, f, indent=1, sort_keys=True)
+		finally:
+			f.close()
+
+	if options.baseline:
+		f = open(options.baseline)
+		try:
+			baseline = json.load(f)
+		finally:
+			f.close()
+
+		regressions = compare(results, baseline, options.threshold)
+		for message in regressions:
+			print "REGRESSION %s" % message
+		if regressions:
+			sys.exit(1)
+		print "no regressions against %s (threshold %.0f%%)" % (options.baseline, options.threshold * 100)
+
+
+if __name__ == '__main__':
+	main()
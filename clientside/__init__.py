@@ -15,16 +15,35 @@
 # You should have received a copy of the GNU General Public License
 # along with Gedit Clientside Plugin. If not, see <http://www.gnu.org/licenses/>.
 
-from StringIO import StringIO
-from jsmin import JavascriptMinify
-from cssmin import CSSMin
+from nodeworker import NodeWorkerPool, NodeWorkerCancelled, NodeWorkerLimitError
+from nodeworker import PRIORITY_ACTIVE, PRIORITY_BACKGROUND
+from tools import CONFIG_STORE, DEFAULT_SETTINGS, read_settings, write_settings, node_limits
+from tools import minify_js, minify_css, format_js, format_css, lint_js, lint_css
+from tools import minify_js_profile, minify_css_profile, mangle_report, optimize_report
+from tools import BatchMinify, dedupe_batch, dedupe_report, join_batch, beautify_options, lint_options, shift_issues
+from tools import min_path, build, build_options, build_report, is_up_to_date
+from resultcache import ResultCache, CACHE_NAME
+from background import BackgroundRunner, batched
+from pgzip import compress_file
+from textdiff import diff_spans
+from blocks import block_around
+from jsmangle import mangle, MANGLE_VERSION
+from cssopt import optimize
 
-from gi.repository import GObject, Gtk, Gdk, Gedit, PeasGtk
+from gi.repository import GObject, GLib, Gtk, Gdk, Gedit, PeasGtk
 import os
-import re
-import gzip
-import subprocess
-import pickle
+import sys
+from array import array
+
+# changes to the issues pane bigger than this are made with the model detached
+BULK_ROWS = 200
+
+# node runs on background threads that hand results back to the main loop
+GObject.threads_init()
+
+# characters put into the document per idle call when a result replaces it,
+# so gedit keeps painting while a large result goes in
+INSERT_CHUNK = 64 * 1024
 
 ui_str = """
 <ui>
@@ -43,7 +62,10 @@ ui_str = """
 					<menuitem name="ClientsideCSSLint" action="ClientsideCSSLint"/>
 					<separator />
 					<menuitem name="ClientsideGzip" action="ClientsideGzip"/>
+					<menuitem name="ClientsideBuild" action="ClientsideBuild"/>
 					<separator />
+					<menuitem name="ClientsideMinifyTimings" action="ClientsideMinifyTimings"/>
+					<menuitem name="ClientsideClearCache" action="ClientsideClearCache"/>
 					<menuitem name="ClientsideConfig" action="ClientsideConfig"/>
 				</menu>
 			</placeholder>
@@ -58,25 +80,54 @@ class ClientsideWindowHelper:
 		self._plugin = plugin
 		self.tab = None
 		self.pane = None
+		self.treeview = None
+		self._clear_issues()
 		
 		atom = Gdk.atom_intern('CLIPBOARD', True)
 		self.clipboard = Gtk.Clipboard.get(atom)
 		
 		self.plugin_dir = os.path.split(__file__)[0]
-		self.config_store = os.path.join(self.plugin_dir, "defaults.pkl")
-		self.config_fields = { 'nodejs': None, 'braces_on_own_line': None, 'replace_contents': None }
-		
-		self._settings = {
-			'replace_contents': 2, # 0=clipboard, 1=replace, 2=ask what to do
-			'nodejs': 'node',
-			'indent_size': '1',
-			'indent_char': '\t',
-			'braces_on_own_line': 'false',
-			'preserve_newlines': 'true',
-			'keep_array_indentation': 'true',
-			'space_after_anon_function': 'true',
-			'decompress': 'true',
-		}
+		self.config_store = CONFIG_STORE
+		self.config_fields = { 'nodejs': None, 'braces_on_own_line': None, 'replace_contents': None, 'lint_as_you_type': None, 'profile_minify': None, 'scope_to_block': None, 'mangle_js': None, 'optimize_css': None }
+		
+		self._settings = dict(DEFAULT_SETTINGS)
+		
+		# lint as you type has its own place in the node pool, so a newer run
+		# can cut the one in node short without touching menu requests
+		self._lint_owner = (self, 'lint')
+		self._lint_runner = BackgroundRunner(GObject.idle_add, self._cancel_lint_request)
+		self._lint_doc = None
+		self._lint_handler = None
+		self._lint_timeout = None
+		self._lint_version = 0
+		
+		# the document the issues in the pane are from, scoped lints only
+		# replace the issues of their own lines
+		self._issues_doc = None
+		
+		# lint and format from the menu, a new request cuts the running one short
+		self._tool_runner = BackgroundRunner(GObject.idle_add, self._cancel_node_request)
+		self._spinner = None
+		
+		# gzip runs on its own thread so a large file doesn't hold up node requests
+		self._gzip_runner = BackgroundRunner(GObject.idle_add)
+		
+		# batch minify runs cli.py in a process of its own, a thread passes on
+		# each file as it is done
+		self._batch_runner = BackgroundRunner(GObject.idle_add)
+		self._batch = None
+		
+		# PassStats of the last profiled minify, see on_minify_timings_activate
+		self._minify_stats = None
+		
+		# what mangling the last minified js saved, see get_minified_js_str
+		self._mangle_report = None
+		
+		# what optimizing the last minified css saved, see get_minified_css_str
+		self._optimize_report = None
+		
+		# a result going into the document a chunk at a time, see replace_document_text
+		self._replace_job = None
 		
 		self._insert_menu()
 		
@@ -84,6 +135,19 @@ class ClientsideWindowHelper:
 
 	def deactivate(self):
 		self._remove_menu()
+		self._unwatch_document()
+		self._tool_runner.cancel()
+		self._gzip_runner.cancel()
+		if self._batch is not None:
+			self.batch_minify_cancelled(self._batch['dialog'], None, self._batch)
+		self._node_worker().close()
+		self._node_worker(self._lint_owner).close()
+		self._finish_replace()
+		self._hide_busy()
+		
+		if self._spinner:
+			self._window.get_statusbar().remove(self._spinner)
+			self._spinner = None
 		
 		#remove bottom tab if it exists
 		if self.pane:
@@ -111,6 +175,9 @@ class ClientsideWindowHelper:
 			("ClientsideCSSBatchMinify", None, _("Batch Minify CSS"), None, _("Batch Minify CSS"), self.on_batch_minifier_css_activate),
 			("ClientsideCSSLint", None, _("CSSLint"), "<ALT><Shift>U", _("CSSLint"), self.on_lint_css_activate),
 			("ClientsideGzip", None, _("Gzip Current File"), "<Ctrl><Alt>U", _("Gzip Current File"), self.on_minifier_gzip_activate),
+			("ClientsideBuild", None, _("Minify and Compress Current File"), None, _("Write .min and .min.gz files next to the current file"), self.on_build_activate),
+			("ClientsideMinifyTimings", None, _("Last Minify Timings"), None, _("Show how long each pass of the last minify took"), self.on_minify_timings_activate),
+			("ClientsideClearCache", None, _("Clear Cache"), None, _("Clear cached minify, format and lint results"), self.on_clear_cache_activate),
 			("ClientsideConfig", None, _("Configure Plugin"),None, _("Configure Plugin"),self.open_config_window),
 		])
 		
@@ -128,10 +195,11 @@ class ClientsideWindowHelper:
 		self._action_group.set_sensitive(self._window.get_active_document() != None)
 		if self.pane:
 			if self.tab != self._window.get_active_tab():
-				self.lines = []
-				self.errorlines.clear()
 				self._window.get_bottom_panel().remove_item(self.pane)
 				self.pane = None
+				self.treeview = None
+		
+		self._watch_active_document()
 		return
 	
 	#================================================================================
@@ -139,15 +207,159 @@ class ClientsideWindowHelper:
 	#================================================================================
 	
 	# -------------------------------------------------------------------------------
-	def _get_cmd_output(self,cmd):
+	# the shared node workers as this window (or owner) uses them, the focused
+	# window's requests go ahead of the others'
+	def _node_worker(self, owner=None):
+		priority = PRIORITY_BACKGROUND
+		if self._window.is_active():
+			priority = PRIORITY_ACTIVE
+		
+		if owner is None:
+			owner = self
+		
+		return self._plugin.get_node_worker(owner, priority, self._settings['nodejs'], int(self._settings['node_workers']),
+			int(self._settings['node_idle_timeout']), *node_limits(self._settings))
+	
+	# -------------------------------------------------------------------------------
+	def _result_cache(self):
+		return self._plugin.get_result_cache(self._settings['cache_size'])
+	
+	# -------------------------------------------------------------------------------
+	# compression level and threads for pgzip
+	def _gzip_options(self):
+		return int(self._settings['gzip_level']), int(self._settings['gzip_threads']) or None
+	
+	# -------------------------------------------------------------------------------
+	# the level, threads, options and cache arguments of tools.build
+	def _build_options(self):
+		return self._gzip_options() + (build_options(self._settings), self._result_cache())
+	
+	# -------------------------------------------------------------------------------
+	def _cancel_node_request(self):
+		self._node_worker().cancel()
+	
+	# -------------------------------------------------------------------------------
+	def _cancel_lint_request(self):
+		self._node_worker(self._lint_owner).cancel()
+	
+	# -------------------------------------------------------------------------------
+	# a job for a lint thread, lint_type is 'js' or 'css'.  Issues are reported
+	# in batches while the linter runs, the job returns the full list.
+	def _lint_job(self, lint_type, doctxt, owner=None):
+		cache = self._result_cache()
+		worker = self._node_worker(owner)
+		options = lint_options(lint_type, self._settings)
+		op = 'lint_' + lint_type
+		
+		lint = lint_css
+		if lint_type == 'js':
+			lint = lint_js
+		
+		def job(report=None):
+			on_issue = None
+			if report is not None:
+				on_issue = batched(report)
+			return cache.run(op, doctxt, options, lambda: lint(doctxt, worker, options, on_issue))
+		
+		return job
+	
+	# -------------------------------------------------------------------------------
+	# hand a lint job to a runner, issues show in the bottom pane as they are found.
+	# A lint of part of the document, see _action_text, reports when it is done.
+	# owner is whose requests the job's node request goes with, see _node_worker.
+	def _submit_lint(self, runner, doc, lint_type, doctxt, done, version=None, scope=None, owner=None):
+		if scope is not None:
+			runner.submit(self._lint_job(lint_type, doctxt, owner), lambda elist, err: done(doc, elist, err, scope))
+			return
 		
-		p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE)
-		#result = p.stdout.read()
-		#p.stdout.close()
-		result = p.communicate()[0]
-		p.wait()
+		run = { 'streamed': False }
 		
-		return result
+		runner.submit(self._lint_job(lint_type, doctxt, owner),
+			lambda elist, err: done(doc, elist, err),
+			lambda issues: self.on_lint_progress(doc, run, issues, version))
+	
+	# -------------------------------------------------------------------------------
+	# a job for a format thread, the gedit preferences are read here on the main loop
+	def _format_js_job(self, js):
+		self._import_gedit_preferences()
+		
+		settings = dict(self._settings)
+		cache = self._result_cache()
+		worker = self._node_worker()
+		
+		return lambda: cache.run('format_js', js, beautify_options(settings), lambda: format_js(js, settings, worker))
+	
+	# -------------------------------------------------------------------------------
+	# the text an action works on: the selection, else with scope_to_block the
+	# top-level block or rule around the cursor, else the whole document.
+	# Returns (text, scope), scope is None for the whole document and otherwise
+	# says where the text came from.
+	def _action_text(self, doc, lang):
+		start, end = doc.get_start_iter(), doc.get_end_iter()
+		
+		if doc.get_has_selection():
+			start, end = doc.get_selection_bounds()
+		elif self._settings['scope_to_block'] == 'true':
+			doctxt = doc.get_text(start, end, True).decode('utf-8')
+			cursor = doc.get_iter_at_mark(doc.get_insert()).get_offset()
+			block = block_around(doctxt, cursor, lang)
+			if block is not None:
+				start, end = doc.get_iter_at_offset(block[0]), doc.get_iter_at_offset(block[1])
+		
+		# the indent in front goes along so the formatter keeps it
+		line_start = start.copy()
+		line_start.set_line_offset(0)
+		if not doc.get_text(line_start, start, True).strip():
+			start = line_start
+		
+		text = doc.get_text(start, end, True)
+		if start.is_start() and end.is_end():
+			return text, None
+		
+		return text, { 'start': start.get_offset(), 'end': end.get_offset(), 'line': start.get_line(),
+			'char': start.get_line_offset(), 'text': text }
+	
+	# -------------------------------------------------------------------------------
+	# the issues in the pane for doc with those on the lines of scope swapped for
+	# issues, the rest of the document isn't linted again
+	def _splice_issues(self, doc, issues, scope):
+		if doc != self._issues_doc:
+			return issues
+		
+		first = scope['line'] + 1
+		last = first + scope['text'].count('\n')
+		kept = []
+		for i in range(len(self.issue_texts)):
+			line, char, text = self._issue_row(i)
+			if not first <= line <= last:
+				kept.append({ 'line': line, 'char': char, 'text': text })
+		
+		# issues of the whole file, with no line, stay at the bottom
+		return sorted(kept + issues, key=lambda e: e['line'] > 0 and e['line'] or sys.maxint)
+	
+	# -------------------------------------------------------------------------------
+	# spinner and message in the statusbar while node works
+	def _show_busy(self, message):
+		statusbar = self._window.get_statusbar()
+		context_id = statusbar.get_context_id("ClientsidePlugin")
+		
+		if not self._spinner:
+			self._spinner = Gtk.Spinner()
+			statusbar.pack_end(self._spinner, False, False, 0)
+		
+		statusbar.remove_all(context_id)
+		statusbar.push(context_id, message)
+		self._spinner.show()
+		self._spinner.start()
+	
+	# -------------------------------------------------------------------------------
+	def _hide_busy(self):
+		statusbar = self._window.get_statusbar()
+		statusbar.remove_all(statusbar.get_context_id("ClientsidePlugin"))
+		
+		if self._spinner:
+			self._spinner.stop()
+			self._spinner.hide()
 	
 	
 	# -------------------------------------------------------------------------------
@@ -178,7 +390,7 @@ class ClientsideWindowHelper:
 	
 	# -------------------------------------------------------------------------------
 	def row_clicked(self, treeview, path, view_column, doc):
-		lineno, charno = self.lines[path.get_indices()[0]]
+		lineno = self.issue_lines[path.get_indices()[0]] - 1
 		view = self._window.get_active_view()
 		
 		doc.goto_line(lineno)
@@ -187,19 +399,78 @@ class ClientsideWindowHelper:
 		
 	
 	# -------------------------------------------------------------------------------
+	# the line and char of every row in the pane, in arrays rather than a list
+	# of lists so tens of thousands of issues stay small
+	def _clear_issues(self):
+		self.issue_lines = array('i')
+		self.issue_chars = array('i')
+		self.issue_texts = []
+	
+	# -------------------------------------------------------------------------------
+	def _issue_row(self, i):
+		return (self.issue_lines[i], self.issue_chars[i], self.issue_texts[i])
+	
+	# -------------------------------------------------------------------------------
+	# rows start to end of the pane become rows
+	def _replace_issues(self, start, end, rows):
+		bulk = (end - start) + len(rows) > BULK_ROWS
+		
+		# a detached model doesn't make the view update on every row
+		if bulk:
+			self.treeview.set_model(None)
+		
+		if bulk and start == 0 and end == len(self.issue_texts):
+			self.errorlines = Gtk.ListStore(int,int,str)
+			for row in rows:
+				self.errorlines.append(row)
+		else:
+			if end > start:
+				it = self.errorlines.iter_nth_child(None, start)
+				for i in range(end - start):
+					self.errorlines.remove(it)
+			for i, row in enumerate(rows):
+				self.errorlines.insert_with_valuesv(start + i, [0, 1, 2], list(row))
+		
+		if bulk:
+			self.treeview.set_model(self.errorlines)
+		
+		self.issue_lines[start:end] = array('i', [row[0] for row in rows])
+		self.issue_chars[start:end] = array('i', [row[1] for row in rows])
+		self.issue_texts[start:end] = [row[2] for row in rows]
+	
+	# -------------------------------------------------------------------------------
+	# show errorlist in the pane, only the rows that differ from the last run change
 	def populate_bottom_tab(self, errorlist=[]):
-		self.errorlines.clear()
-		self.lines = []
 		
-		# errorlist = [ [line_num, char_position, "error text"],... ] 
-		for e in errorlist:
-			self.errorlines.append([int(e['line']), int(e['char']), e['text']])
-			self.lines.append([int(e['line']-1), int(e['char']-1)])
+		# errorlist = [ {'line': line_num, 'char': char_position, 'text': "error text"},... ] 
+		rows = [(int(e['line']), int(e['char']), e['text']) for e in errorlist]
+		
+		start = 0
+		end_old = len(self.issue_texts)
+		end_new = len(rows)
+		
+		while start < end_old and start < end_new and rows[start] == self._issue_row(start):
+			start += 1
+		
+		while end_old > start and end_new > start and rows[end_new - 1] == self._issue_row(end_old - 1):
+			end_old -= 1
+			end_new -= 1
+		
+		if start < end_old or start < end_new:
+			self._replace_issues(start, end_old, rows[start:end_new])
         
 		self._window.get_bottom_panel().set_property("visible", True)
 		self._window.get_bottom_panel().activate_item(self.pane)
 	
 	
+	# -------------------------------------------------------------------------------
+	def append_bottom_tab(self, errorlist):
+		rows = [(int(e['line']), int(e['char']), e['text']) for e in errorlist]
+		end = len(self.issue_texts)
+		
+		self._replace_issues(end, end, rows)
+	
+	
 	# -------------------------------------------------------------------------------
 	def create_bottom_tab(self):
 		doc = self._window.get_active_document()
@@ -208,17 +479,27 @@ class ClientsideWindowHelper:
 			return
 		
 		if not self.pane:
+			self._clear_issues()
 			self.errorlines = Gtk.ListStore(int,int,str)
 			self.pane = Gtk.ScrolledWindow()
 			treeview = Gtk.TreeView(model=self.errorlines)
+			self.treeview = treeview
 			
 			lineno = Gtk.TreeViewColumn('Line', Gtk.CellRendererText(), text=0)
 			charno = Gtk.TreeViewColumn('Char', Gtk.CellRendererText(), text=1)
 			message = Gtk.TreeViewColumn('Message', Gtk.CellRendererText(), text=2)
 			
+			# fixed sizes let the view skip measuring every row
+			for col, width in ((lineno, 60), (charno, 60), (message, 400)):
+				col.set_sizing(Gtk.TreeViewColumnSizing.FIXED)
+				col.set_fixed_width(width)
+				col.set_resizable(True)
+			message.set_expand(True)
+			
 			treeview.append_column(lineno)
 			treeview.append_column(charno)
 			treeview.append_column(message)
+			treeview.set_fixed_height_mode(True)
 			
 			"""
 			lineno = Gtk.TreeViewColumn('Line')
@@ -250,6 +531,116 @@ class ClientsideWindowHelper:
 			self.pane.show_all()
 			
 		
+	#================================================================================
+	# lint as you type
+	#================================================================================
+	
+	# -------------------------------------------------------------------------------
+	# which lint a document gets, None for documents we don't lint
+	def _lint_type(self, doc):
+		lang = doc.get_language()
+		if lang is None:
+			return None
+		
+		lang_id = lang.get_id()
+		if lang_id in ('js', 'javascript'):
+			return 'js'
+		if lang_id == 'css':
+			return 'css'
+		return None
+	
+	# -------------------------------------------------------------------------------
+	# follow the active document's changes when lint as you type is on
+	def _watch_active_document(self):
+		doc = self._window.get_active_document()
+		if self._settings['lint_as_you_type'] != 'true':
+			doc = None
+		
+		if doc == self._lint_doc:
+			return
+		
+		self._unwatch_document()
+		
+		if doc is not None:
+			self._lint_doc = doc
+			self._lint_handler = doc.connect('changed', self.on_lint_doc_changed)
+	
+	# -------------------------------------------------------------------------------
+	def _unwatch_document(self):
+		if self._lint_timeout is not None:
+			GObject.source_remove(self._lint_timeout)
+			self._lint_timeout = None
+		
+		if self._lint_doc is not None:
+			self._lint_doc.disconnect(self._lint_handler)
+			self._lint_doc = None
+			self._lint_handler = None
+		
+		self._lint_runner.cancel()
+		self._cancel_lint_request()
+	
+	# -------------------------------------------------------------------------------
+	# every edit pushes the lint back, so a burst of typing becomes one run
+	def on_lint_doc_changed(self, doc):
+		self._lint_version += 1
+		
+		if self._lint_timeout is not None:
+			GObject.source_remove(self._lint_timeout)
+		
+		self._lint_timeout = GObject.timeout_add(int(self._settings['lint_delay']), self.on_lint_idle, doc)
+	
+	# -------------------------------------------------------------------------------
+	def on_lint_idle(self, doc):
+		self._lint_timeout = None
+		
+		lint_type = self._lint_type(doc)
+		if lint_type is None:
+			return False
+		
+		doctxt = doc.get_text(doc.get_start_iter(), doc.get_end_iter(), True)
+		version = self._lint_version
+		
+		self._submit_lint(self._lint_runner, doc, lint_type, doctxt,
+			lambda doc, elist, err: self.on_background_lint_done(doc, version, elist, err), version,
+			owner=self._lint_owner)
+		
+		return False
+	
+	# -------------------------------------------------------------------------------
+	# a batch of issues from a lint that is still running
+	def on_lint_progress(self, doc, run, issues, version=None):
+		if doc != self._window.get_active_document():
+			return
+		
+		if version is not None and version != self._lint_version:
+			return
+		
+		self.create_bottom_tab()
+		self._issues_doc = doc
+		if run['streamed']:
+			self.append_bottom_tab(issues)
+		else:
+			run['streamed'] = True
+			self.populate_bottom_tab(issues)
+	
+	# -------------------------------------------------------------------------------
+	def on_background_lint_done(self, doc, version, elist, err):
+		
+		# the buffer changed while node was busy, the run for the newer text will report
+		if version != self._lint_version or doc != self._window.get_active_document():
+			return
+		
+		# cut short by a newer run, or the document went away
+		if isinstance(err, NodeWorkerCancelled):
+			return
+		
+		if err is not None:
+			elist = [{ 'line': 1, 'char': 1, 'text': str(err) }]
+		
+		self.create_bottom_tab()
+		self._issues_doc = doc
+		self.populate_bottom_tab(elist)
+	
 	#================================================================================
 	# Action functions
 	#================================================================================
@@ -262,63 +653,30 @@ class ClientsideWindowHelper:
 		if not doc:
 			return
 		
-		jslint_path = os.path.join(self.plugin_dir, "jslint_node")
-		tmpfile_path = os.path.join(self.plugin_dir, "tmp_jslint.js")
-		tmpcode_path = os.path.join(self.plugin_dir, "tmp_jslint_code.js")
-		
-		tmpfile = open(tmpfile_path,"w")
-		tmpfile.writelines("var sys = require('sys');")
-		tmpfile.writelines("var fs = require('fs');")
-		tmpfile.writelines("var JSLINT = require('" + jslint_path + "').JSLINT;")
-		tmpfile.writelines("var body = fs.readFileSync('" + tmpcode_path + "');")
-		tmpfile.write('''
-			body = body.toString("utf8");
-			var result = JSLINT(body, {browser: true, forin: true});
-			var errors = [];
-			var out = '';
-			
-			if(JSLINT.errors){
-				for(var i=0; i<JSLINT.errors.length; i++){
-					if(JSLINT.errors[i]){
-						out += JSLINT.errors[i].line +','+ JSLINT.errors[i].character +',"'+ JSLINT.errors[i].reason.toString().replace('"','\"') +'"\\n';
-						errors.push('{"reason":"' + JSLINT.errors[i].reason + '", "line":' + JSLINT.errors[i].line + ', "character":' + JSLINT.errors[i].character + '}');
-					}
-				}
-			}
-			
-			process.stdout.write(out);
-		''')
-		tmpfile.close()
-		
-		# store in tmp file
-		doctxt = doc.get_text(doc.get_iter_at_line(0), doc.get_end_iter(), True)
-		tmpcode = open(tmpcode_path,"w")
-		tmpcode.write(doctxt)
-		tmpcode.close()
-		
-		# run validation
-		result = self._get_cmd_output(self._settings['nodejs'] +' ' + tmpfile_path)
-		
-		#clean up
-		os.remove(tmpcode_path)
-		os.remove(tmpfile_path)
-		
-		# we need to format it for our populate routine
-		jslint_results = result.splitlines()
-		elist = []
-		for e in jslint_results:
-			tmpparts = e.split(',')#re.split(r'\s*("[^"]*"|.*?)\s*,',e)
-			if len(tmpparts) > 0:
-				tmperr = { 
-					'line': int(tmpparts[0]), 
-					'char': int(tmpparts[1]), 
-					'text': tmpparts[2] 
-				}
-				tmperr['text'] = re.sub(r'^\"','', tmperr['text'])
-				tmperr['text'] = re.sub(r'\"$','', tmperr['text'])
-				elist.append( tmperr )
+		doctxt, scope = self._action_text(doc, 'js')
+		
+		# run validation, the results come back to on_lint_done
+		self._show_busy("Running JSLint...")
+		self._submit_lint(self._tool_runner, doc, 'js', doctxt, self.on_lint_done, scope=scope)
+		
+
+	# -------------------------------------------------------------------------------
+	# scope is where the linted text came from, see _action_text
+	def on_lint_done(self, doc, elist, err, scope=None):
+		self._hide_busy()
+		
+		# the user moved on to another document while node was busy
+		if doc != self._window.get_active_document():
+			return
+		
+		if err is not None:
+			elist = [{ 'line': 1, 'char': 1, 'text': str(err) }]
+		
+		if scope is not None:
+			elist = self._splice_issues(doc, shift_issues(elist, scope['line'], scope['char']), scope)
 		
 		self.create_bottom_tab()
+		self._issues_doc = doc
 		self.populate_bottom_tab(elist)
 		
 
@@ -329,11 +687,34 @@ class ClientsideWindowHelper:
 		if not doc:
 			return
 		
-		doctxt = doc.get_text(doc.get_iter_at_line(0), doc.get_end_iter(), True)
-		formatted_js = self.get_formatted_js_str(doctxt)
+		doctxt, scope = self._action_text(doc, 'js')
+		
+		self._show_busy("Formatting JS...")
+		self._tool_runner.submit(self._format_js_job(doctxt),
+			lambda formatted_js, err: self.on_format_js_done(doc, formatted_js, err, scope))
+		
+	
+	# -------------------------------------------------------------------------------
+	def on_format_js_done(self, doc, formatted_js, err, scope=None):
+		self._hide_busy()
+		
+		# the user moved on to another document while node was busy
+		if doc != self._window.get_active_document():
+			return
+		
+		# a run stopped by the node limits is reported with the lint results
+		if isinstance(err, NodeWorkerLimitError):
+			self.create_bottom_tab()
+			self._issues_doc = None
+			self.populate_bottom_tab([{ 'line': 1, 'char': 1, 'text': "Format JS: " + str(err) }])
+			return
+		
+		if err is not None:
+			self.show_error_message("Unable to format JS.\n\n" + str(err))
+			return
 		
 		#print result
-		self.handle_new_output("Formatted JS Copied to Clipboard.", formatted_js)
+		self.handle_new_output("JS Formatted.", formatted_js, scope)
 		
 	
 	# -------------------------------------------------------------------------------	
@@ -343,10 +724,10 @@ class ClientsideWindowHelper:
 		if not doc:
 			return
 			
-		doctxt = doc.get_text(doc.get_iter_at_line(0), doc.get_end_iter(), True)
+		doctxt, scope = self._action_text(doc, 'js')
 		min_js = self.get_minified_js_str(doctxt)
 		
-		self.handle_new_output("Minified JS Copied to CLipboard", min_js)	
+		self.handle_new_output(self._minify_remark("JS Minified.", self._mangle_report), min_js, scope)	
 
 
 	# -------------------------------------------------------------------------------
@@ -365,63 +746,11 @@ class ClientsideWindowHelper:
 		if not doc:
 			return
 		
-		csslint_path = os.path.join(self.plugin_dir, "csslint-node")
-		tmpfile_path = os.path.join(self.plugin_dir, "tmp_csslint.js")
-		tmpcode_path = os.path.join(self.plugin_dir, "tmp_csslint_code.js")
-		
-		tmpfile = open(tmpfile_path,"w")
-		tmpfile.writelines("var sys = require('sys');")
-		tmpfile.writelines("var fs = require('fs');")
-		tmpfile.writelines("var CSSLint = require('" + csslint_path + "').CSSLint;")
-		tmpfile.writelines("var body = fs.readFileSync('" + tmpcode_path + "');")
-		tmpfile.write('''
-			body = body.toString("utf8");
-			var result = CSSLint.verify(body);
-			var msgs = result.messages;
-			var errors = [];
-			var out = '';
-			
-			if(msgs){
-				for(var i=0, len=msgs.length; i<len; i++){
-					out += msgs[i].line +','+ msgs[i].col +',"'+ msgs[i].type +': '+ msgs[i].message.toString().replace('"','\"') +'"\\n';
-					errors.push('{"message":"' + msgs[i].type +': '+ msgs[i].reason + '", "line":' + msgs[i].line + ', "col":' + msgs[i].col + '}');
-				}
-			}
-			
-			process.stdout.write(out);
-		''')
-		tmpfile.close()
-		
-		# store in tmp file
-		doctxt = doc.get_text(doc.get_iter_at_line(0), doc.get_end_iter(), True)
-		tmpcode = open(tmpcode_path,"w")
-		tmpcode.write(doctxt)
-		tmpcode.close()
-		
-		# run validation
-		result = self._get_cmd_output(self._settings['nodejs'] +' ' + tmpfile_path)
-		
-		#clean up
-		os.remove(tmpcode_path)
-		os.remove(tmpfile_path)
-		
-		# we need to format it for our populate routine
-		csslint_results = result.splitlines()
-		elist = []
-		for e in csslint_results:
-			tmpparts = e.split(',')#re.split(r'\s*("[^"]*"|.*?)\s*,',e)
-			if len(tmpparts) > 0:
-				tmperr = { 
-					'line': int(tmpparts[0]), 
-					'char': int(tmpparts[1]), 
-					'text': tmpparts[2] 
-				}
-				tmperr['text'] = re.sub(r'^\"','', tmperr['text'])
-				tmperr['text'] = re.sub(r'\"$','', tmperr['text'])
-				elist.append( tmperr )
+		doctxt, scope = self._action_text(doc, 'css')
 		
-		self.create_bottom_tab()
-		self.populate_bottom_tab(elist)
+		# run validation, the results come back to on_lint_done
+		self._show_busy("Running CSSLint...")
+		self._submit_lint(self._tool_runner, doc, 'css', doctxt, self.on_lint_done, scope=scope)
 	
 	
 	# -------------------------------------------------------------------------------
@@ -431,10 +760,10 @@ class ClientsideWindowHelper:
 		if not doc:
 			return
 		
-		doctxt = doc.get_text(doc.get_iter_at_line(0), doc.get_end_iter(), True)
+		doctxt, scope = self._action_text(doc, 'css')
 		formatted_css = self.get_formatted_css_str(doctxt)
         
-		self.handle_new_output("Formatted CSS Copied to Clipboard.", formatted_css)
+		self.handle_new_output("CSS Formatted.", formatted_css, scope)
 		
 	
 	# -------------------------------------------------------------------------------
@@ -444,10 +773,10 @@ class ClientsideWindowHelper:
 		if not doc:
 			return
 			
-		doctxt = doc.get_text(doc.get_iter_at_line(0), doc.get_end_iter(), True)
+		doctxt, scope = self._action_text(doc, 'css')
 		min_css = self.get_minified_css_str(doctxt)
 		
-		self.handle_new_output("Minified CSS Copied to Clipboard.", min_css)
+		self.handle_new_output(self._minify_remark("CSS Minified.", self._optimize_report), min_css, scope)
 	
 
 	# -------------------------------------------------------------------------------
@@ -459,6 +788,41 @@ class ClientsideWindowHelper:
 		return	
 	
 
+	# -------------------------------------------------------------------------------
+	# last minify timings button click
+	def on_minify_timings_activate(self, action):
+		if self._minify_stats is None:
+			if self._settings['profile_minify'] != 'true':
+				self.show_info_message("Minify timings are off, turn them on under Configure Plugin.")
+			else:
+				self.show_info_message("Nothing has been minified since minify timings were turned on.")
+			return
+		
+		md = Gtk.MessageDialog(self._window, Gtk.DialogFlags.MODAL | Gtk.DialogFlags.DESTROY_WITH_PARENT, Gtk.MessageType.INFO, Gtk.ButtonsType.CLOSE, "Timings of the last minify")
+		report = Gtk.Label()
+		report.set_markup("<tt>" + GLib.markup_escape_text(self._minify_stats.report()) + "</tt>")
+		report.set_selectable(True)
+		md.get_message_area().pack_start(report, expand=False, fill=False, padding=0)
+		report.show()
+		md.run()
+		md.destroy()
+	
+	# -------------------------------------------------------------------------------
+	# clear cache button click
+	def on_clear_cache_activate(self, action):
+		cache = self._result_cache()
+		stats = cache.stats()
+		
+		remark = "The Clientside cache holds %d results (%d KB).\nThis session: %d hits, %d misses.\n\nDo you want to clear it?" % (
+			stats['entries'], stats['size'] / 1024, stats['hits'], stats['misses'])
+		
+		md = Gtk.MessageDialog(self._window, Gtk.DialogFlags.MODAL | Gtk.DialogFlags.DESTROY_WITH_PARENT, Gtk.MessageType.QUESTION, Gtk.ButtonsType.YES_NO, remark)
+		response = md.run()
+		md.destroy()
+		
+		if response == Gtk.ResponseType.YES:
+			cache.clear()
+	
 	# -------------------------------------------------------------------------------
 	# gzip button click
 	def on_minifier_gzip_activate(self, action):
@@ -481,25 +845,95 @@ class ClientsideWindowHelper:
 		
 		if response == Gtk.ResponseType.OK:
 			newgzuri = dialog.get_filename()
+			level, threads = self._gzip_options()
+			name = os.path.basename(newgzuri)
 			
-			f = gzip.open(newgzuri, 'wb')
-			f.write(doctxt)
-			f.close()
-			f = None
+			# compressed on a pool of threads, progress comes back to the statusbar
+			self._show_busy("Compressing "+ name +"...")
+			self._gzip_runner.submit(
+				lambda report: compress_file(newgzuri, doctxt, level, threads, lambda done, total: report((done, total))),
+				lambda result, err: self.on_gzip_done(newgzuri, err),
+				lambda (done, total): self._show_busy("Compressing %s... %d%%" % (name, done * 100 / max(total, 1))))
 		
 		dialog.destroy()
+	
+	# -------------------------------------------------------------------------------
+	def on_gzip_done(self, path, err):
+		self._hide_busy()
+		
+		if err is not None:
+			self.show_error_message("Unable to write "+ path +".\n\n" + str(err))
+
+	# -------------------------------------------------------------------------------
+	# minify and compress button click, writes name.min.js(.gz) next to the file
+	def on_build_activate(self, action):
+		doc = self._window.get_active_document()
+		if not doc:
+			return
+		
+		location = doc.get_location()
+		if location is None or location.get_path() is None or doc.get_modified():
+			self.show_error_message("Save the file before minifying and compressing it.")
+			return
+		
+		path = location.get_path()
+		if path.endswith('.css'):
+			minify = self.get_minified_css_str
+		elif path.endswith('.js'):
+			minify = self.get_minified_js_str
+		else:
+			self.show_error_message("Only .js and .css files can be minified and compressed.")
+			return
+		
+		doctxt = doc.get_text(doc.get_iter_at_line(0), doc.get_end_iter(), True)
+		output = min_path(path)
+		
+		try:
+			sizes = build([path], output, lambda: minify(doctxt), *self._build_options())
+		except (IOError, OSError), err:
+			self.show_error_message("Unable to write "+ output +".\n\n" + str(err))
+			return
+		
+		self.show_info_message(build_report(output, sizes))
 
 	#================================================================================
 	# Helper Functions
 	#================================================================================
 	
+	# -------------------------------------------------------------------------------
+	# the remark after a minify, with what mangling or optimizing saved also
+	# flashed on the statusbar
+	def _minify_remark(self, remark, report):
+		
+		if not report:
+			return remark
+		
+		statusbar = self._window.get_statusbar()
+		statusbar.flash_message(statusbar.get_context_id("ClientsidePlugin"), report)
+		return remark + " " + report
+	
 	# -------------------------------------------------------------------------------
 	# minify a string of css
 	def get_minified_css_str(self, css):
 		
-		min_css = CSSMin().minify(css)
+		profile = self._settings['profile_minify'] == 'true'
+		if profile:
+			# a cached result has no timings, so profiled runs always minify
+			min_css, self._minify_stats = minify_css_profile(css)
+		else:
+			min_css = self._result_cache().run('minify_css', css, None, lambda: minify_css(css))
+		
+		self._optimize_report = None
+		if self._settings['optimize_css'] != 'true':
+			return min_css
 		
-		return min_css	
+		if profile:
+			# the optimizations show up in the timings after the minify passes
+			optimized, saved = optimize(min_css, self._minify_stats)
+		else:
+			optimized, saved = self._result_cache().run('optimize_css', min_css, None, lambda: optimize(min_css))
+		self._optimize_report = optimize_report(saved)
+		return optimized
 	
 	# -------------------------------------------------------------------------------
 	# format a string of css
@@ -507,67 +941,30 @@ class ClientsideWindowHelper:
 		
 		self._import_gedit_preferences()
 		
-		braces_new_line = (self._settings['braces_on_own_line'] == 'true')
-		tab = self._settings['indent_char'] * int(self._settings['indent_size'])
-			
-		formatted_css = CSSMin().format(css, braces_new_line, tab)
-			
-		return formatted_css
+		return format_css(css, self._settings)
 	
 	# -------------------------------------------------------------------------------
 	# minify a string of js
 	def get_minified_js_str(self, js):
 		
-		ins = StringIO(js)
-		outs = StringIO()
-		
-		JavascriptMinify().minify(ins, outs)
-		
-		min_js = outs.getvalue()
-		
-		if len(min_js) > 0 and min_js[0] == '\n':
-			min_js = min_js[1:]
+		if self._settings['profile_minify'] == 'true':
+			min_js, self._minify_stats = minify_js_profile(js)
+		else:
+			min_js = self._result_cache().run('minify_js', js, None, lambda: minify_js(js))
 		
-		min_js = re.sub(r'(\n|\r)+','', min_js)
+		self._mangle_report = None
+		if self._settings['mangle_js'] != 'true':
+			return min_js
 		
-		return min_js
+		mangled = self._result_cache().run('mangle_js', min_js, { 'version': MANGLE_VERSION }, lambda: mangle(min_js))
+		self._mangle_report = mangle_report(min_js, mangled)
+		return mangled
 	
 	# -------------------------------------------------------------------------------
 	# format a string of js
 	def get_formatted_js_str(self, js):
 		
-		self._import_gedit_preferences()
-		
-		jsbeautify_path = os.path.join(self.plugin_dir, "jsbeautify/beautify")
-		tmpfile_path = os.path.join(self.plugin_dir, "tmp_jsbeautify.js")
-		tmpcode_path = os.path.join(self.plugin_dir, "tmp_jsbeautify_code.js")
-		
-		tmpfile = open(tmpfile_path,"w")
-		tmpfile.writelines("var sys = require('sys');")
-		tmpfile.writelines("var fs = require('fs');")
-		tmpfile.writelines("var js_beautify = require('" + jsbeautify_path + "').js_beautify;")
-		tmpfile.writelines("var body = fs.readFileSync('" + tmpcode_path + "');")
-		tmpfile.writelines("var options = { indent_size: "+ self._settings['indent_size'] +", indent_char: '"+ self._settings['indent_char'] +"', preserve_newlines: "+ self._settings['preserve_newlines'] +", space_after_anon_function: "+ self._settings['space_after_anon_function'] +", keep_array_indentation: "+ self._settings['keep_array_indentation'] +", braces_on_own_line: "+ self._settings['braces_on_own_line'] +" };")
-		tmpfile.write('''
-			body = body.toString("utf8");
-			var result = js_beautify(body, options);
-			process.stdout.write(result);
-		''')
-		tmpfile.close()
-		
-		# store in tmp file
-		tmpcode = open(tmpcode_path,"w")
-		tmpcode.write(js)
-		tmpcode.close()
-		
-		# run command
-		result = self._get_cmd_output(self._settings['nodejs'] +' ' + tmpfile_path)
-		
-		#clean up
-		os.remove(tmpcode_path)
-		os.remove(tmpfile_path)
-		
-		return result
+		return self._format_js_job(js)()
 	
 	# -------------------------------------------------------------------------------
 	# choose files, minify them, and return a string
@@ -576,7 +973,7 @@ class ClientsideWindowHelper:
 		app_inst = Gedit.App.get_default()
 		active_window = app_inst.get_active_window()
 		
-		dialog = Gtk.Dialog("Select Files to Minify", active_window, 0, (Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL, Gtk.STOCK_OK, Gtk.ResponseType.OK))
+		dialog = Gtk.Dialog("Select Files to Minify", active_window, 0, (Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL, "Save Bundle", Gtk.ResponseType.APPLY, Gtk.STOCK_OK, Gtk.ResponseType.OK))
 		dialog.set_default_size(400, -1)
 		content_area = dialog.get_content_area()
 		
@@ -634,44 +1031,160 @@ class ClientsideWindowHelper:
 		response = dialog.run()
 		
 		
-		if response == Gtk.ResponseType.OK:
+		if response in (Gtk.ResponseType.OK, Gtk.ResponseType.APPLY):
 			model = treeview.get_model()
 			filenames = []
 			
 			for r in model:
 				filenames.append(r[1])
+			
+			bundle = None
+			if filenames and response == Gtk.ResponseType.APPLY:
+				bundle = self.choose_bundle_file(filenames, filter_type)
 				
-			if filenames:
-				min_code = ''
-				charset = ''
-				charsetre = r'(@charset \".+\";)'
-				
-				for file in filenames:
-					tmpcode = open(file,"r")
-					tmpread = tmpcode.read()
-					tmpcode.close()
-					
-					if filter_type == 'css':
-						
-						#if there is a charset, keep up with it so we can add only one per file
-						tmpcharset = re.findall(charsetre, tmpread)
-						if tmpcharset:
-							charset = tmpcharset[0]
-							tmpread = re.sub(charsetre, '', tmpread)
-						
-						tmpread = self.get_minified_css_str(tmpread)
-						
-					else:
-						tmpread = self.get_minified_js_str(tmpread)
-						
-					min_code = min_code + '/* '+ os.path.basename(file) + ' */\n'+ tmpread + '\n\n'
-				
-				if charset != '':
-					min_code = charset + '\n\n' + min_code;
-					
-				self.handle_new_output("Batched and Minified "+ filter_name +" Copied to Clipboard.", min_code.strip())
+			if filenames and (bundle or response == Gtk.ResponseType.OK):
+				self.run_batch_minify(filenames, filter_name, filter_type, bundle)
 			
 		dialog.destroy()
+	
+	# where to save the bundle, None if the user cancels
+	def choose_bundle_file(self, filenames, filter_type):
+		dialog = Gtk.FileChooserDialog(title="Save Bundle",action=Gtk.FileChooserAction.SAVE,buttons=(Gtk.STOCK_CANCEL,Gtk.ResponseType.CANCEL,Gtk.STOCK_SAVE,Gtk.ResponseType.OK))
+		dialog.set_do_overwrite_confirmation(True)
+		dialog.set_current_folder(os.path.dirname(filenames[0]))
+		dialog.set_current_name("bundle.min."+ filter_type)
+		dialog.set_default_response(Gtk.ResponseType.OK)
+		
+		bundle = None
+		if dialog.run() == Gtk.ResponseType.OK:
+			bundle = dialog.get_filename()
+		
+		dialog.destroy()
+		return bundle
+		
+	# minify the files in cli.py's pool while a dialog shows how far along we are
+	# with a bundle the result is written to bundle and bundle.gz instead of the clipboard
+	def run_batch_minify(self, filenames, filter_name, filter_type, bundle=None):
+		
+		# nothing changed since the bundle was last built with these settings
+		if bundle and is_up_to_date(bundle, filenames, build_options(self._settings), self._result_cache()):
+			self.show_info_message(build_report(bundle, build(filenames, bundle, None, *self._build_options())))
+			return
+		
+		# one batch at a time, a new one replaces one still running
+		if self._batch is not None:
+			self.batch_minify_cancelled(self._batch['dialog'], None, self._batch)
+		
+		app_inst = Gedit.App.get_default()
+		active_window = app_inst.get_active_window()
+		
+		dialog = Gtk.Dialog("Minifying "+ filter_name, active_window, 0, (Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL))
+		dialog.set_default_size(400, -1)
+		content_area = dialog.get_content_area()
+		
+		liststore = Gtk.ListStore(str,str)
+		for file in filenames:
+			liststore.append([ os.path.basename(file), "Waiting" ])
+		
+		treeview = Gtk.TreeView(liststore)
+		treeview.append_column(Gtk.TreeViewColumn("File", Gtk.CellRendererText(), text=0))
+		treeview.append_column(Gtk.TreeViewColumn("Status", Gtk.CellRendererText(), text=1))
+		
+		scrolled = Gtk.ScrolledWindow()
+		scrolled.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+		scrolled.set_size_request(400, 150)
+		scrolled.add(treeview)
+		content_area.pack_start(scrolled, expand=True, fill=True, padding=0)
+		
+		progress = Gtk.ProgressBar()
+		progress.set_show_text(True)
+		progress.set_text("0 of %d" % len(filenames))
+		content_area.pack_start(progress, expand=False, fill=False, padding=5)
+		
+		# results are collected by position so the bundle keeps the order from the batch list
+		batch = {
+			'dialog': dialog,
+			'results': [ None ] * len(filenames),
+			'filter_type': filter_type,
+			'done': 0,
+			'errors': [],
+			'cancelled': False,
+			'build_args': self._build_options(),
+			'process': BatchMinify(filenames, self.config_store),
+		}
+		self._batch = batch
+		
+		def job(report):
+			for item in batch['process'].run():
+				report(item)
+		
+		dialog.connect('response', self.batch_minify_cancelled, batch)
+		dialog.show_all()
+		
+		self._batch_runner.submit(job,
+			lambda result, err: self.batch_minify_done(batch, err, filenames, filter_name, bundle),
+			lambda item: self.batch_minify_progress(liststore, progress, batch, filenames, item))
+	
+	# one file of the batch is done, the dialog stays responsive while the others are minified
+	def batch_minify_progress(self, liststore, progress, batch, filenames, item):
+		i, result, err = item
+		batch['done'] += 1
+		
+		if err is None:
+			batch['results'][i] = result
+			liststore[i][1] = "Done"
+		else:
+			batch['errors'].append(os.path.basename(filenames[i]) +": "+ str(err))
+			liststore[i][1] = "Failed"
+		
+		progress.set_fraction(float(batch['done']) / len(filenames))
+		progress.set_text("%d of %d" % (batch['done'], len(filenames)))
+	
+	# every file of the batch is minified
+	def batch_minify_done(self, batch, err, filenames, filter_name, bundle):
+		
+		if batch['cancelled']:
+			return
+		
+		self._batch = None
+		batch['dialog'].destroy()
+		
+		if err is not None:
+			batch['errors'].append(str(err))
+		
+		if batch['errors']:
+			self.show_error_message("Unable to minify:\n\n"+ "\n".join(batch['errors']))
+			return
+		
+		# files are minified on their own, rules they share are only seen here
+		results = batch['results']
+		remark = ""
+		if batch['filter_type'] == 'css':
+			results, saved = dedupe_batch(results)
+			remark = " " + dedupe_report(saved)
+		
+		min_code = join_batch(filenames, results)
+		
+		if bundle:
+			try:
+				sizes = build(filenames, bundle, lambda: min_code.strip(), *batch['build_args'])
+			except (IOError, OSError), err:
+				self.show_error_message("Unable to write "+ bundle +".\n\n" + str(err))
+				return
+			self.show_info_message(build_report(bundle, sizes) + remark)
+			return
+		
+		self.handle_new_output("Batched and Minified "+ filter_name +"."+ remark, min_code.strip())
+	
+	# stop the batch, cli.py is killed along with its pool and the results are dropped
+	def batch_minify_cancelled(self, dialog, response_id, batch):
+		if not batch['cancelled']:
+			batch['cancelled'] = True
+			self._batch_runner.cancel()
+			batch['process'].kill()
+		if self._batch is batch:
+			self._batch = None
+		dialog.destroy()
 		
 	#add items to the tree store
 	def treeview_add_clicked(self, button, treeview, filter_name, filter_type):
@@ -731,13 +1244,25 @@ class ClientsideWindowHelper:
 		
 	
 	# -------------------------------------------------------------------------------
-	# ask the user what to do with the output
-	def handle_new_output(self, remark, contents):
+	# let the user know something went wrong
+	def show_error_message(self, message):
+		md = Gtk.MessageDialog(self._window, Gtk.DialogFlags.MODAL | Gtk.DialogFlags.DESTROY_WITH_PARENT, Gtk.MessageType.ERROR, Gtk.ButtonsType.CLOSE, message)
+		md.run()
+		md.destroy()
+	
+	# -------------------------------------------------------------------------------
+	# tell the user how something went
+	def show_info_message(self, message):
+		md = Gtk.MessageDialog(self._window, Gtk.DialogFlags.MODAL | Gtk.DialogFlags.DESTROY_WITH_PARENT, Gtk.MessageType.INFO, Gtk.ButtonsType.CLOSE, message)
+		md.run()
+		md.destroy()
+	
+	# -------------------------------------------------------------------------------
+	# ask the user what to do with the output, scope is where the input came
+	# from when it wasn't the whole document, see _action_text
+	def handle_new_output(self, remark, contents, scope=None):
 		view = self._window.get_active_view()
-		remark = remark +"\n\nDo you want to replace it in the document?"
-		
-		#save to clipboard
-		self.clipboard.set_text(contents, len(contents))
+		remark = remark +"\n\nDo you want to replace it in the document? If not it is copied to the clipboard."
 		
 		# do we want to overwrite current document?
 		response = Gtk.ResponseType.NO
@@ -752,14 +1277,108 @@ class ClientsideWindowHelper:
 			response = md.run()
 			md.destroy()
 		
-		if response == Gtk.ResponseType.YES:
+		if response == Gtk.ResponseType.YES and view:
+			if scope is not None:
+				# the whitespace around a selection or block stays as it was
+				text = scope['text']
+				contents = text[:len(text) - len(text.lstrip())] + contents.strip() + text[len(text.rstrip()):]
 			
-			# out with the old
-			view.select_all()
-			#view.delete_selection()
+			if self.replace_document_text(view, contents, scope):
+				return
 			
-			# in with the new
-			view.paste_clipboard()
+			self.show_error_message("The document changed while this ran, the result is copied to the clipboard instead.")
+		
+		#save to clipboard
+		self.clipboard.set_text(contents, len(contents))
+	
+	# -------------------------------------------------------------------------------
+	# put text in place of the document's contents, or the part of them scope
+	# says, as one undoable action.  Only the spans that changed are replaced so
+	# the rest keeps its highlighting.  False when the part scope says has
+	# changed since its text was read.
+	def replace_document_text(self, view, text, scope=None):
+		self._finish_replace()
+		
+		doc = view.get_buffer()
+		start, end = doc.get_start_iter(), doc.get_end_iter()
+		if scope is not None:
+			start, end = doc.get_iter_at_offset(scope['start']), doc.get_iter_at_offset(scope['end'])
+		
+		old = doc.get_text(start, end, True)
+		if scope is not None and old != scope['text']:
+			return False
+		
+		# buffer offsets count characters, not utf-8 bytes
+		if not isinstance(old, unicode):
+			old = old.decode('utf-8')
+		if not isinstance(text, unicode):
+			text = text.decode('utf-8')
+		
+		offset = start.get_offset()
+		spans = [(span_start + offset, span_end + offset, new) for span_start, span_end, new in diff_spans(old, text)]
+		if not spans:
+			return True
+		
+		job = { 'view': view, 'doc': doc, 'spans': spans, 'inserted': 0, 'editable': view.get_editable(), 'source': None }
+		self._replace_job = job
+		doc.begin_user_action()
+		
+		if sum(len(span[2]) for span in spans) <= INSERT_CHUNK:
+			self._finish_replace()
+			return True
+		
+		# typing between chunks would move the offsets of the spans still to go
+		view.set_editable(False)
+		self._show_busy("Updating document...")
+		job['source'] = GObject.idle_add(self._replace_step, job)
+		return True
+	
+	# -------------------------------------------------------------------------------
+	# apply the job's spans from the last one back, putting in at most limit
+	# characters, returns True while there is more to do
+	def _replace_step(self, job, limit=INSERT_CHUNK):
+		doc = job['doc']
+		spans = job['spans']
+		
+		while spans:
+			if limit is not None and limit <= 0:
+				return True
+			
+			start, end, text = spans[-1]
+			done = job['inserted']
+			if done == 0 and end > start:
+				doc.delete(doc.get_iter_at_offset(start), doc.get_iter_at_offset(end))
+			
+			size = len(text) - done
+			if limit is not None:
+				size = min(size, limit)
+				limit -= size
+			if size:
+				doc.insert(doc.get_iter_at_offset(start + done), text[done:done + size].encode('utf-8'))
+			
+			job['inserted'] = done + size
+			if job['inserted'] == len(text):
+				spans.pop()
+				job['inserted'] = 0
+		
+		self._replace_job = None
+		doc.end_user_action()
+		
+		if job['source'] is not None:
+			job['view'].set_editable(job['editable'])
+			self._hide_busy()
+		return False
+	
+	# -------------------------------------------------------------------------------
+	# put the rest of a running replace in now
+	def _finish_replace(self):
+		job = self._replace_job
+		if job is None:
+			return
+		
+		if job['source'] is not None:
+			GObject.source_remove(job['source'])
+		self._replace_step(job, None)
 
 	#================================================================================
 	# Configuration Window
@@ -817,17 +1436,52 @@ class ClientsideWindowHelper:
 		else:
 			self.config_fields['replace_contents_2'].set_active(False)
 		table.attach(self.config_fields['replace_contents_2'], 2, 4, 6, 7 )
+		
+		self.config_fields['scope_to_block'] = Gtk.CheckButton("With nothing selected, only the block around the cursor")
+		if self._settings['scope_to_block'] == "true":
+			self.config_fields['scope_to_block'].set_active(True)
+		table.attach(self.config_fields['scope_to_block'], 2, 4, 7, 8 )
 
 		
 		formatting_label = Gtk.Label()
 		formatting_label.set_markup("<b>Formatting</b>")
 		formatting_label.set_alignment(xalign=0.0, yalign=0.5)
-		table.attach(formatting_label, 1, 4, 7, 8 )
+		table.attach(formatting_label, 1, 4, 8, 9 )
 		
 		self.config_fields['braces_on_own_line'] = Gtk.CheckButton("Place braces on a new line")
 		if self._settings['braces_on_own_line'] == "true":
 			self.config_fields['braces_on_own_line'].set_active(True)
-		table.attach(self.config_fields['braces_on_own_line'], 2, 4, 8, 9 )
+		table.attach(self.config_fields['braces_on_own_line'], 2, 4, 9, 10 )
+		
+		linting_label = Gtk.Label()
+		linting_label.set_markup("<b>Linting</b>")
+		linting_label.set_alignment(xalign=0.0, yalign=0.5)
+		table.attach(linting_label, 1, 4, 10, 11 )
+		
+		self.config_fields['lint_as_you_type'] = Gtk.CheckButton("Lint JS and CSS as I type")
+		if self._settings['lint_as_you_type'] == "true":
+			self.config_fields['lint_as_you_type'].set_active(True)
+		table.attach(self.config_fields['lint_as_you_type'], 2, 4, 11, 12 )
+		
+		minifying_label = Gtk.Label()
+		minifying_label.set_markup("<b>Minifying</b>")
+		minifying_label.set_alignment(xalign=0.0, yalign=0.5)
+		table.attach(minifying_label, 1, 4, 12, 13 )
+		
+		self.config_fields['profile_minify'] = Gtk.CheckButton("Time each minify pass (Last Minify Timings)")
+		if self._settings['profile_minify'] == "true":
+			self.config_fields['profile_minify'].set_active(True)
+		table.attach(self.config_fields['profile_minify'], 2, 4, 13, 14 )
+		
+		self.config_fields['mangle_js'] = Gtk.CheckButton("Shorten the local names in JS")
+		if self._settings['mangle_js'] == "true":
+			self.config_fields['mangle_js'].set_active(True)
+		table.attach(self.config_fields['mangle_js'], 2, 4, 14, 15 )
+		
+		self.config_fields['optimize_css'] = Gtk.CheckButton("Merge rules and collapse shorthands in CSS")
+		if self._settings['optimize_css'] == "true":
+			self.config_fields['optimize_css'].set_active(True)
+		table.attach(self.config_fields['optimize_css'], 2, 4, 15, 16 )
 		
 		content_area.pack_start(table, expand=False, fill=False, padding=10)
 		
@@ -855,13 +1509,44 @@ class ClientsideWindowHelper:
 			else:
 				self._settings['replace_contents']=2
 			
+			# format, minify and lint the block around the cursor?
+			if self.config_fields['scope_to_block'].get_active():
+				self._settings['scope_to_block'] = "true"
+			else:
+				self._settings['scope_to_block'] = "false"
+			
 			# when formatting put braces on new line?	
 			if self.config_fields['braces_on_own_line'].get_active():
 				self._settings['braces_on_own_line'] = "true"
 			else:
 				self._settings['braces_on_own_line'] = "false"
 			
+			# lint in the background while editing?
+			if self.config_fields['lint_as_you_type'].get_active():
+				self._settings['lint_as_you_type'] = "true"
+			else:
+				self._settings['lint_as_you_type'] = "false"
+			
+			# time the passes of each minify?
+			if self.config_fields['profile_minify'].get_active():
+				self._settings['profile_minify'] = "true"
+			else:
+				self._settings['profile_minify'] = "false"
+			
+			# shorten local names in minified js?
+			if self.config_fields['mangle_js'].get_active():
+				self._settings['mangle_js'] = "true"
+			else:
+				self._settings['mangle_js'] = "false"
+			
+			# merge rules and collapse shorthands in minified css?
+			if self.config_fields['optimize_css'].get_active():
+				self._settings['optimize_css'] = "true"
+			else:
+				self._settings['optimize_css'] = "false"
+			
 			self._write_config_file(self._settings)
+			self._watch_active_document()
 		
 		dialog.destroy()
 		
@@ -872,17 +1557,13 @@ class ClientsideWindowHelper:
 			self._write_config_file(self._settings)
 			return self._settings
 		
-		pkl_file = open(self.config_store, 'rb')
-		self._settings = pickle.load(pkl_file)
-		pkl_file.close()
+		self._settings = read_settings(self.config_store)
 		
 		return self._settings
 	
 	def _write_config_file(self, settings):
-				
-		output = open(self.config_store, 'wb')
-		pickle.dump(settings, output)
-		output.close()
+		
+		write_settings(settings, self.config_store)
 
 		return	
 
@@ -891,16 +1572,51 @@ class ClientsidePlugin(GObject.Object, Gedit.WindowActivatable, PeasGtk.Configur
 	__gtype_name__ = "ClientsidePlugin"
 	window = GObject.property(type=Gedit.Window)
 	
+	# gedit makes a plugin object for every window, the node workers are
+	# shared by all of them and stopped with the last window
+	_node_pool = None
+	_node_pool_windows = set()
+	
 	def __init__(self):
 		GObject.Object.__init__(self)
 		self._instances = {}
+		self._result_cache = None
+	
+	def get_result_cache(self, max_size):
+		if self._result_cache is None:
+			self._result_cache = ResultCache(os.path.join(GLib.get_user_cache_dir(), CACHE_NAME))
+		self._result_cache.max_size = max_size
+		return self._result_cache
+	
+	# owner's way into the shared workers, the last settings asked for apply to
+	# every window's requests.  Workers pick up a new node command or memory
+	# limit when they next run.
+	def get_node_worker(self, owner, priority, nodejs, size, idle_timeout, timeout=None, memory_limit=None, max_output=None):
+		pool = ClientsidePlugin._node_pool
+		if pool is None:
+			pool = NodeWorkerPool()
+			ClientsidePlugin._node_pool = pool
+		
+		pool.nodejs = nodejs
+		pool.size = max(size, 1)
+		pool.idle_timeout = idle_timeout
+		pool.timeout = timeout
+		pool.memory_limit = memory_limit
+		pool.max_output = max_output
+		return pool.client(owner, priority)
 		
 	def do_activate(self):
 		self._instances[self.window] = ClientsideWindowHelper(self, self.window)
+		ClientsidePlugin._node_pool_windows.add(self.window)
 
 	def do_deactivate(self):
 		self._instances[self.window].deactivate()
 		del self._instances[self.window]
+		
+		ClientsidePlugin._node_pool_windows.discard(self.window)
+		if not ClientsidePlugin._node_pool_windows and ClientsidePlugin._node_pool is not None:
+			ClientsidePlugin._node_pool.stop()
+			ClientsidePlugin._node_pool = None
 
 	def do_update_state(self):
 		self._instances[self.window].update_ui()
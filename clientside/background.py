@@ -0,0 +1,132 @@
+# Copyright 2011 Trent Richardson
+#
+# This file is part of Gedit Clientside Plugin.
+#
+# Gedit Clientside Plugin is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gedit Clientside Plugin is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gedit Clientside Plugin. If not, see <http://www.gnu.org/licenses/>.
+
+import time
+import threading
+
+
+class BackgroundRunner:
+	"""
+	Runs jobs one at a time on a thread, for work that spends its time waiting
+	on node.  A job submitted while another is running replaces any job still
+	waiting its turn, and a result is only handed to its callback if nothing
+	newer was submitted in the meantime.
+
+	deliver is how the thread gets back to the main loop, GObject.idle_add for
+	the plugin: deliver(func, *args) must call func(*args) there later.
+	interrupt, if given, is called when a job is submitted while another is
+	running, to cut the running one short instead of waiting it out.
+	"""
+
+	def __init__(self, deliver, interrupt=None):
+		self._deliver = deliver
+		self._interrupt = interrupt
+		self._lock = threading.Lock()
+		self._generation = 0
+		self._pending = None
+		self._running = False
+
+	def submit(self, func, callback, progress=None):
+		"""
+		Run func() on the thread, then callback(result, error) on the main loop.
+		With progress, func is called as func(report) instead and every
+		report(item) reaches progress(item) on the main loop while the job is
+		still the newest.
+		"""
+
+		self._lock.acquire()
+		try:
+			self._generation += 1
+			self._pending = (self._generation, func, callback, progress)
+			running = self._running
+			self._running = True
+		finally:
+			self._lock.release()
+
+		if running:
+			if self._interrupt is not None:
+				self._interrupt()
+			return
+
+		thread = threading.Thread(target=self._run)
+		thread.daemon = True
+		thread.start()
+
+	def cancel(self):
+		"""Forget the waiting job and drop the result of the running one."""
+
+		self._lock.acquire()
+		try:
+			self._generation += 1
+			self._pending = None
+		finally:
+			self._lock.release()
+
+	def _run(self):
+		while True:
+			self._lock.acquire()
+			try:
+				if self._pending is None:
+					self._running = False
+					return
+				generation, func, callback, progress = self._pending
+				self._pending = None
+			finally:
+				self._lock.release()
+
+			try:
+				if progress is None:
+					result, error = func(), None
+				else:
+					result, error = func(self._reporter(generation, progress)), None
+			except Exception, err:
+				result, error = None, err
+
+			self._deliver(self._finish, generation, callback, result, error)
+
+	def _reporter(self, generation, progress):
+		def report(item):
+			self._deliver(self._finish, generation, progress, item)
+		return report
+
+	def _finish(self, generation, callback, *args):
+		# back on the main loop, a newer submit or a cancel makes this stale
+		if generation == self._generation:
+			callback(*args)
+		return False
+
+
+def batched(report, interval=0.1):
+	"""
+	A function that gathers items and passes them on to report as a list at
+	most every interval seconds, so a stream of thousands of items costs the
+	main loop a handful of calls.  Items gathered after the last report are
+	left for the job's final result.
+	"""
+
+	items = []
+	last = [time.time()]
+
+	def add(item):
+		items.append(item)
+		now = time.time()
+		if now - last[0] >= interval:
+			report(items[:])
+			del items[:]
+			last[0] = now
+
+	return add
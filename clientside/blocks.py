@@ -0,0 +1,166 @@
+# Copyright 2011 Trent Richardson
+#
+# This file is part of Gedit Clientside Plugin.
+#
+# Gedit Clientside Plugin is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gedit Clientside Plugin is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gedit Clientside Plugin. If not, see <http://www.gnu.org/licenses/>.
+
+import re
+
+# what the scan stops at, the text in between is skipped by the regex engine
+_CSS_TOKEN = re.compile(r'/\*|["\'{};]')
+_JS_TOKEN = re.compile(r'[/"\'`{}()\[\];]')
+
+# the rest of a string from its opening quote, up to the end of the line
+# when it is not closed
+_STRINGS = {
+	'"': re.compile(r'"(?:[^"\\\n]|\\.)*"?', re.S),
+	"'": re.compile(r"'(?:[^'\\\n]|\\.)*'?", re.S),
+	'`': re.compile(r'`(?:[^`\\]|\\.)*`?', re.S),
+}
+_JS_REGEX = re.compile(r'/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\]?)*/?')
+
+_NONSPACE = re.compile(r'\S')
+_NEXT = re.compile(r'\s*(\w+|\S)')
+
+# a / after these starts a regex rather than dividing
+_REGEX_AFTER = '(,=:[!&|?{};+-*%<>~^'
+_REGEX_KEYWORDS = ('return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw', 'case', 'do', 'else')
+
+# a } followed by these is not the end of the statement
+_CONTINUATION = '.,()[]?:+-*/%&|=<>!^;'
+_CONTINUATION_KEYWORDS = ('else', 'catch', 'finally')
+
+
+def _regex_allowed(text, i):
+	j = i - 1
+	while j >= 0 and text[j] in ' \t\r\n':
+		j -= 1
+	if j < 0 or text[j] in _REGEX_AFTER:
+		return True
+
+	word_end = j + 1
+	while j >= 0 and (text[j].isalnum() or text[j] in '_$'):
+		j -= 1
+	return text[j + 1:word_end] in _REGEX_KEYWORDS
+
+
+def _continues(text, i, do_block):
+	# whether the statement goes on after the } that ends at i
+	m = _NEXT.match(text, i)
+	if m is None:
+		return False
+
+	word = m.group(1)
+	if word in _CONTINUATION_KEYWORDS:
+		return True
+	if word == 'while':
+		return do_block
+	if text[m.start(1):m.start(1) + 2] in ('//', '/*'):
+		return False
+	return len(word) == 1 and word in _CONTINUATION
+
+
+def _skip_space(text, pos):
+	m = _NONSPACE.search(text, pos)
+	if m is None:
+		return len(text)
+	return m.start()
+
+
+def top_level_blocks(text, lang, until=None):
+	"""
+	The (start, end) of each top-level block of text in order: a rule,
+	at-rule or declaration for lang 'css', a statement or function for 'js'.
+	Whitespace between blocks belongs to neither, comments go with the block
+	after them.  With until the scan stops at the first block that ends at or
+	past that offset.
+	"""
+
+	js = lang == 'js'
+	token = _CSS_TOKEN
+	if js:
+		token = _JS_TOKEN
+
+	blocks = []
+	depth = 0
+	start = _skip_space(text, 0)
+	pos = start
+
+	while True:
+		m = token.search(text, pos)
+		if m is None:
+			break
+
+		i = m.start()
+		c = text[i]
+		pos = i + 1
+		end = None
+
+		if c == '/':
+			if text[i + 1:i + 2] == '*':
+				pos = text.find('*/', i + 2)
+				if pos < 0:
+					pos = len(text)
+				else:
+					pos += 2
+			elif text[i + 1:i + 2] == '/':
+				pos = text.find('\n', i)
+				if pos < 0:
+					pos = len(text)
+			elif _regex_allowed(text, i):
+				pos = _JS_REGEX.match(text, i).end()
+		elif c in _STRINGS:
+			pos = _STRINGS[c].match(text, i).end()
+		elif c in '{([':
+			depth += 1
+		elif c in '})]':
+			depth = max(depth - 1, 0)
+			if c == '}' and depth == 0 and not (js and _continues(text, pos, text[start:start + 2] == 'do')):
+				end = pos
+		elif c == ';' and depth == 0:
+			end = pos
+
+		if end is not None:
+			blocks.append((start, end))
+			if until is not None and end >= until:
+				return blocks
+			start = _skip_space(text, end)
+			pos = start
+
+	# a last statement with no ; after it
+	if start < len(text):
+		blocks.append((start, start + len(text[start:].rstrip())))
+
+	return blocks
+
+
+def block_around(text, offset, lang):
+	"""
+	The (start, end) of the top-level block of text that offset is in.  Between
+	blocks it is the one ending on the same line, or else the next one.  None
+	when text has no blocks.
+	"""
+
+	blocks = top_level_blocks(text, lang, offset)
+	if not blocks:
+		return None
+
+	start, end = blocks[-1]
+	if start <= offset or len(blocks) == 1:
+		return start, end
+
+	before = blocks[-2]
+	if '\n' not in text[before[1]:offset]:
+		return before
+	return start, end
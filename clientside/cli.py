@@ -0,0 +1,410 @@
+# Copyright 2011 Trent Richardson
+#
+# This file is part of Gedit Clientside Plugin.
+#
+# Gedit Clientside Plugin is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gedit Clientside Plugin is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gedit Clientside Plugin. If not, see <http://www.gnu.org/licenses/>.
+
+# Headless front end for the plugin's tools, for build scripts and CI:
+#
+#     python clientside/cli.py minify [options] PATH...
+#     python clientside/cli.py format [options] PATH...
+#     python clientside/cli.py lint [options] PATH...
+#     python clientside/cli.py gzip [options] PATH...
+#     python clientside/cli.py build [options] PATH...
+#     python clientside/cli.py batch [options] PATH...
+#
+# build writes name.min.js/name.min.css and a .gz of it for every file, or
+# one bundle and its .gz with --bundle, skipping outputs newer than their
+# inputs and printing the original, minified and gzipped sizes.  batch is
+# the plugin's Batch Minify, see batch_main.
+#
+# Directories are searched for .js and .css files and the files are spread
+# over a pool of processes.  Settings are read from the plugin's defaults.pkl
+# so the output matches what the menu items produce.
+
+import os
+import re
+import sys
+import json
+import time
+import optparse
+import multiprocessing
+
+from nodeworker import NodeWorker
+from tools import CONFIG_STORE, read_settings, node_limits, lint_options
+from tools import min_path, build, build_options, build_report, minify_file, dedupe_batch, dedupe_report, join_batch
+from pgzip import compress_file
+from resultcache import ResultCache
+from tools import minify_js, minify_css, format_js, format_css, lint_js, lint_css
+
+COMMANDS = ('minify', 'format', 'lint', 'gzip', 'build', 'batch')
+EXTENSIONS = ('.js', '.css')
+
+# each pool process starts its own node worker the first time it needs one
+_worker = None
+_settings = None
+_output_dir = None
+_pooled = False
+
+
+def _init_process(settings, output_dir, pooled=True):
+	global _settings, _output_dir, _pooled
+	_settings = settings
+	_output_dir = output_dir
+	_pooled = pooled
+
+
+def _gzip_threads():
+	# files are already spread over processes, blocks only go to threads without a pool
+	if _pooled:
+		return 1
+	return int(_settings['gzip_threads']) or None
+
+
+def _mangle():
+	return _settings['mangle_js'] == 'true'
+
+
+def _optimize():
+	return _settings['optimize_css'] == 'true'
+
+
+def _build_cache():
+	# where builds are recorded with the settings they were made with
+	return ResultCache(max_size=int(_settings['cache_size']))
+
+
+def _node_worker():
+	global _worker
+	if _worker is None:
+		_worker = NodeWorker(_settings['nodejs'], *node_limits(_settings))
+	return _worker
+
+
+def find_files(paths, command):
+	"""The files named in paths, with directories searched for .js and .css files."""
+
+	files = []
+	for path in paths:
+		if not os.path.isdir(path):
+			files.append(path)
+			continue
+
+		for root, dirs, names in os.walk(path):
+			dirs.sort()
+			for name in sorted(names):
+				base, ext = os.path.splitext(name)
+				if ext not in EXTENSIONS:
+					continue
+				# files we wrote ourselves are skipped when walking a directory
+				if command != 'gzip' and base.endswith('.min'):
+					continue
+				files.append(os.path.join(root, name))
+	return files
+
+
+def _output_path(path, suffix=''):
+	if _output_dir:
+		return os.path.join(_output_dir, os.path.basename(path) + suffix)
+	return path + suffix
+
+
+def _read(path):
+	f = open(path, 'rb')
+	try:
+		return f.read()
+	finally:
+		f.close()
+
+
+def _write(path, data):
+	f = open(path, 'wb')
+	try:
+		f.write(data)
+	finally:
+		f.close()
+
+
+def _minified(code, is_js):
+	if is_js:
+		return minify_js(code, _mangle())
+	return minify_css(code, _optimize())
+
+
+def _minify(path, code, is_js):
+	base, ext = os.path.splitext(path)
+	out = _output_path(base + '.min' + ext)
+	_write(out, _minified(code, is_js))
+	return out, []
+
+
+def _format(path, code, is_js):
+	out = _output_path(path)
+	if is_js:
+		_write(out, format_js(code, _settings, _node_worker()))
+	else:
+		_write(out, format_css(code, _settings))
+	return out, []
+
+
+def _lint(path, code, is_js):
+	if is_js:
+		return None, lint_js(code, _node_worker(), lint_options('js', _settings))
+	return None, lint_css(code, _node_worker(), lint_options('css', _settings))
+
+
+def _gzip(path, code, is_js):
+	out = _output_path(path, '.gz')
+	compress_file(out, code, int(_settings['gzip_level']), _gzip_threads())
+	return out, []
+
+
+def _build(path, code, is_js):
+	out = _output_path(min_path(path))
+	sizes = build([path], out, lambda: _minified(code, is_js),
+		int(_settings['gzip_level']), _gzip_threads(), build_options(_settings), _build_cache())
+	return build_report(out, sizes), []
+
+
+_handlers = { 'minify': _minify, 'format': _format, 'lint': _lint, 'gzip': _gzip, 'build': _build }
+
+
+def _error_text(err):
+	# jsmin's errors have no message, UnterminatedComment -> Unterminated comment
+	return str(err) or re.sub(r'([a-z])([A-Z])', r'\1 \2', err.__class__.__name__).capitalize()
+
+
+def run_file(args):
+	"""Run one command on one file in a pool process.  Returns (path, output, issues, seconds, error)."""
+
+	command, path = args
+	start = time.time()
+	try:
+		code = _read(path)
+		out, issues = _handlers[command](path, code, path.endswith('.js'))
+	except Exception, err:
+		# a file that can't be read, or that node or a minifier chokes on (an
+		# unterminated string, comment or regex), fails on its own
+		return path, None, [], time.time() - start, _error_text(err)
+	return path, out, issues, time.time() - start, None
+
+
+def main(argv=None):
+	usage = "usage: %prog [options] {" + "|".join(COMMANDS) + "} PATH..."
+	oparser = optparse.OptionParser(usage=usage, prog="clientside")
+	oparser.add_option("-j", "--jobs", type="int", default=multiprocessing.cpu_count(),
+		help="Number of files to work on at once (default: number of cpus)")
+	oparser.add_option("-o", "--output-dir", default=None,
+		help="Write output files here instead of next to the input (minify, format, gzip)")
+	oparser.add_option("-b", "--bundle", default=None,
+		help="For build, minify the .js or .css files (whichever the bundle name ends in) into this one bundle")
+	oparser.add_option("-s", "--settings", default=CONFIG_STORE,
+		help="Plugin settings file to read (default: the plugin's defaults.pkl)")
+	oparser.add_option("--nodejs", default=None,
+		help="Node.js command, overrides the settings file")
+	oparser.add_option("--timeout", type="float", default=None,
+		help="Seconds a lint or format may run, overrides the settings file")
+	oparser.add_option("--max-issues", type="int", default=None,
+		help="Stop linting a file after this many issues, 0 for no limit")
+	oparser.add_option("-l", "--level", type="int", default=None,
+		help="gzip compression level 0-9 for gzip and build, overrides the settings file")
+	oparser.add_option("--indent-size", default=None,
+		help="Indent size for format, overrides the settings file")
+	oparser.add_option("--indent-char", default=None,
+		help="Indent character for format, overrides the settings file")
+	oparser.add_option("--braces-on-own-line", action="store_true", default=None,
+		help="Put braces on their own line when formatting")
+	oparser.add_option("--format-engine", choices=['auto', 'python', 'node'], default=None,
+		help="Format JS in process (python), with node, or whichever is faster for the file (auto)")
+	oparser.add_option("--mangle", action="store_true", default=None,
+		help="Shorten the local names of functions when minifying JS")
+	oparser.add_option("--optimize", action="store_true", default=None,
+		help="Merge rules and collapse shorthands when minifying CSS")
+	oparser.add_option("-q", "--quiet", action="store_true", default=False,
+		help="Do not print per file timings")
+
+	(options, args) = oparser.parse_args(argv)
+	if len(args) < 2 or args[0] not in COMMANDS:
+		oparser.error("a command (" + ", ".join(COMMANDS) + ") and at least one path are required")
+
+	command = args[0]
+	settings = read_settings(options.settings)
+	if options.nodejs is not None:
+		settings['nodejs'] = options.nodejs
+	if options.timeout is not None:
+		settings['node_timeout'] = options.timeout
+	if options.max_issues is not None:
+		settings['lint_max_issues'] = options.max_issues
+	if options.level is not None:
+		settings['gzip_level'] = options.level
+	if options.indent_size is not None:
+		settings['indent_size'] = options.indent_size
+	if options.indent_char is not None:
+		settings['indent_char'] = options.indent_char.decode('string_escape')
+	if options.braces_on_own_line:
+		settings['braces_on_own_line'] = 'true'
+	if options.format_engine is not None:
+		settings['format_js_engine'] = options.format_engine
+	if options.mangle:
+		settings['mangle_js'] = 'true'
+	if options.optimize:
+		settings['optimize_css'] = 'true'
+
+	if options.output_dir and not os.path.isdir(options.output_dir):
+		os.makedirs(options.output_dir)
+
+	files = find_files(args[1:], command)
+	jobs = [(command, path) for path in files]
+
+	start = time.time()
+	problems = 0
+	errors = 0
+
+	if command == 'build' and options.bundle:
+		return build_bundle_main(files, options, settings, start)
+	if command == 'batch':
+		return batch_main(files, options, settings)
+
+	if options.jobs > 1 and len(jobs) > 1:
+		pool = multiprocessing.Pool(min(options.jobs, len(jobs)), _init_process, (settings, options.output_dir))
+		results = pool.imap(run_file, jobs)
+	else:
+		pool = None
+		_init_process(settings, options.output_dir, False)
+		results = (run_file(job) for job in jobs)
+
+	try:
+		# imap hands results back in the order the files were found
+		for path, out, issues, seconds, error in results:
+			if error:
+				errors += 1
+				print >> sys.stderr, "%s: error: %s" % (path, error)
+				continue
+
+			for e in issues:
+				print "%s:%d:%d: %s" % (path, e['line'], e['char'], e['text'])
+			problems += len(issues)
+
+			if command == 'build':
+				print out
+				out = None
+
+			if not options.quiet:
+				print >> sys.stderr, "%8.3fs  %s%s" % (seconds, path, out and " -> " + out or "")
+	finally:
+		if pool is not None:
+			pool.close()
+			pool.join()
+
+	if not options.quiet:
+		print >> sys.stderr, "%8.3fs  total, %d file(s), %d problem(s), %d error(s)" % (
+			time.time() - start, len(files), problems, errors)
+
+	if errors:
+		return 2
+	if problems:
+		return 1
+	return 0
+
+
+def _minify_file(args):
+	return minify_file(*args)
+
+
+def build_bundle_main(files, options, settings, start):
+	ext = os.path.splitext(options.bundle)[1]
+	files = [path for path in files if path.endswith(ext)]
+	filter_type = ext[1:]
+	mangle_names = settings['mangle_js'] == 'true'
+	optimize_rules = settings['optimize_css'] == 'true'
+	deduped = []
+
+	def minify():
+		if options.jobs > 1 and len(files) > 1:
+			pool = multiprocessing.Pool(min(options.jobs, len(files)))
+			try:
+				results = pool.map(_minify_file, [(path, filter_type, mangle_names, optimize_rules) for path in files])
+			finally:
+				pool.close()
+				pool.join()
+		else:
+			results = [minify_file(path, filter_type, mangle_names, optimize_rules) for path in files]
+		if filter_type == 'css':
+			results, saved = dedupe_batch(results)
+			deduped.append(saved)
+		return join_batch(files, results).strip()
+
+	try:
+		sizes = build(files, options.bundle, minify, int(settings['gzip_level']), int(settings['gzip_threads']) or None,
+			build_options(settings), ResultCache(max_size=int(settings['cache_size'])))
+	except Exception, err:
+		print >> sys.stderr, "%s: error: %s" % (options.bundle, _error_text(err))
+		return 2
+
+	print build_report(options.bundle, sizes)
+	if deduped:
+		print dedupe_report(deduped[0])
+	if not options.quiet:
+		print >> sys.stderr, "%8.3fs  total, %d file(s)" % (time.time() - start, len(files))
+	return 0
+
+
+def _batch_file(args):
+	i, path, mangle_names, optimize_rules = args
+	try:
+		return i, minify_file(path, path.endswith('.css') and 'css' or 'js', mangle_names, optimize_rules), None
+	except Exception, err:
+		return i, None, _error_text(err)
+
+
+def batch_main(files, options, settings):
+	"""
+	Minify files for the plugin's Batch Minify (tools.BatchMinify), writing a
+	frame to stdout for each file as soon as it is done: a line with the
+	lengths of the json and the code, the json { "index", "charset", "error" }
+	and the minified code.  index is the file's position in files.
+	"""
+
+	mangle_names = settings['mangle_js'] == 'true'
+	optimize_rules = settings['optimize_css'] == 'true'
+	jobs = [(i, path, mangle_names, optimize_rules) for i, path in enumerate(files)]
+
+	if options.jobs > 1 and len(jobs) > 1:
+		pool = multiprocessing.Pool(min(options.jobs, len(jobs)))
+		results = pool.imap_unordered(_batch_file, jobs)
+	else:
+		pool = None
+		results = (_batch_file(job) for job in jobs)
+
+	errors = 0
+	try:
+		for i, result, error in results:
+			charset, code = result or ('', '')
+			data = json.dumps({ 'index': i, 'charset': charset, 'error': error })
+			sys.stdout.write('%d %d\n%s%s' % (len(data), len(code), data, code))
+			sys.stdout.flush()
+			if error:
+				errors += 1
+	finally:
+		if pool is not None:
+			pool.close()
+			pool.join()
+
+	if errors:
+		return 2
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
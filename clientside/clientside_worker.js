@@ -0,0 +1,239 @@
+// Copyright 2011 Trent Richardson
+//
+// This file is part of Gedit Clientside Plugin.
+//
+// Gedit Clientside Plugin is free software: you can redistribute it and/or modify
+// it under the terms of the GNU General Public License as published by
+// the Free Software Foundation, either version 3 of the License, or
+// any later version.
+//
+// Gedit Clientside Plugin is distributed in the hope that it will be useful,
+// but WITHOUT ANY WARRANTY; without even the implied warranty of
+// MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+// GNU General Public License for more details.
+//
+// You should have received a copy of the GNU General Public License
+// along with Gedit Clientside Plugin. If not, see <http://www.gnu.org/licenses/>.
+
+// Long lived worker for the node backed tools (JSLint, CSSLint, JS-Beautify).
+//
+// Every request and every response is one frame on stdin/stdout:
+//
+//     <byte length of json> <byte length of text>\n<utf8 json><utf8 text>
+//
+// The text is the document for a request and a formatted document for a
+// response, sent as is so large documents are never escaped into json.
+// A request's json looks like {"op": "lint_js", "options": {}} and the
+// response's json is {"ok": true, "result": ...}, {"ok": true, "text": true}
+// when the result is the text, or {"ok": false, "error": "..."}.  The lint
+// ops send each issue in a frame of its own, {"ok": true, "item": {...}}, the
+// moment the linter finds it, ahead of the final response.  The engines are
+// loaded the first time they are needed and then stay in memory for the
+// life of the process.
+
+var path = require('path');
+
+var engine_files = {
+	jslint: ['jslint_node', 'JSLINT'],
+	csslint: ['csslint-node', 'CSSLint'],
+	beautify: ['jsbeautify/beautify', 'js_beautify']
+};
+var engines = {};
+
+// JSLint and CSSLint collect their issues in arrays, these hooks hand each
+// issue to on_issue the moment it is pushed so it can be sent straight away
+var on_issue = null;
+var STOP = {};
+
+function watch(list) {
+	list.push = function () {
+		for (var i = 0; i < arguments.length; i++) {
+			if (arguments[i] && on_issue) {
+				on_issue(arguments[i]);
+			}
+		}
+		return Array.prototype.push.apply(this, arguments);
+	};
+	return list;
+}
+
+var engine_hooks = {
+	jslint: function (JSLINT) {
+		// every run starts with JSLINT.errors = []
+		var errors = [];
+		Object.defineProperty(JSLINT, 'errors', {
+			get: function () { return errors; },
+			set: function (list) { errors = watch(list); },
+			configurable: true
+		});
+	},
+
+	csslint: function (CSSLint) {
+		// every rule is handed the reporter of the run before parsing starts
+		CSSLint.getRules().forEach(function (rule) {
+			var init = rule.init;
+			rule.init = function (parser, reporter) {
+				if (!reporter.messages.watched) {
+					watch(reporter.messages).watched = true;
+				}
+				return init.call(this, parser, reporter);
+			};
+		});
+	}
+};
+
+function engine(name) {
+	if (!engines.hasOwnProperty(name)) {
+		var file = engine_files[name];
+		engines[name] = require(path.join(__dirname, file[0]))[file[1]];
+		if (engine_hooks.hasOwnProperty(name)) {
+			engine_hooks[name](engines[name]);
+		}
+	}
+	return engines[name];
+}
+
+var ops = {
+	lint_js: function (code, options, emit) {
+		var JSLINT = engine('jslint');
+		var rules = {};
+		var count = 0;
+
+		for (var name in options.rules || {}) {
+			rules[name] = options.rules[name];
+		}
+		rules.maxerr = options.max_issues || Infinity;
+
+		on_issue = function (e) {
+			count++;
+			emit({
+				line: e.line || 1,
+				character: e.character || 1,
+				reason: String(e.reason),
+				severity: 'error',
+				rule: e.raw || '',
+				evidence: e.evidence || ''
+			});
+		};
+		try {
+			JSLINT(code, rules);
+		} finally {
+			on_issue = null;
+		}
+		return { count: count };
+	},
+
+	lint_css: function (code, options, emit) {
+		var CSSLint = engine('csslint');
+		var max = options.max_issues || 0;
+		var count = 0;
+		var line = 1;
+
+		on_issue = function (msg) {
+			if (max && count >= max) {
+				line = msg.line || line;
+				throw STOP;
+			}
+			count++;
+			emit({
+				line: msg.line || 1,
+				character: msg.col || 1,
+				reason: msg.type + ': ' + msg.message,
+				severity: msg.type,
+				rule: msg.rule ? msg.rule.id : '',
+				evidence: msg.evidence || '',
+				rollup: !!msg.rollup
+			});
+		};
+		try {
+			// no ruleset means CSSLint's defaults, an empty one runs no rules
+			CSSLint.verify(code, options.rules);
+		} catch (err) {
+			if (err !== STOP) {
+				throw err;
+			}
+			emit({ line: line, character: 1, reason: 'info: Stopped after ' + max + ' issues.',
+				severity: 'info', rule: '', evidence: '', rollup: false });
+		} finally {
+			on_issue = null;
+		}
+		return { count: count };
+	},
+
+	format_js: function (code, options) {
+		return engine('beautify')(code, options);
+	}
+};
+
+function send(body, text) {
+	var data = Buffer.from(JSON.stringify(body), 'utf8');
+	var raw = Buffer.from(text || '', 'utf8');
+
+	process.stdout.write(data.length + ' ' + raw.length + '\n');
+	process.stdout.write(data);
+	process.stdout.write(raw);
+}
+
+function handle(request, code) {
+	try {
+		if (!ops.hasOwnProperty(request.op)) {
+			throw new Error('Unknown operation: ' + request.op);
+		}
+		var result = ops[request.op](code, request.options || {}, function (item) {
+			send({ ok: true, item: item });
+		});
+		if (typeof result === 'string') {
+			send({ ok: true, text: true }, result);
+		} else {
+			send({ ok: true, result: result });
+		}
+	} catch (err) {
+		send({ ok: false, error: String(err && err.message ? err.message : err) });
+	}
+}
+
+// chunks are only joined once a whole frame has arrived, so a large
+// document is copied once instead of once per chunk
+var chunks = [];
+var buffered = 0;
+var frame = null;
+
+process.stdin.on('data', function (chunk) {
+	chunks.push(chunk);
+	buffered += chunk.length;
+
+	while (buffered) {
+		if (frame === null) {
+			var head = Buffer.concat(chunks, buffered);
+			var newline = head.indexOf(10);
+			chunks = [head];
+			if (newline < 0) {
+				break;
+			}
+
+			var sizes = head.toString('ascii', 0, newline).split(' ');
+			frame = { json: parseInt(sizes[0], 10), text: parseInt(sizes[1], 10) };
+			chunks = [head.slice(newline + 1)];
+			buffered = head.length - newline - 1;
+		}
+
+		if (buffered < frame.json + frame.text) {
+			break;
+		}
+
+		var data = Buffer.concat(chunks, buffered);
+		var request = JSON.parse(data.toString('utf8', 0, frame.json));
+		var code = data.toString('utf8', frame.json, frame.json + frame.text);
+		var rest = data.slice(frame.json + frame.text);
+
+		chunks = [rest];
+		buffered = rest.length;
+		frame = null;
+
+		handle(request, code);
+	}
+});
+
+process.stdin.on('end', function () {
+	process.exit(0);
+});
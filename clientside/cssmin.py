@@ -7,40 +7,51 @@
 from StringIO import StringIO # The pure-Python StringIO supports unicode.
 import re
 
+from passstats import PassStats
+
+
+_CHUNK_MARK = re.compile(r"[{}]|/\*|\*/")
+_SPACES = re.compile(r"\s*")
+
 
 class CSSMin:
+	"""
+	CSS minifier that runs each transformation as its own regex pass over
+	the stylesheet.
+	
+	While `stats` is a `PassStats` every pass is timed and its matches
+	counted into it; `profile` does that for one stylesheet.
+	"""
+	
+	def __init__(self):
+		self.stats = None
+	
+	
+	def _pass(self, func, css, *args):
+		if self.stats is None:
+			return func(css, *args)
+		return self.stats.timed(func.__name__, func, css, *args)
+	
+	
+	def _sub(self, pattern, repl, css):
+		# `re.sub`, counting the replacements when profiling.
+		if self.stats is None:
+			return re.sub(pattern, repl, css)
+		css, matches = re.subn(pattern, repl, css)
+		self.stats.count(matches)
+		return css
+	
+	
+	def _replace(self, css, old, new):
+		if self.stats is not None:
+			self.stats.count(css.count(old))
+		return css.replace(old, new)
+	
+	
 	def remove_comments(self, css):
 		"""Remove all CSS comment blocks."""
 		
-		iemac = False
-		preserve = False
-		comment_start = css.find("/*")
-		while comment_start >= 0:
-			# Preserve comments that look like `/*!...*/`.
-			# Slicing is used to make sure we don"t get an IndexError.
-			preserve = css[comment_start + 2:comment_start + 3] == "!"
-			
-			comment_end = css.find("*/", comment_start + 2)
-			if comment_end < 0:
-				if not preserve:
-					css = css[:comment_start]
-					break
-			elif comment_end >= (comment_start + 2):
-				if css[comment_end - 1] == "\\":
-					# This is an IE Mac-specific comment; leave this one and the
-					# following one alone.
-					comment_start = comment_end + 2
-					iemac = True
-				elif iemac:
-					comment_start = comment_end + 2
-					iemac = False
-				elif not preserve:
-					css = css[:comment_start] + css[comment_end + 2:]
-				else:
-					comment_start = comment_end + 2
-			comment_start = css.find("/*", comment_start)
-	    
-		return css
+		return ''.join(self.read_uncommented(StringIO(css), len(css) or 1))
 	
 	
 	def remove_unnecessary_whitespace(self, css):
@@ -55,33 +66,30 @@ class CSSMin:
 			translated back again later.
 			"""
 			
-			regex = re.compile(r"(^|\})(([^\{\:])+\:)+([^\{]*\{)")
-			match = regex.search(css)
-			while match:
-				css = ''.join([
-							css[:match.start()],
-							match.group().replace(":", "___PSEUDOCLASSCOLON___"),
-							css[match.end():]])
-				match = regex.search(css)
-			return css
+			# Each match runs up to the next `{`, so only the text up to the
+			# last `{` is searched and every character is looked at once.
+			last_brace = css.rfind("{") + 1
+			regex = re.compile(r"(^|\})[^\{\:][^\{]*\{")
+			return self._sub(regex, lambda match: match.group().replace(":", "___PSEUDOCLASSCOLON___"),
+				css[:last_brace]) + css[last_brace:]
 		
 		css = pseudoclasscolon(css)
 		# Remove spaces from before things.
-		css = re.sub(r"\s+([!{};:>+\(\)\],])", r"\1", css)
+		css = self._sub(r"\s+([!{};:>+\(\)\],])", r"\1", css)
 		
 		# If there is a `@charset`, then only allow one, and move to the beginning.
-		css = re.sub(r"^(.*)(@charset \"[^\"]*\";)", r"\2\1", css)
-		css = re.sub(r"^(\s*@charset [^;]+;\s*)+", r"\1", css)
+		css = self._sub(r"^(.*)(@charset \"[^\"]*\";)", r"\2\1", css)
+		css = self._sub(r"^(\s*@charset [^;]+;\s*)+", r"\1", css)
 		
 		# Put the space back in for a few cases, such as `@media screen` and
 		# `(-webkit-min-device-pixel-ratio:0)`.
-		css = re.sub(r"\band\(", "and (", css)
+		css = self._sub(r"\band\(", "and (", css)
 		
 		# Put the colons back.
-		css = css.replace('___PSEUDOCLASSCOLON___', ':')
+		css = self._replace(css, '___PSEUDOCLASSCOLON___', ':')
 		
 		# Remove spaces from after things.
-		css = re.sub(r"([!{}:;>+\(\[,])\s+", r"\1", css)
+		css = self._sub(r"([!{}:;>+\(\[,])\s+", r"\1", css)
 		
 		return css
 	
@@ -89,43 +97,40 @@ class CSSMin:
 	def remove_unnecessary_semicolons(self, css):
 		"""Remove unnecessary semicolons."""
 		
-		return re.sub(r";+\}", "}", css)
+		return self._sub(r";+\}", "}", css)
 	
 	
 	def remove_empty_rules(self, css):
 		"""Remove empty rules."""
 		
-		return re.sub(r"[^\}\{]+\{\}", "", css)
+		return self._sub(r"[^\}\{]+\{\}", "", css)
 	
 	
 	def normalize_rgb_colors_to_hex(self, css):
 		"""Convert `rgb(51,102,153)` to `#336699`."""
 		
-		regex = re.compile(r"rgb\s*\(\s*([0-9,\s]+)\s*\)")
-		match = regex.search(css)
-		while match:
+		def to_hex(match):
 			colors = match.group(1).split(",")
-			hexcolor = '#%.2x%.2x%.2x' % map(int, colors)
-			css = css.replace(match.group(), hexcolor)
-			match = regex.search(css)
-		return css
+			return '#%.2x%.2x%.2x' % tuple(map(int, colors))
+		
+		return self._sub(r"rgb\s*\(\s*([0-9,\s]+)\s*\)", to_hex, css)
 	
 	
 	def condense_zero_units(self, css):
 		"""Replace `0(px, em, %, etc)` with `0`."""
 		
-		return re.sub(r"([\s:])(0)(px|em|%|in|cm|mm|pc|pt|ex)", r"\1\2", css)
+		return self._sub(r"([\s:])(0)(px|em|%|in|cm|mm|pc|pt|ex)", r"\1\2", css)
 	
 	
 	def condense_multidimensional_zeros(self, css):
 		"""Replace `:0 0 0 0;`, `:0 0 0;` etc. with `:0;`."""
 		
-		css = css.replace(":0 0 0 0;", ":0;")
-		css = css.replace(":0 0 0;", ":0;")
-		css = css.replace(":0 0;", ":0;")
+		css = self._replace(css, ":0 0 0 0;", ":0;")
+		css = self._replace(css, ":0 0 0;", ":0;")
+		css = self._replace(css, ":0 0;", ":0;")
 		
 		# Revert `background-position:0;` to the valid `background-position:0 0;`.
-		css = css.replace("background-position:0;", "background-position:0 0;")
+		css = self._replace(css, "background-position:0;", "background-position:0 0;")
 		
 		return css
 	
@@ -133,73 +138,258 @@ class CSSMin:
 	def condense_floating_points(self, css):
 		"""Replace `0.6` with `.6` where possible."""
 		
-		return re.sub(r"(:|\s)0+\.(\d+)", r"\1.\2", css)
+		return self._sub(r"(:|\s)0+\.(\d+)", r"\1.\2", css)
 	
 	
 	def condense_hex_colors(self, css):
 		"""Shorten colors from #AABBCC to #ABC where possible."""
 		
-		regex = re.compile(r"([^\"'=\s])(\s*)#([0-9a-fA-F])([0-9a-fA-F])([0-9a-fA-F])([0-9a-fA-F])([0-9a-fA-F])([0-9a-fA-F])")
-		match = regex.search(css)
-		while match:
+		def condense(match):
 			first = match.group(3) + match.group(5) + match.group(7)
 			second = match.group(4) + match.group(6) + match.group(8)
 			if first.lower() == second.lower():
-				css = css.replace(match.group(), match.group(1) + match.group(2) + '#' + first)
-				match = regex.search(css, match.end() - 3)
-			else:
-				match = regex.search(css, match.end())
-		return css
+				return match.group(1) + match.group(2) + '#' + first
+			return match.group()
+		
+		return self._sub(r"([^\"'=\s])(\s*)#([0-9a-fA-F])([0-9a-fA-F])([0-9a-fA-F])([0-9a-fA-F])([0-9a-fA-F])([0-9a-fA-F])", condense, css)
 	
 	
 	def condense_whitespace(self, css):
 		"""Condense multiple adjacent whitespace characters into one."""
 		
-		return re.sub(r"\s+", " ", css)
+		return self._sub(r"\s+", " ", css)
 	
 	
 	def condense_semicolons(self, css):
 		"""Condense multiple adjacent semicolon characters into one."""
 		
-		return re.sub(r";;+", ";", css)
+		return self._sub(r";;+", ";", css)
 	
 	
-	def wrap_css_lines(self, css, line_length):
-		"""Wrap the lines of the given CSS to an approximate length."""
+	def split_css_lines(self, css, line_length, column=0):
+		"""
+		Find the lines of about `line_length` characters in the given CSS, when
+		`column` characters of the first line were already written.  Returns
+		the finished lines and where the unfinished one starts.
+		"""
 		
 		lines = []
-		line_start = 0
-		for i, char in enumerate(css):
+		line_start = -column
+		close = css.find('}')
+		while close >= 0:
 			# It's safe to break after `}` characters.
-			if char == '}' and (i - line_start >= line_length):
-				lines.append(css[line_start:i + 1])
-				line_start = i + 1
+			if close - line_start >= line_length:
+				lines.append(css[max(line_start, 0):close + 1])
+				line_start = close + 1
+			close = css.find('}', close + 1)
+		return lines, line_start
+	
+	
+	def wrap_css_lines(self, css, line_length):
+		"""Wrap the lines of the given CSS to an approximate length."""
 		
+		lines, line_start = self.split_css_lines(css, line_length)
 		if line_start < len(css):
 			lines.append(css[line_start:])
 		return '\n'.join(lines)
 	
 	
 	def minify(self, css, wrap=None):
-		css = self.remove_comments(css)
-		css = self.condense_whitespace(css)
+		return self.minify_chunk(self._pass(self.remove_comments, css), wrap)[0].strip()
+	
+	
+	def profile(self, css, wrap=None):
+		"""
+		`minify`, also returning a `PassStats` with the wall time, input and
+		output sizes and match count of each pass.
+		"""
+		
+		self.stats = PassStats("CSSMin")
+		try:
+			return self.minify(css, wrap), self.stats
+		finally:
+			self.stats = None
+	
+	
+	def minify_chunk(self, css, wrap=None, column=0):
+		"""
+		Minify a piece of a stylesheet, with the comments already removed,
+		whose output continues a line that is `column` characters long.
+		Returns the output, not stripped and ending in a newline when its last
+		`}` ends a line, and the length of its last line.
+		"""
+		
+		css = self._pass(self.condense_whitespace, css)
 		# A pseudo class for the Box Model Hack
 		# (see http://tantek.com/CSS/Examples/boxmodelhack.html)
 		css = css.replace('"\\"}\\""', "___PSEUDOCLASSBMH___")
-		css = self.remove_unnecessary_whitespace(css)
-		css = self.remove_unnecessary_semicolons(css)
-		css = self.condense_zero_units(css)
-		css = self.condense_multidimensional_zeros(css)
-		css = self.condense_floating_points(css)
-		css = self.normalize_rgb_colors_to_hex(css)
-		css = self.condense_hex_colors(css)
+		css = self._pass(self.remove_unnecessary_whitespace, css)
+		css = self._pass(self.remove_unnecessary_semicolons, css)
+		css = self._pass(self.condense_zero_units, css)
+		css = self._pass(self.condense_multidimensional_zeros, css)
+		css = self._pass(self.condense_floating_points, css)
+		css = self._pass(self.normalize_rgb_colors_to_hex, css)
+		css = self._pass(self.condense_hex_colors, css)
 		if wrap is not None:
-			css = self.wrap_css_lines(css, wrap)
+			lines, line_start = self.split_css_lines(css, wrap, column)
+			lines.append(css[max(line_start, 0):])
+			column = len(css) - line_start
+			css = '\n'.join(lines)
 		css = css.replace("___PSEUDOCLASSBMH___", '"\\"}\\""')
-		css = self.condense_semicolons(css)
-		return css.strip()
-
-
+		css = self._pass(self.condense_semicolons, css)
+		return css, column
+	
+	
+	def read_uncommented(self, instream, block_size=65536):
+		"""
+		Read instream a block at a time and yield its text with the comments
+		removed.  Only an unfinished comment is held back until the next
+		block.
+		"""
+		
+		css = ''
+		iemac = False
+		eof = False
+		while not eof:
+			block = instream.read(block_size)
+			eof = not block
+			css += block
+			
+			pieces = []
+			kept = 0
+			search = 0
+			comment_start = css.find("/*")
+			while comment_start >= 0:
+				if not eof and comment_start + 3 > len(css):
+					break
+				# Preserve comments that look like `/*!...*/`.
+				# Slicing is used to make sure we don"t get an IndexError.
+				preserve = css[comment_start + 2:comment_start + 3] == "!"
+				
+				comment_end = css.find("*/", comment_start + 2)
+				if comment_end < 0:
+					if eof and not preserve:
+						pieces.append(css[kept:comment_start])
+						kept = len(css)
+					break
+				
+				if css[comment_end - 1] == "\\":
+					# This is an IE Mac-specific comment; leave this one and the
+					# following one alone.
+					iemac = True
+				elif iemac:
+					iemac = False
+				elif not preserve:
+					pieces.append(css[kept:comment_start])
+					kept = comment_end + 2
+				search = comment_end + 2
+				comment_start = css.find("/*", search)
+			
+			if eof:
+				stop = len(css)
+			elif comment_start >= 0:
+				stop = comment_start
+			elif css.endswith("/") and len(css) - 1 >= search:
+				# this could be the start of a comment
+				stop = len(css) - 1
+			else:
+				stop = len(css)
+			
+			stop = max(stop, kept)
+			pieces.append(css[kept:stop])
+			css = css[stop:]
+			yield ''.join(pieces)
+	
+	
+	def read_chunks(self, instream, chunk_size=65536):
+		"""
+		Read instream and yield its text, without comments, in chunks of at
+		least chunk_size characters (except for the last one) that can be
+		minified on their own.
+		
+		A chunk ends after a `}` that closes a `{` and the whitespace that
+		follows it, and the next chunk may not start with a `#` or an `rgb()`
+		color.  That keeps the pseudo class, hex color and zero rules from
+		seeing past the end of a chunk.  Preserved comments are never split.
+		"""
+		
+		css = ''
+		scan = 0
+		in_comment = False
+		opened = False
+		split = 0
+		for block in self.read_uncommented(instream, chunk_size):
+			css += block
+			while True:
+				match = _CHUNK_MARK.search(css, scan)
+				if match is None:
+					# the last character could start a comment marker
+					scan = max(scan, len(css) - 1)
+					break
+				
+				mark = match.group()
+				at = match.start()
+				if mark == '/*' or mark == '*/':
+					if in_comment == (mark == '*/'):
+						in_comment = not in_comment
+						scan = at + 2
+					else:
+						scan = at + 1
+					continue
+				
+				if mark == '{':
+					opened = True
+					scan = at + 1
+					continue
+				
+				after = _SPACES.match(css, at + 1).end()
+				if after == len(css) or at + 4 > len(css):
+					scan = at
+					break
+				
+				if opened and not in_comment and css[after] not in '#r' and \
+						css[max(at - 3, 0):at] != '"\\"' and \
+						css[at + 1:at + 4] != '\\""':
+					split = after
+				opened = False
+				scan = at + 1
+			
+			if split >= chunk_size:
+				yield css[:split]
+				css = css[split:]
+				scan -= split
+				split = 0
+		
+		if css:
+			yield css
+	
+	
+	def minify_stream(self, instream, outstream, wrap=None, chunk_size=65536):
+		"""
+		Minify the CSS read from instream into outstream one chunk at a time,
+		so memory use does not grow with the size of the stylesheet.  The
+		output is the same as `minify` gives, except that a `@charset` is only
+		moved to the start of the chunk it is in.
+		"""
+		
+		column = 0
+		started = False
+		spaces = ''
+		for chunk in self.read_chunks(instream, chunk_size):
+			css, column = self.minify_chunk(chunk, wrap, column)
+			if not started:
+				css = css.lstrip()
+				started = bool(css)
+			
+			# whitespace at the end is only written once more output follows
+			stripped = css.rstrip()
+			if stripped:
+				outstream.write(spaces + stripped)
+				spaces = css[len(stripped):]
+			else:
+				spaces += css
+	
+	
 	def format(self, css, brace_new_line=False, tab='\t'):
 		
 		# User pref for brace on new line
@@ -248,7 +438,7 @@ def cssmin_main():
 	import sys
 	
 	p = optparse.OptionParser(
-		prog="cssmin", version=__version__,
+		prog="cssmin",
 		usage="%prog [--wrap N]",
 		description="""Reads raw CSS from stdin, and writes compressed CSS to stdout.""")
 	
@@ -258,7 +448,7 @@ def cssmin_main():
 	
 	options, args = p.parse_args()
 	cm = CSSMin()
-	sys.stdout.write(cm.minify(sys.stdin.read(), wrap=options.wrap))
+	cm.minify_stream(sys.stdin, sys.stdout, wrap=options.wrap)
 
 
 if __name__ == '__main__':
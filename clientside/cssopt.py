@@ -0,0 +1,521 @@
+# Copyright 2011 Trent Richardson
+#
+# This file is part of Gedit Clientside Plugin.
+#
+# Gedit Clientside Plugin is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gedit Clientside Plugin is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gedit Clientside Plugin. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Structural optimizations for css that has been through CSSMin: colors are
+written the shortest way, margin, padding and border longhands collapse
+into their shorthands, earlier copies of a repeated rule are dropped and
+neighbouring rules with the same selector or the same declarations are
+merged.  None of them changes which declaration wins the cascade.  Rules
+inside @media and @supports are optimized too, other at-rules (@font-face,
+@keyframes, @page) are left as they are.
+"""
+
+import re
+
+# what the parser stops at, strings and comments are skipped whole
+_SCAN = re.compile(r'"(?:[^"\\]|\\.)*"?|\'(?:[^\'\\]|\\.)*\'?|/\*.*?(?:\*/|$)|\\.|[{}();]', re.S)
+
+# the pieces of a value the color pass looks at, urls and strings are skipped
+_VALUE_TOKEN = re.compile(r'url\([^)]*\)|"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|#[0-9a-fA-F]+|-?[a-zA-Z_][\w-]*|.', re.S)
+_VENDOR = re.compile(r'^-[a-z]+-')
+_PSEUDO = re.compile(r'::?([\w-]*)')
+_SELECTOR_SKIP = re.compile(r'\\.|"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|\[[^\]]*\]', re.S)
+_IMPORTANT = re.compile(r'\s*!\s*important$', re.I)
+
+# at-rules whose blocks hold ordinary rules
+_GROUPS = frozenset(['@media', '@supports'])
+
+# the properties whose values the color pass rewrites, without vendor prefix
+_COLOR_PROPERTIES = frozenset([
+	'color', 'background', 'background-color', 'background-image',
+	'border', 'border-color', 'border-top', 'border-right', 'border-bottom', 'border-left',
+	'border-top-color', 'border-right-color', 'border-bottom-color', 'border-left-color',
+	'outline', 'outline-color', 'box-shadow', 'text-shadow', 'column-rule', 'column-rule-color',
+	'text-decoration', 'text-decoration-color', 'caret-color', 'fill', 'stroke',
+	'stop-color', 'flood-color', 'lighting-color',
+])
+
+# the names longer than their color, and the colors longer than a name
+_NAME_TO_HEX = {
+	'aliceblue': '#f0f8ff', 'antiquewhite': '#faebd7', 'aquamarine': '#7fffd4',
+	'black': '#000', 'blanchedalmond': '#ffebcd', 'blueviolet': '#8a2be2',
+	'burlywood': '#deb887', 'cadetblue': '#5f9ea0', 'chartreuse': '#7fff00',
+	'chocolate': '#d2691e', 'cornflowerblue': '#6495ed', 'cornsilk': '#fff8dc',
+	'darkblue': '#00008b', 'darkcyan': '#008b8b', 'darkgoldenrod': '#b8860b',
+	'darkgray': '#a9a9a9', 'darkgreen': '#006400', 'darkgrey': '#a9a9a9',
+	'darkkhaki': '#bdb76b', 'darkmagenta': '#8b008b', 'darkolivegreen': '#556b2f',
+	'darkorange': '#ff8c00', 'darkorchid': '#9932cc', 'darksalmon': '#e9967a',
+	'darkseagreen': '#8fbc8f', 'darkslateblue': '#483d8b', 'darkslategray': '#2f4f4f',
+	'darkslategrey': '#2f4f4f', 'darkturquoise': '#00ced1', 'darkviolet': '#9400d3',
+	'deeppink': '#ff1493', 'deepskyblue': '#00bfff', 'dodgerblue': '#1e90ff',
+	'firebrick': '#b22222', 'floralwhite': '#fffaf0', 'forestgreen': '#228b22',
+	'fuchsia': '#f0f', 'gainsboro': '#dcdcdc', 'ghostwhite': '#f8f8ff',
+	'goldenrod': '#daa520', 'greenyellow': '#adff2f', 'honeydew': '#f0fff0',
+	'indianred': '#cd5c5c', 'lavender': '#e6e6fa', 'lavenderblush': '#fff0f5',
+	'lawngreen': '#7cfc00', 'lemonchiffon': '#fffacd', 'lightblue': '#add8e6',
+	'lightcoral': '#f08080', 'lightcyan': '#e0ffff', 'lightgoldenrodyellow': '#fafad2',
+	'lightgray': '#d3d3d3', 'lightgreen': '#90ee90', 'lightgrey': '#d3d3d3',
+	'lightpink': '#ffb6c1', 'lightsalmon': '#ffa07a', 'lightseagreen': '#20b2aa',
+	'lightskyblue': '#87cefa', 'lightslategray': '#789', 'lightslategrey': '#789',
+	'lightsteelblue': '#b0c4de', 'lightyellow': '#ffffe0', 'limegreen': '#32cd32',
+	'magenta': '#f0f', 'mediumaquamarine': '#66cdaa', 'mediumblue': '#0000cd',
+	'mediumorchid': '#ba55d3', 'mediumpurple': '#9370db', 'mediumseagreen': '#3cb371',
+	'mediumslateblue': '#7b68ee', 'mediumspringgreen': '#00fa9a',
+	'mediumturquoise': '#48d1cc', 'mediumvioletred': '#c71585', 'midnightblue': '#191970',
+	'mintcream': '#f5fffa', 'mistyrose': '#ffe4e1', 'moccasin': '#ffe4b5',
+	'navajowhite': '#ffdead', 'olivedrab': '#6b8e23', 'orangered': '#ff4500',
+	'palegoldenrod': '#eee8aa', 'palegreen': '#98fb98', 'paleturquoise': '#afeeee',
+	'palevioletred': '#db7093', 'papayawhip': '#ffefd5', 'peachpuff': '#ffdab9',
+	'powderblue': '#b0e0e6', 'rebeccapurple': '#639', 'rosybrown': '#bc8f8f',
+	'royalblue': '#4169e1', 'saddlebrown': '#8b4513', 'sandybrown': '#f4a460',
+	'seagreen': '#2e8b57', 'seashell': '#fff5ee', 'slateblue': '#6a5acd',
+	'slategray': '#708090', 'slategrey': '#708090', 'springgreen': '#00ff7f',
+	'steelblue': '#4682b4', 'turquoise': '#40e0d0', 'white': '#fff',
+	'whitesmoke': '#f5f5f5', 'yellow': '#ff0', 'yellowgreen': '#9acd32',
+}
+
+_HEX_TO_NAME = {
+	'#000080': 'navy', '#008000': 'green', '#008080': 'teal', '#4b0082': 'indigo',
+	'#800000': 'maroon', '#800080': 'purple', '#808000': 'olive', '#808080': 'gray',
+	'#a0522d': 'sienna', '#a52a2a': 'brown', '#c0c0c0': 'silver', '#cd853f': 'peru',
+	'#d2b48c': 'tan', '#da70d6': 'orchid', '#dda0dd': 'plum', '#ee82ee': 'violet',
+	'#f00': 'red', '#f0e68c': 'khaki', '#f0ffff': 'azure', '#f5deb3': 'wheat',
+	'#f5f5dc': 'beige', '#fa8072': 'salmon', '#faf0e6': 'linen', '#ff6347': 'tomato',
+	'#ff7f50': 'coral', '#ffa500': 'orange', '#ffc0cb': 'pink', '#ffd700': 'gold',
+	'#ffe4c4': 'bisque', '#fffafa': 'snow', '#fffff0': 'ivory',
+}
+
+_BORDER = ('border', 'border-top', 'border-right', 'border-bottom', 'border-left',
+	'border-width', 'border-style', 'border-color')
+
+# shorthand, its longhands in top right bottom left order, and the
+# properties that would also set one of the longhands
+_SHORTHANDS = (
+	('margin', ('margin-top', 'margin-right', 'margin-bottom', 'margin-left'), ('margin',)),
+	('padding', ('padding-top', 'padding-right', 'padding-bottom', 'padding-left'), ('padding',)),
+	('border-width', ('border-top-width', 'border-right-width', 'border-bottom-width',
+		'border-left-width'), _BORDER),
+	('border-style', ('border-top-style', 'border-right-style', 'border-bottom-style',
+		'border-left-style'), _BORDER),
+	('border-color', ('border-top-color', 'border-right-color', 'border-bottom-color',
+		'border-left-color'), _BORDER),
+)
+
+_GLOBAL_VALUES = frozenset(['inherit', 'initial', 'unset', 'revert'])
+
+# the pseudo classes and elements of CSS 2.1 and Selectors Level 3 that every
+# browser knows, a selector with any other one is never merged with another
+_SAFE_PSEUDOS = frozenset([
+	'link', 'visited', 'hover', 'active', 'focus', 'lang', 'first-child', 'last-child',
+	'only-child', 'first-of-type', 'last-of-type', 'only-of-type', 'nth-child',
+	'nth-last-child', 'nth-of-type', 'nth-last-of-type', 'root', 'empty', 'target',
+	'enabled', 'disabled', 'checked', 'not', 'before', 'after', 'first-line', 'first-letter',
+])
+
+
+class OptimizeError(Exception):
+	pass
+
+
+def _block_end(css, pos):
+	# the position after the } that closes the block opened just before pos
+	depth = 1
+	while True:
+		m = _SCAN.search(css, pos)
+		if m is None:
+			raise OptimizeError("Unclosed block")
+		pos = m.end()
+		tok = m.group()
+		if tok == '{':
+			depth += 1
+		elif tok == '}':
+			depth -= 1
+			if depth == 0:
+				return pos
+
+
+def _split_declarations(body):
+	declarations = []
+	start = 0
+	depth = 0
+	for m in _SCAN.finditer(body):
+		tok = m.group()
+		if tok == '(':
+			depth += 1
+		elif tok == ')':
+			depth = max(depth - 1, 0)
+		elif tok == ';' and depth == 0:
+			declarations.append(body[start:m.start()].strip())
+			start = m.end()
+	declarations.append(body[start:].strip())
+	return [declaration for declaration in declarations if declaration]
+
+
+def _parse(css, pos=0, nested=False):
+	"""
+	The items of css from pos, up to the } that closes the block when nested:
+	['rule', selector, declarations], ['group', prelude, items] for @media and
+	@supports, and ['text', text] for everything else.  Returns (items, pos).
+	"""
+
+	items = []
+	start = pos
+	depth = 0
+	while True:
+		m = _SCAN.search(css, pos)
+		if m is None:
+			break
+		tok = m.group()
+		pos = m.end()
+
+		if tok == '(':
+			depth += 1
+		elif tok == ')':
+			depth = max(depth - 1, 0)
+		elif depth or tok[0] in '"\'\\':
+			continue
+		elif tok.startswith('/*'):
+			# a comment between rules stays where it is
+			if not css[start:m.start()].strip():
+				items.append(['text', css[start:pos]])
+				start = pos
+		elif tok == ';':
+			items.append(['text', css[start:pos]])
+			start = pos
+		elif tok == '{':
+			prelude = css[start:m.start()]
+			lead = prelude[:len(prelude) - len(prelude.lstrip())]
+			if lead:
+				items.append(['text', lead])
+			prelude = prelude.strip()
+
+			at_rule = prelude.startswith('@') and re.match(r'@[\w-]*', prelude).group().lower()
+			if at_rule in _GROUPS:
+				children, pos = _parse(css, pos, True)
+				items.append(['group', prelude, children])
+			else:
+				end = _block_end(css, pos)
+				body = css[pos:end - 1]
+				if at_rule or '{' in body or '/*' in body or '/*' in prelude:
+					items.append(['text', prelude + css[m.start():end]])
+				else:
+					items.append(['rule', prelude, _split_declarations(body)])
+				pos = end
+			start = pos
+		elif tok == '}':
+			if not nested:
+				raise OptimizeError("Unopened block")
+			if css[start:m.start()].strip():
+				items.append(['text', css[start:m.start()]])
+			return items, pos
+
+	if nested:
+		raise OptimizeError("Unclosed block")
+	if start < len(css):
+		items.append(['text', css[start:]])
+	return items, len(css)
+
+
+def _write(items):
+	out = []
+	for item in items:
+		if item[0] == 'text':
+			out.append(item[1])
+		elif item[0] == 'rule':
+			out.append(item[1] + '{' + ';'.join(item[2]) + '}')
+		else:
+			out.append(item[1] + '{' + _write(item[2]) + '}')
+	return ''.join(out)
+
+
+def _rules(items):
+	# every rule list, the top level and the block of each group
+	lists = [items]
+	for item in items:
+		if item[0] == 'group':
+			lists.extend(_rules(item[2]))
+	return lists
+
+
+def _property(declaration):
+	# (name, value, important) of a declaration, name in lower case
+	name, colon, value = declaration.partition(':')
+	important = _IMPORTANT.search(value)
+	if important:
+		value = value[:important.start()]
+	return name.strip().lower(), value.strip(), bool(important)
+
+
+def shorten_colors(items):
+	"""
+	Write each color as the shorter of its name and its hex value, hex values
+	in lower case.
+	"""
+
+	changes = [0]
+
+	def shorten(m):
+		token = m.group()
+		lower = token.lower()
+		if lower[:1] == '#' and len(lower) == 7 and lower[1::2] == lower[2::2]:
+			lower = '#' + lower[1::2]
+		color = _NAME_TO_HEX.get(lower) or _HEX_TO_NAME.get(lower)
+		if color is None and lower[:1] == '#':
+			color = lower
+		if color is None or color == token:
+			return token
+		changes[0] += 1
+		return color
+
+	for rules in _rules(items):
+		for item in rules:
+			if item[0] != 'rule':
+				continue
+			declarations = item[2]
+			for i, declaration in enumerate(declarations):
+				name, colon, value = declaration.partition(':')
+				name = _VENDOR.sub('', name.strip().lower())
+				if name in _COLOR_PROPERTIES and '\\' not in value and 'progid' not in value.lower():
+					declarations[i] = declaration[:len(declaration) - len(value)] + _VALUE_TOKEN.sub(shorten, value)
+	return changes[0]
+
+
+def _shortest_sides(values):
+	# top right bottom left, leaving out the sides the shorthand repeats
+	top, right, bottom, left = values
+	if left == right:
+		values = values[:3]
+		if bottom == top:
+			values = values[:2]
+			if right == top:
+				values = values[:1]
+	return ' '.join(values)
+
+
+def collapse_shorthands(items):
+	"""
+	Replace four longhands like margin-top, margin-right, margin-bottom and
+	margin-left with their shorthand, where the rule sets each of them once
+	and nothing else in it sets them.
+	"""
+
+	changes = 0
+	for rules in _rules(items):
+		for item in rules:
+			if item[0] != 'rule':
+				continue
+			for shorthand, longhands, related in _SHORTHANDS:
+				declarations = item[2]
+				found = {}
+				blocked = False
+				for i, declaration in enumerate(declarations):
+					name, value, important = _property(declaration)
+					if name in related or (name in longhands and name in found):
+						blocked = True
+						break
+					if name in longhands:
+						found[name] = (i, value, important)
+				if blocked or len(found) < 4:
+					continue
+
+				sides = [found[name] for name in longhands]
+				values = [value for i, value, important in sides]
+				if len(set([important for i, value, important in sides])) > 1:
+					continue
+				if [value for value in values if not value or re.search(r'[\s\\]|var\(', value) or
+						value.lower() in _GLOBAL_VALUES]:
+					continue
+
+				declaration = shorthand + ':' + _shortest_sides(values)
+				if sides[0][2]:
+					declaration += '!important'
+				last = max([i for i, value, important in sides])
+				removed = set([i for i, value, important in sides])
+				item[2] = [i == last and declaration or declarations[i]
+					for i in range(len(declarations)) if i == last or i not in removed]
+				changes += 1
+	return changes
+
+
+def _remove_repeated_declarations(declarations):
+	# a declaration that is repeated further on does nothing where it is
+	kept = []
+	seen = set()
+	for declaration in reversed(declarations):
+		if declaration not in seen:
+			seen.add(declaration)
+			kept.append(declaration)
+	kept.reverse()
+	return kept
+
+
+def drop_duplicate_rules(items, seen=None):
+	"""
+	Drop each rule that is repeated later with the same selector and the same
+	declarations under the same @media and @supports.  The later copy is
+	further down the cascade, so it wins everywhere the earlier one did.
+	seen holds the rules found after items, it gets the ones in items added.
+	"""
+
+	if seen is None:
+		seen = set()
+
+	def drop(items, context):
+		changes = 0
+		for i in range(len(items) - 1, -1, -1):
+			item = items[i]
+			if item[0] == 'group':
+				dropped = drop(item[2], context + (item[1],))
+				if dropped and not [child for child in item[2] if child[0] != 'text' or child[1].strip()]:
+					del items[i]
+				changes += dropped
+			elif item[0] == 'rule':
+				key = (context, item[1], tuple(item[2]))
+				if key in seen:
+					del items[i]
+					changes += 1
+				else:
+					seen.add(key)
+		return changes
+
+	return drop(items, ())
+
+
+def _mergeable(items, i):
+	# the rule at i, after the whitespace that follows the one before it
+	while i < len(items) and items[i][0] == 'text' and not items[i][1].strip():
+		i += 1
+	if i < len(items) and items[i][0] == 'rule':
+		return i
+	return None
+
+
+def merge_adjacent_selectors(items):
+	"""Join neighbouring rules with the same selector into one rule."""
+
+	changes = 0
+	for rules in _rules(items):
+		i = 0
+		while i < len(rules):
+			after = rules[i][0] == 'rule' and _mergeable(rules, i + 1)
+			if after and rules[after][1] == rules[i][1]:
+				rules[i][2] = _remove_repeated_declarations(rules[i][2] + rules[after][2])
+				del rules[i + 1:after + 1]
+				changes += 1
+			else:
+				i += 1
+	return changes
+
+
+def _safe_to_merge(selector):
+	# escapes, strings and attribute selectors can hold colons of their own
+	selector = _SELECTOR_SKIP.sub('', selector)
+	for name in _PSEUDO.findall(selector):
+		if name.lower() not in _SAFE_PSEUDOS:
+			return False
+	return True
+
+
+def merge_adjacent_blocks(items):
+	"""
+	Join neighbouring rules with the same declarations into one rule with
+	both selectors.  Browsers drop a whole rule over a selector they don't
+	know, so a selector with a pseudo class outside _SAFE_PSEUDOS is left on
+	its own.
+	"""
+
+	changes = 0
+	for rules in _rules(items):
+		i = 0
+		while i < len(rules):
+			after = rules[i][0] == 'rule' and _mergeable(rules, i + 1)
+			if after and rules[after][2] == rules[i][2] and \
+					_safe_to_merge(rules[i][1]) and _safe_to_merge(rules[after][1]):
+				rules[i][1] += ',' + rules[after][1]
+				del rules[i + 1:after + 1]
+				changes += 1
+			else:
+				i += 1
+	return changes
+
+
+def dedupe_sheets(sheets):
+	"""
+	The stylesheets of a bundle, in bundle order, with each rule that the
+	bundle repeats further on dropped, and the bytes that saved.  Only the
+	last copy of a rule is kept, the other sheets' rules around it are
+	unchanged.  A sheet the optimizer can't read is kept whole.
+	"""
+
+	seen = set()
+	deduped = []
+	saved = 0
+	for css in reversed(sheets):
+		try:
+			items = _parse(css)[0]
+		except OptimizeError:
+			deduped.append(css)
+			continue
+
+		if drop_duplicate_rules(items, seen):
+			optimized = _write(items)
+			saved += len(css) - len(optimized)
+			css = optimized
+		deduped.append(css)
+
+	deduped.reverse()
+	return deduped, saved
+
+
+# the optimizations in the order they run, with what the report calls them
+PASSES = (
+	(shorten_colors, 'colors'),
+	(collapse_shorthands, 'shorthands'),
+	(drop_duplicate_rules, 'duplicate rules'),
+	(merge_adjacent_selectors, 'merged selectors'),
+	(merge_adjacent_blocks, 'merged declarations'),
+)
+
+
+def optimize(css, stats=None):
+	"""
+	css with the structural optimizations applied, and what each of them
+	saved as [(name, bytes), ...].  css should be the output of CSSMin, css
+	the optimizer can't read is handed back as it is.  While stats is a
+	PassStats each optimization is timed into it.
+	"""
+
+	try:
+		items = _parse(css)[0]
+	except OptimizeError:
+		return css, []
+
+	saved = []
+	size = len(_write(items))
+	for func, name in PASSES:
+		if stats is not None:
+			stats.begin(func.__name__)
+		changes = func(items)
+		optimized = len(_write(items))
+		if stats is not None:
+			stats.count(changes)
+			stats.end(size, optimized)
+		saved.append((name, size - optimized))
+		size = optimized
+
+	return _write(items), saved
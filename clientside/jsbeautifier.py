@@ -0,0 +1,955 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# `jsbeautifier.py` - A Python port of the JS Beautifier in jsbeautify/beautify.js.
+#
+# JS Beautifier was written by Einar Lielmanis, <einar@jsbeautifier.org>,
+# http://jsbeautifier.org/, and is free to use in any way you want.  This port
+# follows beautify.js step by step so both give the same output for the same
+# options, which lets the plugin format small files without starting node.
+
+
+import re
+
+
+_WHITESPACE = frozenset('\n\r\t ')
+_WORDCHAR = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$')
+_DIGITS = frozenset('0123456789')
+_PUNCT = frozenset('+ - * / % & ++ -- = += -= *= /= %= == === != !== > < >= <= >> << >>> >>>= >>= <<= && &= | || ! !! , : ? ^ ^= |= ::'.split(' '))
+
+# words which should always start on new line.
+_LINE_STARTERS = frozenset('continue,try,throw,return,var,if,switch,case,default,for,while,break,function'.split(','))
+
+_WORD_RUN = re.compile(r'[a-zA-Z0-9_$]*')
+_EXPONENT = re.compile(r'^[0-9]+[Ee]$')
+_NEWLINES = re.compile(r'\r|\n')
+_COMMENT_LINES = re.compile(r'\x0a|\x0d\x0a')
+_TRIM = re.compile(r'^\s\s*|\s\s*$', re.UNICODE)
+_STRING_BODY = {
+	"'": re.compile(r"(?:[^'\\]|\\.)*", re.S),
+	'"': re.compile(r'(?:[^"\\]|\\.)*', re.S),
+}
+
+
+def _trim(s):
+	# like beautify.js, only the leading or else the trailing whitespace goes
+	return _TRIM.sub('', s, 1)
+
+
+def _is_array(mode):
+	return mode == '[EXPRESSION]' or mode == '[INDENTED-EXPRESSION]'
+
+
+def _is_expression(mode):
+	return mode == '[EXPRESSION]' or mode == '[INDENTED-EXPRESSION]' or mode == '(EXPRESSION)'
+
+
+class _Flags(object):
+	__slots__ = ('previous_mode', 'mode', 'var_line', 'var_line_tainted', 'var_line_reindented',
+		'in_html_comment', 'if_line', 'in_case', 'eat_next_space', 'indentation_baseline',
+		'indentation_level', 'ternary_depth')
+
+
+class JSBeautifier:
+	"""
+	Formats javascript the way `js_beautify` in beautify.js does, taking the
+	same options: indent_size, indent_char, preserve_newlines,
+	max_preserve_newlines, jslint_happy (or space_after_anon_function),
+	brace_style (or braces_on_own_line) and keep_array_indentation.
+	"""
+
+	def __init__(self, options=None):
+		options = options or {}
+
+		# compatibility
+		jslint_happy = options.get('jslint_happy')
+		if options.get('space_after_anon_function') is not None and jslint_happy is None:
+			jslint_happy = options['space_after_anon_function']
+		brace_style = None
+		if options.get('braces_on_own_line') is not None:
+			brace_style = options['braces_on_own_line'] and 'expand' or 'collapse'
+
+		self.brace_style = options.get('brace_style') or brace_style or 'collapse'
+		self.indent_string = (options.get('indent_char') or ' ') * int(options.get('indent_size') or 4)
+		self.preserve_newlines = options.get('preserve_newlines', True)
+		self.max_preserve_newlines = options.get('max_preserve_newlines', False)
+		self.jslint_happy = jslint_happy
+		self.keep_array_indentation = options.get('keep_array_indentation', False)
+
+
+	def beautify(self, js_source_text):
+		encoding = None
+		if isinstance(js_source_text, str):
+			try:
+				js_source_text = js_source_text.decode('utf-8')
+				encoding = 'utf-8'
+			except UnicodeDecodeError:
+				pass
+
+		self.opt_keep_array_indentation = self.keep_array_indentation
+		self.just_added_newline = False
+		self.preindent_string = ''
+
+		# beautify.js takes the length before the indentation is cut off, so
+		# reads run past the end by that much, and there input is one '' after
+		# another.  Every read is a slice so it works the same way.
+		self.input_length = len(js_source_text)
+		while js_source_text and js_source_text[0] in ' \t':
+			self.preindent_string += js_source_text[0]
+			js_source_text = js_source_text[1:]
+		self.input = js_source_text
+
+		self.last_word = '' # last 'TK_WORD' passed
+		self.last_type = 'TK_START_EXPR' # last token type
+		self.last_text = '' # last token text
+		self.last_last_text = '' # pre-last token text
+		self.output = []
+		self.do_block_just_closed = False
+		self.wanted_newline = False
+		self.n_newlines = 0
+
+		# states showing if we are currently in expression (i.e. "if" case) -
+		# 'EXPRESSION', or in usual block (like, procedure), 'BLOCK'.
+		self.flags = None
+		self.flag_store = []
+		self.set_mode('BLOCK')
+
+		self.parser_pos = 0
+		handlers = {
+			'TK_START_EXPR': self.handle_start_expr,
+			'TK_END_EXPR': self.handle_end_expr,
+			'TK_START_BLOCK': self.handle_start_block,
+			'TK_END_BLOCK': self.handle_end_block,
+			'TK_WORD': self.handle_word,
+			'TK_SEMICOLON': self.handle_semicolon,
+			'TK_STRING': self.handle_string,
+			'TK_EQUALS': self.handle_equals,
+			'TK_OPERATOR': self.handle_operator,
+			'TK_BLOCK_COMMENT': self.handle_block_comment,
+			'TK_INLINE_COMMENT': self.handle_inline_comment,
+			'TK_COMMENT': self.handle_comment,
+			'TK_UNKNOWN': self.handle_unknown,
+		}
+
+		while True:
+			token_text, token_type = self.get_next_token()
+			if token_type == 'TK_EOF':
+				break
+
+			self.token_text = token_text
+			handlers[token_type](token_text)
+
+			self.last_last_text = self.last_text
+			self.last_type = token_type
+			self.last_text = token_text
+
+		sweet_code = self.preindent_string + ''.join(self.output).rstrip('\n ')
+		self.input = self.output = None
+
+		if encoding is not None:
+			sweet_code = sweet_code.encode(encoding)
+		return sweet_code
+
+
+	def trim_output(self, eat_newlines=False):
+		output = self.output
+		while output and (output[-1] == ' '
+			or output[-1] == self.indent_string
+			or output[-1] == self.preindent_string
+			or (eat_newlines and (output[-1] == '\n' or output[-1] == '\r'))):
+			output.pop()
+
+
+	def force_newline(self):
+		old_keep_array_indentation = self.opt_keep_array_indentation
+		self.opt_keep_array_indentation = False
+		self.print_newline()
+		self.opt_keep_array_indentation = old_keep_array_indentation
+
+
+	def print_newline(self, ignore_repeated=True):
+		flags = self.flags
+		flags.eat_next_space = False
+		if self.opt_keep_array_indentation and _is_array(flags.mode):
+			return
+
+		flags.if_line = False
+		self.trim_output()
+
+		output = self.output
+		if not output:
+			return # no newline on start of file
+
+		if output[-1] != '\n' or not ignore_repeated:
+			self.just_added_newline = True
+			output.append('\n')
+		if self.preindent_string:
+			output.append(self.preindent_string)
+		output.extend([self.indent_string] * flags.indentation_level)
+		if flags.var_line and flags.var_line_reindented:
+			output.append(self.indent_string) # skip space-stuffing, if indenting with a tab
+
+
+	def print_single_space(self):
+		if self.flags.eat_next_space:
+			self.flags.eat_next_space = False
+			return
+		last_output = ' '
+		if self.output:
+			last_output = self.output[-1]
+		if last_output != ' ' and last_output != '\n' and last_output != self.indent_string: # prevent occassional duplicate space
+			self.output.append(' ')
+
+
+	def print_token(self):
+		self.just_added_newline = False
+		self.flags.eat_next_space = False
+		self.output.append(self.token_text)
+
+
+	def indent(self):
+		self.flags.indentation_level += 1
+
+
+	def remove_indent(self):
+		if self.output and self.output[-1] == self.indent_string:
+			self.output.pop()
+
+
+	def set_mode(self, mode):
+		old = self.flags
+		if old:
+			self.flag_store.append(old)
+		flags = _Flags()
+		flags.previous_mode = old and old.mode or 'BLOCK'
+		flags.mode = mode
+		flags.var_line = False
+		flags.var_line_tainted = False
+		flags.var_line_reindented = False
+		flags.in_html_comment = False
+		flags.if_line = False
+		flags.in_case = False
+		flags.eat_next_space = False
+		flags.indentation_baseline = -1
+		flags.indentation_level = 0
+		if old:
+			flags.indentation_level = old.indentation_level + ((old.var_line and old.var_line_reindented) and 1 or 0)
+		flags.ternary_depth = 0
+		self.flags = flags
+
+
+	def restore_mode(self):
+		self.do_block_just_closed = self.flags.mode == 'DO_BLOCK'
+		if self.flag_store:
+			self.flags = self.flag_store.pop()
+
+
+	def all_lines_start_with(self, lines, c):
+		for line in lines:
+			if _trim(line)[:1] != c:
+				return False
+		return True
+
+
+	def get_next_token(self):
+		self.n_newlines = 0
+
+		input = self.input
+		input_length = self.input_length
+		if self.parser_pos >= input_length:
+			return '', 'TK_EOF'
+
+		self.wanted_newline = False
+
+		c = input[self.parser_pos:self.parser_pos + 1]
+		self.parser_pos += 1
+
+		keep_whitespace = self.opt_keep_array_indentation and _is_array(self.flags.mode)
+
+		if keep_whitespace:
+
+			# slight mess to allow nice preservation of array indentation and
+			# reindent that correctly first time when we get to the arrays:
+			# var a = [
+			# ....'something'
+			# we make note of whitespace_count = 4 into flags.indentation_baseline
+			# so we know that 4 whitespaces in original source match indent_level
+			# of reindented source
+			#
+			# and afterwards, when we get to
+			#    'something,
+			# .......'something else'
+			# we know that this should be indented to indent_level +
+			# (7 - indentation_baseline) spaces
+			whitespace_count = 0
+
+			while c in _WHITESPACE:
+				if c == '\n':
+					self.trim_output()
+					self.output.append('\n')
+					self.just_added_newline = True
+					whitespace_count = 0
+				elif c == '\t':
+					whitespace_count += 4
+				elif c == '\r':
+					pass
+				else:
+					whitespace_count += 1
+
+				if self.parser_pos >= input_length:
+					return '', 'TK_EOF'
+
+				c = input[self.parser_pos:self.parser_pos + 1]
+				self.parser_pos += 1
+
+			flags = self.flags
+			if flags.indentation_baseline == -1:
+				flags.indentation_baseline = whitespace_count
+
+			if self.just_added_newline:
+				self.output.extend([self.indent_string] * (flags.indentation_level + 1))
+				if flags.indentation_baseline != -1:
+					self.output.extend([' '] * (whitespace_count - flags.indentation_baseline))
+
+		else:
+			n_newlines = 0
+			while c in _WHITESPACE:
+				if c == '\n':
+					if not self.max_preserve_newlines or n_newlines <= self.max_preserve_newlines:
+						n_newlines += 1
+
+				if self.parser_pos >= input_length:
+					self.n_newlines = n_newlines
+					return '', 'TK_EOF'
+
+				c = input[self.parser_pos:self.parser_pos + 1]
+				self.parser_pos += 1
+			self.n_newlines = n_newlines
+
+			if self.preserve_newlines:
+				if n_newlines > 1:
+					for i in range(n_newlines):
+						self.print_newline(i == 0)
+						self.just_added_newline = True
+			self.wanted_newline = n_newlines > 0
+
+		if c in _WORDCHAR:
+			end = _WORD_RUN.match(input, self.parser_pos).end()
+			c += input[self.parser_pos:end]
+			self.parser_pos = end
+
+			# small and surprisingly unugly hack for 1E-10 representation
+			sign = input[self.parser_pos:self.parser_pos + 1]
+			if self.parser_pos != input_length and _EXPONENT.match(c) and (sign == '-' or sign == '+'):
+				self.parser_pos += 1
+
+				t = self.get_next_token()
+				c += sign + t[0]
+				return c, 'TK_WORD'
+
+			if c == 'in': # hack for 'in' operator
+				return c, 'TK_OPERATOR'
+			if (self.wanted_newline and self.last_type != 'TK_OPERATOR'
+				and self.last_type != 'TK_EQUALS'
+				and not self.flags.if_line and (self.preserve_newlines or self.last_text != 'var')):
+				self.print_newline()
+			return c, 'TK_WORD'
+
+		if c == '(' or c == '[':
+			return c, 'TK_START_EXPR'
+
+		if c == ')' or c == ']':
+			return c, 'TK_END_EXPR'
+
+		if c == '{':
+			return c, 'TK_START_BLOCK'
+
+		if c == '}':
+			return c, 'TK_END_BLOCK'
+
+		if c == ';':
+			return c, 'TK_SEMICOLON'
+
+		if c == '/':
+			# peek for comment /* ... */
+			if input[self.parser_pos:self.parser_pos + 1] == '*':
+				self.parser_pos += 1
+				end = input.find('*/', self.parser_pos)
+				if end < 0:
+					end = input_length
+				comment = input[self.parser_pos:end]
+				self.parser_pos = end + 2
+				if _NEWLINES.search(comment):
+					return '/*' + comment + '*/', 'TK_BLOCK_COMMENT'
+				return '/*' + comment + '*/', 'TK_INLINE_COMMENT'
+
+			# peek for comment // ...
+			if input[self.parser_pos:self.parser_pos + 1] == '/':
+				match = _NEWLINES.search(input, self.parser_pos)
+				end = match and match.start() or input_length
+				comment = c + input[self.parser_pos:end]
+				self.parser_pos = end + 1
+				if self.wanted_newline:
+					self.print_newline()
+				return comment, 'TK_COMMENT'
+
+		last_type = self.last_type
+		if c == "'" or c == '"' or (c == '/' and (
+			(last_type == 'TK_WORD' and self.last_text in ('return', 'do')) or
+			last_type in ('TK_COMMENT', 'TK_START_EXPR', 'TK_START_BLOCK', 'TK_END_BLOCK', 'TK_OPERATOR', 'TK_EQUALS', 'TK_EOF', 'TK_SEMICOLON'))): # regexp
+			sep = c
+			resulting_string = c
+
+			if self.parser_pos < input_length:
+				if sep == '/':
+					# handle regexp separately...
+					esc = False
+					in_char_class = False
+					pos = self.parser_pos
+					while esc or in_char_class or input[pos:pos + 1] != sep:
+						char = input[pos:pos + 1]
+						if not esc:
+							esc = char == '\\'
+							if char == '[':
+								in_char_class = True
+							elif char == ']':
+								in_char_class = False
+						else:
+							esc = False
+						pos += 1
+						if pos >= input_length:
+							# incomplete string/rexp when end-of-file reached.
+							# bail out with what had been received so far.
+							resulting_string += input[self.parser_pos:pos]
+							self.parser_pos = pos
+							return resulting_string, 'TK_STRING'
+					resulting_string += input[self.parser_pos:pos]
+					self.parser_pos = pos
+
+				else:
+					# and handle string also separately
+					end = _STRING_BODY[sep].match(input, self.parser_pos).end()
+					if input[end:end + 1] != sep:
+						# incomplete string/rexp when end-of-file reached.
+						# bail out with what had been received so far.
+						resulting_string += input[self.parser_pos:]
+						self.parser_pos = input_length
+						return resulting_string, 'TK_STRING'
+					resulting_string += input[self.parser_pos:end]
+					self.parser_pos = end
+
+			self.parser_pos += 1
+
+			resulting_string += sep
+
+			if sep == '/':
+				# regexps may have modifiers /regexp/MOD , so fetch those, too
+				end = _WORD_RUN.match(input, self.parser_pos).end()
+				resulting_string += input[self.parser_pos:end]
+				self.parser_pos = end
+			return resulting_string, 'TK_STRING'
+
+		if c == '#':
+
+			if not self.output and input[self.parser_pos:self.parser_pos + 1] == '!':
+				# shebang
+				resulting_string = c
+				while self.parser_pos < input_length and c != '\n':
+					c = input[self.parser_pos:self.parser_pos + 1]
+					resulting_string += c
+					self.parser_pos += 1
+				self.output.append(_trim(resulting_string) + '\n')
+				self.print_newline()
+				return self.get_next_token()
+
+			# Spidermonkey-specific sharp variables for circular references
+			# https://developer.mozilla.org/En/Sharp_variables_in_JavaScript
+			# http://mxr.mozilla.org/mozilla-central/source/js/src/jsscan.cpp around line 1935
+			sharp = '#'
+			if self.parser_pos < input_length and input[self.parser_pos:self.parser_pos + 1] in _DIGITS:
+				while True:
+					c = input[self.parser_pos:self.parser_pos + 1]
+					sharp += c
+					self.parser_pos += 1
+					if not (self.parser_pos < input_length and c != '#' and c != '='):
+						break
+				if c == '#':
+					pass
+				elif input[self.parser_pos:self.parser_pos + 2] == '[]':
+					sharp += '[]'
+					self.parser_pos += 2
+				elif input[self.parser_pos:self.parser_pos + 2] == '{}':
+					sharp += '{}'
+					self.parser_pos += 2
+				return sharp, 'TK_WORD'
+
+		if c == '<' and input[self.parser_pos - 1:self.parser_pos + 3] == '<!--':
+			self.parser_pos += 3
+			self.flags.in_html_comment = True
+			return '<!--', 'TK_COMMENT'
+
+		if c == '-' and self.flags.in_html_comment and input[self.parser_pos - 1:self.parser_pos + 2] == '-->':
+			self.flags.in_html_comment = False
+			self.parser_pos += 2
+			if self.wanted_newline:
+				self.print_newline()
+			return '-->', 'TK_COMMENT'
+
+		if c in _PUNCT:
+			while self.parser_pos < input_length and c + input[self.parser_pos:self.parser_pos + 1] in _PUNCT:
+				c += input[self.parser_pos:self.parser_pos + 1]
+				self.parser_pos += 1
+
+			if c == '=':
+				return c, 'TK_EQUALS'
+			return c, 'TK_OPERATOR'
+
+		return c, 'TK_UNKNOWN'
+
+
+	def handle_start_expr(self, token_text):
+		flags = self.flags
+		last_type = self.last_type
+		last_text = self.last_text
+
+		if token_text == '[':
+
+			if last_type == 'TK_WORD' or last_text == ')':
+				# this is array index specifier, break immediately
+				# a[x], fn()[x]
+				if last_text in _LINE_STARTERS:
+					self.print_single_space()
+				self.set_mode('(EXPRESSION)')
+				self.print_token()
+				return
+
+			if flags.mode == '[EXPRESSION]' or flags.mode == '[INDENTED-EXPRESSION]':
+				if (self.last_last_text == ']' and last_text == ',') or last_text == '[':
+					# ], [ goes to new line
+					if flags.mode == '[EXPRESSION]':
+						flags.mode = '[INDENTED-EXPRESSION]'
+						if not self.opt_keep_array_indentation:
+							self.indent()
+					self.set_mode('[EXPRESSION]')
+					if not self.opt_keep_array_indentation:
+						self.print_newline()
+				else:
+					self.set_mode('[EXPRESSION]')
+			else:
+				self.set_mode('[EXPRESSION]')
+
+		else:
+			self.set_mode('(EXPRESSION)')
+
+		if last_text == ';' or last_type == 'TK_START_BLOCK':
+			self.print_newline()
+		elif last_type == 'TK_END_EXPR' or last_type == 'TK_START_EXPR' or last_type == 'TK_END_BLOCK' or last_text == '.':
+			# do nothing on (( and )( and ][ and ]( and .(
+			pass
+		elif last_type != 'TK_WORD' and last_type != 'TK_OPERATOR':
+			self.print_single_space()
+		elif self.last_word == 'function' or self.last_word == 'typeof':
+			# function() vs function ()
+			if self.jslint_happy:
+				self.print_single_space()
+		elif last_text in _LINE_STARTERS or last_text == 'catch':
+			self.print_single_space()
+		self.print_token()
+
+
+	def handle_end_expr(self, token_text):
+		if token_text == ']':
+			if self.opt_keep_array_indentation:
+				if self.last_text == '}':
+					self.remove_indent()
+					self.print_token()
+					self.restore_mode()
+					return
+			else:
+				if self.flags.mode == '[INDENTED-EXPRESSION]':
+					if self.last_text == ']':
+						self.restore_mode()
+						self.print_newline()
+						self.print_token()
+						return
+		self.restore_mode()
+		self.print_token()
+
+
+	def handle_start_block(self, token_text):
+		if self.last_word == 'do':
+			self.set_mode('DO_BLOCK')
+		else:
+			self.set_mode('BLOCK')
+
+		last_type = self.last_type
+		if self.brace_style == 'expand':
+			if last_type != 'TK_OPERATOR':
+				if self.last_text == 'return' or self.last_text == '=':
+					self.print_single_space()
+				else:
+					self.print_newline(True)
+			self.print_token()
+			self.indent()
+		else:
+			if last_type != 'TK_OPERATOR' and last_type != 'TK_START_EXPR':
+				if last_type == 'TK_START_BLOCK':
+					self.print_newline()
+				else:
+					self.print_single_space()
+			else:
+				# if TK_OPERATOR or TK_START_EXPR
+				if _is_array(self.flags.previous_mode) and self.last_text == ',':
+					if self.last_last_text == '}':
+						# }, { in array context
+						self.print_single_space()
+					else:
+						self.print_newline() # [a, b, c, {
+			self.indent()
+			self.print_token()
+
+
+	def handle_end_block(self, token_text):
+		self.restore_mode()
+		if self.brace_style == 'expand':
+			if self.last_text != '{':
+				self.print_newline()
+			self.print_token()
+		else:
+			if self.last_type == 'TK_START_BLOCK':
+				# nothing
+				if self.just_added_newline:
+					self.remove_indent()
+				else:
+					# {}
+					self.trim_output()
+			else:
+				if _is_array(self.flags.mode) and self.opt_keep_array_indentation:
+					# we REALLY need a newline here, but newliner would skip that
+					self.opt_keep_array_indentation = False
+					self.print_newline()
+					self.opt_keep_array_indentation = True
+				else:
+					self.print_newline()
+			self.print_token()
+
+
+	def handle_word(self, token_text):
+		flags = self.flags
+		last_type = self.last_type
+		last_text = self.last_text
+
+		# no, it's not you. even I have problems understanding how this works
+		# and what does what.
+		if self.do_block_just_closed:
+			# do {} ## while ()
+			self.print_single_space()
+			self.print_token()
+			self.print_single_space()
+			self.do_block_just_closed = False
+			return
+
+		if token_text == 'function':
+			if flags.var_line:
+				flags.var_line_reindented = True
+			if (self.just_added_newline or last_text == ';') and last_text != '{':
+				# make sure there is a nice clean space of at least one blank line
+				# before a new function definition
+				if not self.just_added_newline:
+					self.n_newlines = 0
+				if not self.preserve_newlines:
+					self.n_newlines = 1
+
+				for i in range(2 - self.n_newlines):
+					self.print_newline(False)
+
+		if token_text == 'case' or token_text == 'default':
+			if last_text == ':':
+				# switch cases following one another
+				self.remove_indent()
+			else:
+				# case statement starts in the same line where switch
+				flags.indentation_level -= 1
+				self.print_newline()
+				flags.indentation_level += 1
+			self.print_token()
+			flags.in_case = True
+			return
+
+		prefix = 'NONE'
+		lower_text = token_text.lower()
+
+		if last_type == 'TK_END_BLOCK':
+
+			if lower_text not in ('else', 'catch', 'finally'):
+				prefix = 'NEWLINE'
+			else:
+				if self.brace_style == 'expand' or self.brace_style == 'end-expand':
+					prefix = 'NEWLINE'
+				else:
+					prefix = 'SPACE'
+					self.print_single_space()
+		elif last_type == 'TK_SEMICOLON' and (flags.mode == 'BLOCK' or flags.mode == 'DO_BLOCK'):
+			prefix = 'NEWLINE'
+		elif last_type == 'TK_SEMICOLON' and _is_expression(flags.mode):
+			prefix = 'SPACE'
+		elif last_type == 'TK_STRING':
+			prefix = 'NEWLINE'
+		elif last_type == 'TK_WORD':
+			if last_text == 'else':
+				# eat newlines between ...else *** some_op...
+				# won't preserve extra newlines in this place (if any), but don't care that much
+				self.trim_output(True)
+			prefix = 'SPACE'
+		elif last_type == 'TK_START_BLOCK':
+			prefix = 'NEWLINE'
+		elif last_type == 'TK_END_EXPR':
+			self.print_single_space()
+			prefix = 'NEWLINE'
+
+		if token_text in _LINE_STARTERS and last_text != ')':
+			if last_text == 'else':
+				prefix = 'SPACE'
+			else:
+				prefix = 'NEWLINE'
+
+		if flags.if_line and last_type == 'TK_END_EXPR':
+			flags.if_line = False
+		if lower_text in ('else', 'catch', 'finally'):
+			if last_type != 'TK_END_BLOCK' or self.brace_style == 'expand' or self.brace_style == 'end-expand':
+				self.print_newline()
+			else:
+				self.trim_output(True)
+				self.print_single_space()
+		elif prefix == 'NEWLINE':
+			if (last_type == 'TK_START_EXPR' or last_text == '=' or last_text == ',') and token_text == 'function':
+				# no need to force newline on 'function': (function
+				# DONOTHING
+				pass
+			elif token_text == 'function' and last_text == 'new':
+				self.print_single_space()
+			elif last_text == 'return' or last_text == 'throw':
+				# no newline between 'return nnn'
+				self.print_single_space()
+			elif last_type != 'TK_END_EXPR':
+				if (last_type != 'TK_START_EXPR' or token_text != 'var') and last_text != ':':
+					# no need to force newline on 'var': for (var x = 0...)
+					if token_text == 'if' and self.last_word == 'else' and last_text != '{':
+						# no newline for } else if {
+						self.print_single_space()
+					else:
+						flags.var_line = False
+						flags.var_line_reindented = False
+						self.print_newline()
+			elif token_text in _LINE_STARTERS and last_text != ')':
+				flags.var_line = False
+				flags.var_line_reindented = False
+				self.print_newline()
+		elif _is_array(flags.mode) and last_text == ',' and self.last_last_text == '}':
+			self.print_newline() # }, in lists get a newline treatment
+		elif prefix == 'SPACE':
+			self.print_single_space()
+		self.print_token()
+		self.last_word = token_text
+
+		if token_text == 'var':
+			flags.var_line = True
+			flags.var_line_reindented = False
+			flags.var_line_tainted = False
+
+		if token_text == 'if':
+			flags.if_line = True
+		if token_text == 'else':
+			flags.if_line = False
+
+
+	def handle_semicolon(self, token_text):
+		self.print_token()
+		self.flags.var_line = False
+		self.flags.var_line_reindented = False
+		if self.flags.mode == 'OBJECT':
+			# OBJECT mode is weird and doesn't get reset too well.
+			self.flags.mode = 'BLOCK'
+
+
+	def handle_string(self, token_text):
+		if self.last_type == 'TK_START_BLOCK' or self.last_type == 'TK_END_BLOCK' or self.last_type == 'TK_SEMICOLON':
+			self.print_newline()
+		elif self.last_type == 'TK_WORD':
+			self.print_single_space()
+		self.print_token()
+
+
+	def handle_equals(self, token_text):
+		if self.flags.var_line:
+			# just got an '=' in a var-line, different formatting/line-breaking, etc will now be done
+			self.flags.var_line_tainted = True
+		self.print_single_space()
+		self.print_token()
+		self.print_single_space()
+
+
+	def handle_operator(self, token_text):
+		flags = self.flags
+		last_type = self.last_type
+		last_text = self.last_text
+		space_before = True
+		space_after = True
+
+		if flags.var_line and token_text == ',' and _is_expression(flags.mode):
+			# do not break on comma, for(var a = 1, b = 2)
+			flags.var_line_tainted = False
+
+		if flags.var_line:
+			if token_text == ',':
+				if flags.var_line_tainted:
+					self.print_token()
+					flags.var_line_reindented = True
+					flags.var_line_tainted = False
+					self.print_newline()
+					return
+				else:
+					flags.var_line_tainted = False
+
+		if last_text == 'return' or last_text == 'throw':
+			# "return" had a special handling in TK_WORD. Now we need to return the favor
+			self.print_single_space()
+			self.print_token()
+			return
+
+		if token_text == ':' and flags.in_case:
+			self.print_token() # colon really asks for separate treatment
+			self.print_newline()
+			flags.in_case = False
+			return
+
+		if token_text == '::':
+			# no spaces around exotic namespacing syntax operator
+			self.print_token()
+			return
+
+		if token_text == ',':
+			if flags.var_line:
+				if flags.var_line_tainted:
+					self.print_token()
+					self.print_newline()
+					flags.var_line_tainted = False
+				else:
+					self.print_token()
+					self.print_single_space()
+			elif last_type == 'TK_END_BLOCK' and flags.mode != '(EXPRESSION)':
+				self.print_token()
+				if flags.mode == 'OBJECT' and last_text == '}':
+					self.print_newline()
+				else:
+					self.print_single_space()
+			else:
+				if flags.mode == 'OBJECT':
+					self.print_token()
+					self.print_newline()
+				else:
+					# EXPR or DO_BLOCK
+					self.print_token()
+					self.print_single_space()
+			return
+		elif token_text in ('--', '++', '!') or (token_text in ('-', '+') and (
+			last_type in ('TK_START_BLOCK', 'TK_START_EXPR', 'TK_EQUALS', 'TK_OPERATOR') or last_text in _LINE_STARTERS)):
+			# unary operators (and binary +/- pretending to be unary) special cases
+
+			space_before = False
+			space_after = False
+
+			if last_text == ';' and _is_expression(flags.mode):
+				# for (;; ++i)
+				#        ^^^
+				space_before = True
+			if last_type == 'TK_WORD' and last_text in _LINE_STARTERS:
+				space_before = True
+
+			if flags.mode == 'BLOCK' and (last_text == '{' or last_text == ';'):
+				# { foo; --i }
+				# foo(); --bar;
+				self.print_newline()
+		elif token_text == '.':
+			# decimal digits or object.property
+			space_before = False
+
+		elif token_text == ':':
+			if flags.ternary_depth == 0:
+				flags.mode = 'OBJECT'
+				space_before = False
+			else:
+				flags.ternary_depth -= 1
+		elif token_text == '?':
+			flags.ternary_depth += 1
+		if space_before:
+			self.print_single_space()
+
+		self.print_token()
+
+		if space_after:
+			self.print_single_space()
+
+
+	def handle_block_comment(self, token_text):
+		lines = _COMMENT_LINES.split(token_text)
+		output = self.output
+
+		if self.all_lines_start_with(lines[1:], '*'):
+			# javadoc: reformat and reindent
+			self.print_newline()
+			output.append(lines[0])
+			for line in lines[1:]:
+				self.print_newline()
+				output.append(' ')
+				output.append(_trim(line))
+
+		else:
+
+			# simple block comment: leave intact
+			if len(lines) > 1:
+				# multiline comment block starts with a new line
+				self.print_newline()
+				self.trim_output()
+			else:
+				# single-line /* comment */ stays where it is
+				self.print_single_space()
+
+			for line in lines:
+				output.append(line)
+				output.append('\n')
+
+		self.print_newline()
+
+
+	def handle_inline_comment(self, token_text):
+		self.print_single_space()
+		self.print_token()
+		if _is_expression(self.flags.mode):
+			self.print_single_space()
+		else:
+			self.force_newline()
+
+
+	def handle_comment(self, token_text):
+		if self.wanted_newline:
+			self.print_newline()
+		else:
+			self.print_single_space()
+		self.print_token()
+		self.force_newline()
+
+
+	def handle_unknown(self, token_text):
+		if self.last_text == 'return' or self.last_text == 'throw':
+			self.print_single_space()
+		self.print_token()
+
+
+def js_beautify(js_source_text, options=None):
+	return JSBeautifier(options).beautify(js_source_text)
+
+
+if __name__ == '__main__':
+	import sys
+	sys.stdout.write(js_beautify(sys.stdin.read()))
@@ -0,0 +1,403 @@
+# Copyright 2011 Trent Richardson
+#
+# This file is part of Gedit Clientside Plugin.
+#
+# Gedit Clientside Plugin is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gedit Clientside Plugin is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gedit Clientside Plugin. If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Renames the parameters and variables of functions to the shortest names that
+are safe, for js that has been through jsmin.  Globals are left alone, as is
+every function that uses eval or with, or any syntax the mangler can't follow
+(let, const, class, arrow functions, destructuring, shorthand properties,
+template substitutions), along with the functions around it, since their
+names might be reached from there.
+"""
+
+import re
+
+# bumped whenever a fix changes what mangle returns, so results cached or
+# built with an older mangler are redone
+MANGLE_VERSION = 2
+
+_TOKEN = re.compile(r'''
+	(?P<space>\s+)
+	|(?P<comment>/\*.*?\*/|//[^\n]*)
+	|(?P<name>(?:[^\W\d]|\$)[\w$]*)
+	|(?P<number>\.?\d[\w.]*)
+	|(?P<string>"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+	|(?P<template>`(?:[^`\\]|\\.)*`)
+	|(?P<punct>=>|\.\.\.|\+\+|--|[^\s\w$"'`\\])
+	|(?P<other>.)
+''', re.X | re.U | re.S)
+
+_REGEX = re.compile(r'/(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[\w$]*', re.U)
+
+KEYWORDS = frozenset([
+	'break', 'case', 'catch', 'class', 'const', 'continue', 'debugger', 'default',
+	'delete', 'do', 'else', 'enum', 'export', 'extends', 'false', 'finally', 'for',
+	'function', 'if', 'implements', 'import', 'in', 'instanceof', 'interface', 'let',
+	'new', 'null', 'package', 'private', 'protected', 'public', 'return', 'static',
+	'super', 'switch', 'this', 'throw', 'true', 'try', 'typeof', 'var', 'void',
+	'while', 'with', 'yield',
+])
+
+# a { after these opens an object literal, a / after them starts a regex
+_EXPRESSION_BEFORE = frozenset('( [ , = : ? ! & | + - * / % < > ~ ^ =>'.split() +
+	['return', 'typeof', 'new', 'void', 'delete', 'in', 'instanceof', 'case', 'throw', 'yield'])
+_STATEMENT_BEFORE = frozenset(['', ';', '{', '}'])
+
+# a / after these divides
+_VALUE_END = frozenset([')', ']', '}', '++', '--'])
+
+# the keywords that are values, a / after any other keyword (else, do,
+# return, ...) starts a regex
+_VALUE_KEYWORDS = frozenset(['this', 'super', 'true', 'false', 'null'])
+
+# the syntax the scope tracking doesn't understand
+_UNSAFE_KEYWORDS = frozenset(['let', 'const', 'class', 'with', 'import', 'export'])
+_UNSAFE_PUNCT = frozenset(['=>', '...'])
+
+_FIRST_CHARS = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ$_'
+_NAME_CHARS = _FIRST_CHARS + '0123456789'
+
+
+def short_name(n):
+	"""The n-th shortest identifier: a, b, ... _, aa, ba, ..."""
+
+	name = _FIRST_CHARS[n % len(_FIRST_CHARS)]
+	n //= len(_FIRST_CHARS)
+	while n:
+		n -= 1
+		name += _NAME_CHARS[n % len(_NAME_CHARS)]
+		n //= len(_NAME_CHARS)
+	return name
+
+
+class _Scope:
+	def __init__(self, parent, kind):
+		self.parent = parent
+		self.kind = kind # 'global', 'function' or 'catch'
+		self.names = {} # declared name: how often it appears
+		self.outer = set() # (scope, name) of the outside bindings used in here
+		self.children = []
+		self.unsafe = False
+		if parent is not None:
+			parent.children.append(self)
+
+	def function(self):
+		# where a var goes
+		scope = self
+		while scope.kind == 'catch':
+			scope = scope.parent
+		return scope
+
+	def declare(self, name):
+		self.names.setdefault(name, 0)
+
+	def resolve(self, name):
+		scope = self
+		while scope.parent is not None and name not in scope.names:
+			scope = scope.parent
+		return scope
+
+
+class MangleError(Exception):
+	pass
+
+
+def _starts_regex(tokens):
+	"""Whether a / after tokens starts a regex instead of dividing."""
+
+	if not tokens:
+		return True
+
+	kind, text = tokens[-1][:2]
+	if text in _EXPRESSION_BEFORE:
+		return True
+	if kind == 'punct':
+		return text not in _VALUE_END
+
+	# a keyword, unless it is a property named like one
+	return (kind == 'name' and text in KEYWORDS and text not in _VALUE_KEYWORDS
+		and not (len(tokens) > 1 and tokens[-2][1] == '.'))
+
+
+def _tokenize(js):
+	"""(parts, tokens): every piece of js, and (kind, text, part, newline_before) of the ones that aren't space."""
+
+	parts = []
+	tokens = []
+	newline = False
+	pos = 0
+	while pos < len(js):
+		m = _TOKEN.match(js, pos)
+		kind = m.lastgroup
+		text = m.group()
+
+		if kind == 'other':
+			raise MangleError("Can't read %r at %d" % (text, pos))
+
+		if kind == 'punct' and text == '/':
+			if _starts_regex(tokens):
+				regex = _REGEX.match(js, pos)
+				if regex is None:
+					raise MangleError("Unterminated regular expression at %d" % pos)
+				kind, text = 'regex', regex.group()
+			elif tokens[-1][1] in ')}':
+				# a regex here after if (...) or a block, a division after a call
+				# or an object, which _parse works out and tells us about
+				kind = 'slash'
+
+		pos += len(text)
+		if kind in ('space', 'comment'):
+			newline = newline or '\n' in text
+			parts.append(text)
+			continue
+
+		tokens.append((kind, text, len(parts), newline))
+		parts.append(text)
+		newline = False
+
+	return parts, tokens
+
+
+def _closing(tokens, i):
+	# the index of the ) matching the ( at i
+	depth = 0
+	for j in xrange(i, len(tokens)):
+		text = tokens[j][1]
+		if text == '(':
+			depth += 1
+		elif text == ')':
+			depth -= 1
+			if depth == 0:
+				return j
+	raise MangleError("Unbalanced parentheses")
+
+
+def _parse(tokens):
+	"""
+	The global _Scope of tokens, and [(scope, name, part), ...] for every
+	identifier that names a variable, property names left out.
+	"""
+
+	top = _Scope(None, 'global')
+	scope = top
+	uses = []
+	stack = [] # ('{', 'object' | 'block' | 'scope') or ('(', statement keyword before it) or ('[', None)
+	declaring = [] # [depth, expecting a name] of the var statements we're in
+	closed = None # what the last ) or } closed
+
+	i = 0
+	while i < len(tokens):
+		kind, text, part, newline = tokens[i]
+		prev = i and tokens[i - 1][1] or ''
+
+		while declaring and len(stack) < declaring[-1][0]:
+			declaring.pop()
+		var = declaring and declaring[-1][0] == len(stack) and declaring[-1] or None
+		if var is not None:
+			if text == ';' or text in ('in', 'of') or (newline and not var[1] and text != ','):
+				declaring.pop()
+				var = None
+			elif text == ',':
+				var[1] = True
+
+		if kind == 'slash':
+			# after if (...) or a block the / starts a regex we read as punctuation
+			if closed in ('statement', 'block', 'scope'):
+				raise MangleError("Regular expression after %s" % prev)
+		elif kind == 'template':
+			if '${' in text:
+				scope.unsafe = True
+		elif kind == 'punct':
+			if text in _UNSAFE_PUNCT:
+				scope.unsafe = True
+			elif text == '{':
+				if prev in _EXPRESSION_BEFORE:
+					stack.append(('{', 'object'))
+				else:
+					stack.append(('{', 'block'))
+			elif text == '(':
+				stack.append(('(', prev in ('if', 'while', 'for', 'with') and 'statement' or None))
+			elif text == '[':
+				stack.append(('[', None))
+			elif text in ')]}':
+				if not stack:
+					raise MangleError("Unbalanced %s" % text)
+				opened, closed = stack.pop()
+				if closed == 'scope':
+					scope = scope.parent
+		elif kind == 'name':
+			in_object = stack and stack[-1] == ('{', 'object')
+			next_text = i + 1 < len(tokens) and tokens[i + 1][1] or ''
+
+			if prev == '.':
+				pass
+			elif in_object and prev in ('{', ','):
+				# a property name, or shorthand we can't follow
+				if next_text != ':':
+					scope.unsafe = True
+					uses.append((scope, text, part))
+			elif text == 'function':
+				declaration = (prev in _STATEMENT_BEFORE or prev in ('else', 'do') or (prev == ')' and closed == 'statement')
+					or (newline and prev not in _EXPRESSION_BEFORE))
+				i = _parse_function(tokens, i, scope, uses, stack, declaration)
+				scope = scope.children[-1]
+				continue
+			elif text == 'catch' and next_text == '(':
+				end = _closing(tokens, i + 1)
+				catch = _Scope(scope, 'catch')
+				if end == i + 3 and tokens[i + 2][0] == 'name':
+					catch.declare(tokens[i + 2][1])
+					uses.append((catch, tokens[i + 2][1], tokens[i + 2][2]))
+				else:
+					catch.unsafe = True
+				if end + 1 < len(tokens) and tokens[end + 1][1] == '{':
+					stack.append(('{', 'scope'))
+					scope = catch
+					i = end + 2
+					continue
+				raise MangleError("catch without a block")
+			elif text == 'var':
+				declaring.append([len(stack), True])
+			elif text in _UNSAFE_KEYWORDS:
+				scope.unsafe = True
+			elif text not in KEYWORDS:
+				if var is not None and var[1]:
+					scope.function().declare(text)
+					var[1] = False
+				if text == 'eval':
+					scope.unsafe = True
+				uses.append((scope, text, part))
+
+		i += 1
+
+	if stack:
+		raise MangleError("Unbalanced %s" % stack[-1][0])
+
+	return top, uses
+
+
+def _parse_function(tokens, i, scope, uses, stack, declaration):
+	# function name? (params) { ... the index after the {, with the
+	# function's scope the last child of scope
+	j = i + 1
+	name = None
+	if j < len(tokens) and tokens[j][0] == 'name' and tokens[j][1] not in KEYWORDS:
+		name = tokens[j]
+		j += 1
+
+	function = _Scope(scope, 'function')
+	if name is not None:
+		# a declaration's name belongs to the scope around it
+		holder = function
+		if declaration:
+			holder = scope.function()
+		holder.declare(name[1])
+		uses.append((holder, name[1], name[2]))
+
+	if j >= len(tokens) or tokens[j][1] != '(':
+		raise MangleError("function without parameters")
+	end = _closing(tokens, j)
+
+	params = tokens[j + 1:end]
+	for k, (kind, text, part, newline) in enumerate(params):
+		if k % 2 == 0 and kind == 'name' and text not in KEYWORDS:
+			function.declare(text)
+			uses.append((function, text, part))
+		elif k % 2 == 1 and text == ',':
+			pass
+		else:
+			# defaults, destructuring or rest parameters
+			function.unsafe = True
+
+	if end + 1 >= len(tokens) or tokens[end + 1][1] != '{':
+		raise MangleError("function without a body")
+	stack.append(('{', 'scope'))
+	return end + 2
+
+
+def _rename(top, uses):
+	"""{(scope, name): new name} for every binding in a scope that can be mangled."""
+
+	# bindings used from inside a scope they are not in, and how often each is used
+	for scope, name, part in uses:
+		binding = scope.resolve(name)
+		if binding.parent is not None:
+			binding.names[name] += 1
+		while scope is not binding:
+			scope.outer.add((binding, name))
+			scope = scope.parent
+
+	# unsafe code can see the names of every scope around it
+	def mark(scope):
+		for child in scope.children:
+			mark(child)
+			if child.unsafe:
+				scope.unsafe = True
+	mark(top)
+
+	renamed = {}
+	pending = [top]
+	while pending:
+		scope = pending.pop(0)
+		pending.extend(scope.children)
+		if scope.parent is None or scope.unsafe:
+			continue
+
+		# the names the code in here sees from outside
+		taken = set(KEYWORDS)
+		for binding, name in scope.outer:
+			taken.add(renamed.get((binding, name), name))
+
+		n = 0
+		for count, name in sorted([(-count, name) for name, count in scope.names.items()]):
+			new = short_name(n)
+			while new in taken:
+				n += 1
+				new = short_name(n)
+			n += 1
+			renamed[(scope, name)] = new
+
+	return renamed
+
+
+def mangle(js):
+	"""
+	js with the local names of its functions shortened.  js should be the
+	output of jsmin, code the mangler can't read is handed back as it is.
+	"""
+
+	decoded = isinstance(js, unicode)
+	text = js
+	if not decoded:
+		text = js.decode('utf-8')
+
+	try:
+		parts, tokens = _tokenize(text)
+		top, uses = _parse(tokens)
+	except MangleError:
+		return js
+
+	renamed = _rename(top, uses)
+	for scope, name, part in uses:
+		new = renamed.get((scope.resolve(name), name))
+		if new is not None:
+			parts[part] = new
+
+	text = u''.join(parts)
+	if not decoded:
+		text = text.encode('utf-8')
+	return text
@@ -31,15 +31,50 @@
 # */
 
 from StringIO import StringIO
+import re
 
-def jsmin(js):
-    ins = StringIO(js)
+from passstats import PassStats
+
+def jsmin(js, engine='block'):
+    outs = StringIO()
+    jsmin_stream(StringIO(js), outs, engine)
+    return outs.getvalue()
+
+def jsmin_stream(instream, outstream, engine='block', keep_newlines=True):
+    """Minify instream into outstream, a block at a time with the block
+       engine.  Like jsmin() the leading newline is dropped, and with
+       keep_newlines=False every newline is.
+    """
+    JavascriptMinify(engine).minify(instream, _MinifiedWriter(outstream, keep_newlines))
+
+def jsmin_profile(js, engine='block', keep_newlines=True):
+    """Like jsmin(), but returns (output, stats) where stats is a PassStats
+       with the wall time, sizes and output pieces of the minify pass and
+       the cleaning of each block.
+    """
     outs = StringIO()
-    JavascriptMinify().minify(ins, outs)
-    str = outs.getvalue()
-    if len(str) > 0 and str[0] == '\n':
-        str = str[1:]
-    return str
+    minifier = JavascriptMinify(engine)
+    minifier.stats = PassStats('JavascriptMinify (%s engine)' % engine)
+    minifier.minify(StringIO(js), _MinifiedWriter(outs, keep_newlines))
+    return outs.getvalue(), minifier.stats
+
+class _MinifiedWriter:
+    """Filters what JavascriptMinify writes on its way to outstream."""
+
+    def __init__(self, outstream, keep_newlines):
+        self.outstream = outstream
+        self.keep_newlines = keep_newlines
+        self.started = False
+
+    def write(self, s):
+        if not self.keep_newlines:
+            s = s.replace('\n', '').replace('\r', '')
+        elif not self.started and s:
+            self.started = True
+            if s[0] == '\n':
+                s = s[1:]
+        if s:
+            self.outstream.write(s)
 
 def isAlphanum(c):
     """return true if the character is a letter, digit, underscore,
@@ -57,7 +92,130 @@ class UnterminatedStringLiteral(Exception):
 class UnterminatedRegularExpression(Exception):
     pass
 
+# Character class tables for the block engine. Input is cleaned a block at a
+# time with these translation tables the same way _get() cleans a single
+# character: control characters become spaces and carriage returns become
+# linefeeds. Anything above '~' counts as alphanumeric, see isAlphanum().
+_CLEAN_CHARS = dict([(chr(i), ' ') for i in range(32)])
+_CLEAN_CHARS['\n'] = '\n'
+_CLEAN_CHARS['\r'] = '\n'
+_CLEAN_TABLE = ''.join([_CLEAN_CHARS.get(chr(i), chr(i)) for i in range(256)])
+_CLEAN_MAP = dict([(ord(k), unicode(v)) for k, v in _CLEAN_CHARS.items()])
+
+_ALNUM = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$\\')
+_QUOTES = frozenset('\'"')
+_SPACES = frozenset(' \n')
+_REGEX_PREFIX = frozenset('(,=:[?!&|;{}\n')
+_NEWLINE_KEEPERS = frozenset('}])+-"\'')
+_NEWLINE_JOINERS = frozenset('{[(+-')
+
+# A stretch of code, whole string literals and whole comments, without
+# regular expressions or backslashes. Action 1 copies it through except for
+# the whitespace between the strings, where a comment counts as a space (a
+# linefeed after //): a run of spaces becomes one space between two
+# alphanumerics, and a run with a linefeed in it becomes one linefeed between
+# an alphanumeric or _NEWLINE_KEEPERS and an alphanumeric or
+# _NEWLINE_JOINERS. All other whitespace disappears. A quote counts as
+# punctuation, and a string broken over lines with a backslash is left to
+# _copy_literal.
+def _char_class(chars):
+    return ''.join(['\\x%02x' % ord(c) for c in chars])
+
+_PUNCT = [chr(i) for i in range(127) if chr(i) not in _SPACES and not isAlphanum(chr(i))]
+_STRING = r'"[^"\\\n]*(?:\\[^\n][^"\\\n]*)*"|\'[^\'\\\n]*(?:\\[^\n][^\'\\\n]*)*\''
+_COMMENT = r'/\*[^*]*\*+(?:[^*/][^*]*\*+)*/|//[^\n]*'
+_CODE_RUN = re.compile(r'(?:[^\'"/\\]+|%s|%s\n)*' % (_STRING, _COMMENT))
+_STRING_SPLIT = re.compile('(%s)' % _STRING)
+_COMMENTS = re.compile('(%s)|%s' % (_STRING, _COMMENT))
+_NEWLINE_RUN = re.compile(r'[ \n]*\n[ \n]*')
+_DROP_SPACES = re.compile(r' (?:(?<=[%s] ) *| *(?=[%s]))' % (_char_class(_PUNCT), _char_class(_PUNCT)))
+_EXTRA_SPACES = re.compile(r'  +')
+_SPACE_RUN = re.compile(r'[ \n]*')
+_STRING_STOP = { "'": re.compile(r"['\\\n]"), '"': re.compile(r'["\\\n]') }
+_REGEX_STOP = re.compile(r'[/\\\n]')
+
+def _clean(block):
+    if isinstance(block, str):
+        return block.translate(_CLEAN_TABLE)
+    return block.translate(_CLEAN_MAP)
+
+def _isAlphanum(c):
+    return c in _ALNUM or c > '~'
+
+def _squeeze_newlines(m):
+    s = m.string
+    before = s[m.start() - 1]
+    after = s[m.end()]
+    if ((before in _NEWLINE_KEEPERS or _isAlphanum(before)) and
+            (after in _NEWLINE_JOINERS or _isAlphanum(after))):
+        return '\n'
+    return ''
+
+def _drop_comment(m):
+    # strings stay, /* */ is a space and // leaves its linefeed
+    if m.group(1):
+        return m.group(1)
+    if m.group()[1] == '*':
+        return ' '
+    return ''
+
+def _squeeze_spaces(run):
+    if '"' not in run and "'" not in run:
+        return _EXTRA_SPACES.sub(' ', _DROP_SPACES.sub('', run))
+    # the code between the strings, whose quotes are punctuation
+    pieces = _STRING_SPLIT.split(run)
+    last = len(pieces) - 1
+    for i in range(0, len(pieces), 2):
+        code = pieces[i]
+        if ' ' in code:
+            if i:
+                code = code.lstrip(' ')
+            if i < last:
+                code = code.rstrip(' ')
+            pieces[i] = _EXTRA_SPACES.sub(' ', _DROP_SPACES.sub('', code))
+    return ''.join(pieces)
+
+class _CountingStream:
+    """Counts the characters and calls going through a stream."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.size = 0
+        self.calls = 0
+
+    def read(self, n=-1):
+        s = self.stream.read(n)
+        self.size += len(s)
+        self.calls += 1
+        return s
+
+    def write(self, s):
+        self.stream.write(s)
+        self.size += len(s)
+        self.calls += 1
+
+    def close(self):
+        self.stream.close()
+
 class JavascriptMinify(object):
+    """Minify javascript from instream to outstream.
+
+       The default 'block' engine reads the input a block at a time and copies
+       whole runs of code, strings and regular expressions as slices. The
+       'char' engine is the original character at a time translation of
+       jsmin.c. Both produce the same output.
+
+       While stats is a PassStats the run is timed into it, with the output
+       pieces written as its matches.
+    """
+
+    block_size = 65536
+
+    def __init__(self, engine='block'):
+        if engine not in ('block', 'char'):
+            raise ValueError("Unknown jsmin engine: %s" % engine)
+        self.engine = engine
+        self.stats = None
 
     def _outA(self):
         self.outstream.write(self.theA)
@@ -202,17 +360,247 @@ class JavascriptMinify(object):
                 else:
                     self._action(1)
 
+    #
+    # Block engine. The same state machine as above, but the input lives in
+    # self._buf and runs of characters that need no decision are handled with
+    # a single regex match or str.find and copied as one slice.
+    #
+
+    def _fill(self, keep):
+        """Read the next block, dropping everything in the buffer before keep.
+           Returns how far the buffer shifted, or None at EOF.
+        """
+        if self._eof:
+            return None
+        block = self.instream.read(self.block_size)
+        if not block:
+            self._eof = True
+            return None
+        if self.stats is None:
+            self._buf = self._buf[keep:] + _clean(block)
+        else:
+            self.stats.begin('_clean')
+            cleaned = _clean(block)
+            self.stats.count(1)
+            self.stats.end(len(block), len(cleaned))
+            self._buf = self._buf[keep:] + cleaned
+        self._pos -= keep
+        if self._out:
+            if self.stats is not None:
+                self.stats.count(len(self._out))
+            self.outstream.write(''.join(self._out))
+            del self._out[:]
+        return keep
+
+    def _getc(self):
+        if self._pos >= len(self._buf) and self._fill(self._pos) is None:
+            return '\000'
+        c = self._buf[self._pos]
+        self._pos += 1
+        return c
+
+    def _peekc(self):
+        if self._pos >= len(self._buf) and self._fill(self._pos) is None:
+            return '\000'
+        return self._buf[self._pos]
+
+    def _find(self, what, p):
+        """Find what (a string or compiled regex) at or after index p, reading
+           more blocks as needed. Everything from self._pos onwards stays in the
+           buffer, so callers should only hold indexes relative to self._pos.
+           Returns -1 at EOF.
+        """
+        while 1:
+            if isinstance(what, str):
+                i = self._buf.find(what, p)
+            else:
+                m = what.search(self._buf, p)
+                i = m is None and -1 or m.start()
+            if i >= 0:
+                return i
+            # what may start on the last character of this block
+            p = max(p, len(self._buf) - 1)
+            shift = self._fill(self._pos)
+            if shift is None:
+                return -1
+            p -= shift
+
+    def _skip_spaces(self):
+        """Skip a run of spaces and linefeeds, return True if it had a linefeed."""
+        newline = False
+        while 1:
+            m = _SPACE_RUN.match(self._buf, self._pos)
+            self._pos = m.end()
+            newline = newline or '\n' in m.group()
+            if self._pos < len(self._buf) or self._fill(self._pos) is None:
+                return newline
+
+    def _nextc(self):
+        """_next() for the block engine, skipping comments with str.find."""
+        c = self._getc()
+        if c == '/' and self.theA != '\\':
+            p = self._peekc()
+            if p == '/':
+                i = self._find('\n', self._pos + 1)
+                if i < 0:
+                    self._pos = len(self._buf)
+                    return '\000'
+                self._pos = i + 1
+                return '\n'
+            if p == '*':
+                i = self._find('*/', self._pos + 1)
+                if i < 0:
+                    raise UnterminatedComment()
+                self._pos = i + 2
+                return ' '
+        return c
+
+    def _copy_literal(self, stop, exc):
+        """Copy a string or regular expression body up to the unescaped stop
+           character and return that character.
+        """
+        p = self._pos
+        while 1:
+            i = self._find(stop, p)
+            if i < 0:
+                raise exc()
+            c = self._buf[i]
+            if c == '\n':
+                raise exc()
+            if c != '\\':
+                self._out.append(self._buf[self._pos:i])
+                self._pos = i + 1
+                return c
+            p = i + 2
+
+    def _load_b(self):
+        """Get the next B and copy a regular expression literal through if
+           one starts here.
+        """
+        pos = self._pos
+        if pos < len(self._buf) and self._buf[pos] != '/':
+            self.theB = self._buf[pos]
+            self._pos = pos + 1
+            return
+
+        self.theB = self._nextc()
+        if self.theB == '/' and self.theA in _REGEX_PREFIX:
+            self._out.append(self.theA + '/')
+            self.theA = self._copy_literal(_REGEX_STOP, UnterminatedRegularExpression)
+            self.theB = self._nextc()
+
+    def _action_block(self, action):
+        if action <= 1:
+            self._out.append(self.theA)
+
+        if action <= 2:
+            self.theA = self.theB
+            if self.theA in _QUOTES:
+                self._out.append(self.theA)
+                self._copy_literal(_STRING_STOP[self.theA], UnterminatedStringLiteral)
+
+        if action <= 3:
+            self._load_b()
+
+    def _jsmin_block(self):
+        self.theA = '\n'
+        self._action_block(3)
+
+        while self.theA != '\000':
+            a = self.theA
+            b = self.theB
+
+            if a in _SPACES:
+                if b in _SPACES:
+                    # a run of whitespace after whitespace outputs nothing
+                    if self._skip_spaces() or a == '\n' or b == '\n':
+                        self.theA = '\n'
+                    else:
+                        self.theA = ' '
+                    self._load_b()
+                elif a == ' ':
+                    if _isAlphanum(b):
+                        self._action_block(1)
+                    else:
+                        self._action_block(2)
+                elif b in _NEWLINE_JOINERS or _isAlphanum(b):
+                    self._action_block(1)
+                else:
+                    self._action_block(2)
+
+            elif b in _SPACES:
+                if _isAlphanum(a):
+                    self._action_block(1)
+                else:
+                    # whitespace after punctuation is dropped, except that a
+                    # linefeed after one of _NEWLINE_KEEPERS is kept
+                    if self._skip_spaces() or b == '\n':
+                        if a in _NEWLINE_KEEPERS:
+                            self._out.append(a)
+                            self.theA = '\n'
+                    self._load_b()
+
+            elif b == '/':
+                self._action_block(1)
+
+            else:
+                # action 1 over a stretch of plain code, strings and
+                # comments is a copy with the whitespace squeezed out.  B is
+                # the character before self._pos, and a string or comment
+                # that doesn't end in this block is left to _action_block.
+                run = _CODE_RUN.match(self._buf, self._pos - 1).group()
+                if len(run) > 1:
+                    self._pos += len(run) - 1
+                    if '/' in run:
+                        run = _COMMENTS.sub(_drop_comment, run)
+                    # trailing whitespace becomes the next B
+                    code = run.rstrip(' \n')
+                    spaces = run[len(code):]
+                    if '\n' in code:
+                        code = _NEWLINE_RUN.sub(_squeeze_newlines, code)
+                    if ' ' in code:
+                        code = _squeeze_spaces(code)
+                    self._out.append(a + code[:-1])
+                    self.theA = code[-1]
+                    if spaces:
+                        self.theB = '\n' in spaces and '\n' or ' '
+                    else:
+                        self._load_b()
+                else:
+                    self._action_block(1)
+
     def minify(self, instream, outstream):
+        stats = self.stats
+        if stats is not None:
+            instream = _CountingStream(instream)
+            outstream = _CountingStream(outstream)
+            stats.begin(self.engine == 'char' and '_jsmin' or '_jsmin_block')
+
         self.instream = instream
         self.outstream = outstream
         self.theA = '\n'
         self.theB = None
         self.theLookahead = None
 
-        self._jsmin()
+        if self.engine == 'char':
+            self._jsmin()
+            if stats is not None:
+                stats.count(outstream.calls)
+        else:
+            self._buf = ''
+            self._pos = 0
+            self._eof = False
+            self._out = []
+            self._jsmin_block()
+            if stats is not None:
+                stats.count(len(self._out))
+            self.outstream.write(''.join(self._out))
+            self._buf = self._out = None
         self.instream.close()
 
+        if stats is not None:
+            stats.end(instream.size, outstream.size)
+
 if __name__ == '__main__':
     import sys
-    jsm = JavascriptMinify()
-    jsm.minify(sys.stdin, sys.stdout)
+    jsmin_stream(sys.stdin, sys.stdout)
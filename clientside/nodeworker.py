@@ -0,0 +1,489 @@
+# Copyright 2011 Trent Richardson
+#
+# This file is part of Gedit Clientside Plugin.
+#
+# Gedit Clientside Plugin is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gedit Clientside Plugin is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gedit Clientside Plugin. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+import time
+import shlex
+import select
+import signal
+import itertools
+import threading
+import subprocess
+
+WORKER_SCRIPT = os.path.join(os.path.split(__file__)[0], "clientside_worker.js")
+
+# how often a waiting request looks at the worker's memory use
+POLL_INTERVAL = 0.25
+
+# a write this size to a pipe select calls writable never blocks
+PIPE_BUF = getattr(select, 'PIPE_BUF', 512)
+
+# NodeWorkerPool request priorities, lower goes first
+PRIORITY_ACTIVE = 0 # for the tab the user is looking at
+PRIORITY_BACKGROUND = 1
+
+
+class NodeWorkerError(Exception):
+	pass
+
+
+class NodeWorkerCancelled(NodeWorkerError):
+	pass
+
+
+class NodeWorkerLimitError(NodeWorkerError):
+	"""The worker was killed for running too long, using too much memory or too much output."""
+	pass
+
+
+def _to_str(obj):
+	"""Turn the unicode json hands back into utf-8 strings like the rest of the plugin uses."""
+
+	if isinstance(obj, unicode):
+		return obj.encode('utf-8')
+	if isinstance(obj, list):
+		return [_to_str(o) for o in obj]
+	if isinstance(obj, dict):
+		return dict((_to_str(k), _to_str(v)) for k, v in obj.items())
+	return obj
+
+
+class NodeWorker:
+	"""
+	A node process that keeps JSLint, CSSLint and JS-Beautify loaded between
+	calls.  The process is started on the first request and started again on
+	the next request if it has died.  Requests from several threads take turns.
+
+	Each request is held to timeout seconds, memory_limit megabytes and
+	max_output bytes of response, its items and result together (None for no
+	limit).  A request that goes over is killed along with anything node started, and raises
+	NodeWorkerLimitError.
+	"""
+
+	def __init__(self, nodejs='node', timeout=None, memory_limit=None, max_output=None):
+		self.nodejs = nodejs
+		self.timeout = timeout
+		self.memory_limit = memory_limit
+		self.max_output = max_output
+		self._proc = None
+		self._buffer = ''
+		self._output = 0
+		self._lock = threading.Lock()
+		self._cancelled = False
+
+	def is_running(self):
+		return self._proc is not None and self._proc.poll() is None
+
+	def start(self):
+		if self.is_running():
+			return
+
+		args = shlex.split(self.nodejs)
+		if self.memory_limit:
+			args.append('--max-old-space-size=%d' % self.memory_limit)
+
+		# its own process group, so a kill takes anything node started with it
+		self._proc = subprocess.Popen(args + [WORKER_SCRIPT],
+			stdin=subprocess.PIPE, stdout=subprocess.PIPE, close_fds=True,
+			preexec_fn=getattr(os, 'setsid', None))
+		self._buffer = ''
+
+	def _kill(self, proc):
+		try:
+			if hasattr(os, 'killpg'):
+				os.killpg(proc.pid, signal.SIGKILL)
+			else:
+				proc.kill()
+		except OSError:
+			pass
+
+	def stop(self):
+		if self._proc is None:
+			return
+
+		try:
+			self._proc.stdin.close()
+			self._proc.stdout.close()
+			if self._proc.poll() is None:
+				self._kill(self._proc)
+			self._proc.wait()
+		except (IOError, OSError):
+			pass
+		self._proc = None
+		self._buffer = ''
+
+	def cancel(self):
+		"""
+		Abandon the request in flight by killing the process, the request raises
+		NodeWorkerCancelled and the next one starts a fresh worker.
+		"""
+
+		# nothing in flight, keep the warm process
+		if not self._lock.locked():
+			return
+
+		proc = self._proc
+		if proc is not None and proc.poll() is None:
+			self._cancelled = True
+			self._kill(proc)
+
+	def _memory_used(self):
+		"""Resident size of the worker in megabytes, None where /proc is not available."""
+
+		try:
+			f = open('/proc/%d/statm' % self._proc.pid)
+			pages = int(f.read().split()[1])
+			f.close()
+		except (IOError, OSError, ValueError, IndexError):
+			return None
+		return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+	def _wait(self, fd, for_write, deadline):
+		"""Wait until fd is ready, enforcing the time and memory limits meanwhile."""
+
+		while True:
+			wait = POLL_INTERVAL
+			if deadline is not None:
+				left = deadline - time.time()
+				if left <= 0:
+					raise NodeWorkerLimitError("Timed out after %g s" % self.timeout)
+				wait = min(wait, left)
+
+			if for_write:
+				ready = select.select([], [fd], [], wait)[1]
+			else:
+				ready = select.select([fd], [], [], wait)[0]
+			if ready:
+				return
+
+			if self.memory_limit:
+				used = self._memory_used()
+				if used is not None and used > self.memory_limit:
+					raise NodeWorkerLimitError("Used more than %d MB of memory" % self.memory_limit)
+
+	def _dead(self):
+		# node aborts when its heap outgrows --max-old-space-size
+		self._proc.poll()
+		if self.memory_limit and self._proc.returncode in (-signal.SIGABRT, 134):
+			return NodeWorkerLimitError("Used more than %d MB of memory" % self.memory_limit)
+		return NodeWorkerError("Node worker exited unexpectedly")
+
+	def _write_frame(self, body, text, deadline):
+		data = json.dumps(body)
+		fd = self._proc.stdin.fileno()
+
+		# the text follows the json as is, see clientside_worker.js
+		for piece in ('%d %d\n' % (len(data), len(text)), data, text):
+			pos = 0
+			while pos < len(piece):
+				self._wait(fd, True, deadline)
+				pos += os.write(fd, piece[pos:pos + PIPE_BUF])
+
+	def _read_chunk(self, deadline):
+		fd = self._proc.stdout.fileno()
+		self._wait(fd, False, deadline)
+
+		chunk = os.read(fd, 65536)
+		if not chunk:
+			raise self._dead()
+		return chunk
+
+	def _read_frame(self, deadline):
+		buf = self._buffer
+		while '\n' not in buf:
+			buf += self._read_chunk(deadline)
+
+		header, buf = buf.split('\n', 1)
+		json_length, text_length = [int(n) for n in header.split()]
+		length = json_length + text_length
+		# the frames of one request count together, streamed items included
+		self._output += length
+		if self.max_output and self._output > self.max_output:
+			raise NodeWorkerLimitError("Output larger than %d bytes" % self.max_output)
+
+		chunks = [buf]
+		have = len(buf)
+		while have < length:
+			chunk = self._read_chunk(deadline)
+			chunks.append(chunk)
+			have += len(chunk)
+
+		data = ''.join(chunks)
+		self._buffer = data[length:]
+
+		response = json.loads(data[:json_length])
+		if response.get('text'):
+			response['result'] = data[json_length:length]
+		return response
+
+	def request(self, op, code, options=None, on_item=None):
+		"""
+		Run op ('lint_js', 'lint_css' or 'format_js') on code and return the
+		result.  Items the op sends ahead of its result, the lint issues, are
+		passed to on_item as they arrive.
+		"""
+
+		body = { 'op': op, 'options': options or {} }
+		if isinstance(code, unicode):
+			code = code.encode('utf-8')
+
+		self._lock.acquire()
+		try:
+			self._cancelled = False
+
+			deadline = None
+			if self.timeout:
+				deadline = time.time() + self.timeout
+
+			# a dead worker gets one restart before we give up on the request,
+			# unless items already went out or a limit killed it (the input
+			# would only do it again)
+			received = False
+			for attempt in range(2):
+				try:
+					self.start()
+					self._output = 0
+					self._write_frame(body, code, deadline)
+					response = self._read_frame(deadline)
+					while 'item' in response:
+						received = True
+						if on_item is not None:
+							on_item(_to_str(response['item']))
+						response = self._read_frame(deadline)
+					break
+				except NodeWorkerLimitError:
+					self.stop()
+					raise
+				except (IOError, OSError, ValueError, NodeWorkerError), err:
+					self.stop()
+					if self._cancelled:
+						raise NodeWorkerCancelled("Cancelled")
+					if attempt or received:
+						raise NodeWorkerError("Node worker failed: %s" % err)
+				except:
+					# on_item failed part way through a response
+					self.stop()
+					raise
+		finally:
+			self._lock.release()
+
+		if not response['ok']:
+			raise NodeWorkerError(_to_str(response['error']))
+
+		return _to_str(response['result'])
+
+
+class NodeWorkerPool:
+	"""
+	Up to size warm NodeWorkers shared by several owners, the plugin's
+	windows.  A request takes a free worker, starts one while there are fewer
+	than size, or waits.  A worker that frees up goes to the waiting request
+	with the best priority and, among those, to the owner served longest ago,
+	so one busy window can't hold up the rest.  Workers left free for
+	idle_timeout seconds are stopped.
+
+	Owners make requests through a NodeWorkerClient, see client.
+	"""
+
+	def __init__(self, nodejs='node', size=2, idle_timeout=300, timeout=None, memory_limit=None, max_output=None):
+		self.nodejs = nodejs
+		self.size = size
+		self.idle_timeout = idle_timeout
+		self.timeout = timeout
+		self.memory_limit = memory_limit
+		self.max_output = max_output
+		self._cond = threading.Condition()
+		self._count = 0 # workers free or in use
+		self._free = [] # (worker, time it was freed), the most recent last
+		self._busy = {} # owner: workers running its requests
+		self._waiting = [] # (priority, ticket, owner)
+		self._served = {} # owner: ticket of its last request to get a worker
+		self._dropped = set() # tickets of waiting requests that were cancelled
+		self._tickets = itertools.count()
+		self._reaper = None
+		self._closed = False
+
+	def client(self, owner, priority=PRIORITY_ACTIVE):
+		"""Something with the NodeWorker calls that runs owner's requests at priority."""
+
+		return NodeWorkerClient(self, owner, priority)
+
+	def is_running(self):
+		"""Whether a free worker has node started."""
+
+		self._cond.acquire()
+		try:
+			for worker, freed in self._free:
+				if worker.is_running():
+					return True
+			return False
+		finally:
+			self._cond.release()
+
+	def _next(self):
+		return min(self._waiting, key=lambda entry: (entry[0], self._served.get(entry[2], -1), entry[1]))
+
+	def acquire(self, owner, priority):
+		"""A worker for one of owner's requests, give it back with release."""
+
+		self._cond.acquire()
+		try:
+			entry = (priority, self._tickets.next(), owner)
+			self._waiting.append(entry)
+			try:
+				while not ((self._free or self._count < self.size) and self._next() == entry):
+					if entry[1] in self._dropped:
+						raise NodeWorkerCancelled("Cancelled")
+					self._cond.wait()
+			finally:
+				self._waiting.remove(entry)
+				self._dropped.discard(entry[1])
+				self._cond.notify_all()
+
+			self._served[owner] = self._tickets.next()
+			if self._free:
+				# the most recently used is the likeliest to be warm
+				worker = self._free.pop()[0]
+			else:
+				worker = NodeWorker(self.nodejs)
+				self._count += 1
+			self._busy.setdefault(owner, []).append(worker)
+		finally:
+			self._cond.release()
+
+		# node flags only take with a new process
+		if worker.nodejs != self.nodejs or worker.memory_limit != self.memory_limit:
+			worker.stop()
+		worker.nodejs = self.nodejs
+		worker.timeout = self.timeout
+		worker.memory_limit = self.memory_limit
+		worker.max_output = self.max_output
+		return worker
+
+	def release(self, owner, worker):
+		self._cond.acquire()
+		try:
+			self._busy[owner].remove(worker)
+			if not self._busy[owner]:
+				del self._busy[owner]
+
+			# the pool was made smaller or stopped while it ran
+			if self._closed or self._count > self.size:
+				worker.stop()
+				self._count -= 1
+			else:
+				self._free.append((worker, time.time()))
+				self._schedule_reap(self.idle_timeout)
+			self._cond.notify_all()
+		finally:
+			self._cond.release()
+
+	def cancel(self, owner):
+		"""Abandon owner's requests, those running and those still waiting for a worker."""
+
+		self._cond.acquire()
+		try:
+			for priority, ticket, waiting in self._waiting:
+				if waiting == owner:
+					self._dropped.add(ticket)
+			for worker in self._busy.get(owner, []):
+				worker.cancel()
+			self._cond.notify_all()
+		finally:
+			self._cond.release()
+
+	def close(self, owner):
+		"""Cancel owner's requests and forget it, for an owner that is going away."""
+
+		self._cond.acquire()
+		try:
+			self.cancel(owner)
+			self._served.pop(owner, None)
+		finally:
+			self._cond.release()
+
+	def _schedule_reap(self, delay):
+		# with the lock held
+		if self._reaper is None and self.idle_timeout:
+			self._reaper = threading.Timer(delay, self._reap)
+			self._reaper.daemon = True
+			self._reaper.start()
+
+	def _reap(self):
+		self._cond.acquire()
+		try:
+			self._reaper = None
+			now = time.time()
+			free = []
+			for worker, freed in self._free:
+				if now - freed >= self.idle_timeout:
+					worker.stop()
+					self._count -= 1
+				else:
+					free.append((worker, freed))
+			self._free = free
+
+			if free:
+				self._schedule_reap(free[0][1] + self.idle_timeout - now)
+		finally:
+			self._cond.release()
+
+	def stop(self):
+		"""Stop every worker, those still running a request are cancelled and stop when done."""
+
+		self._cond.acquire()
+		try:
+			self._closed = True
+			if self._reaper is not None:
+				self._reaper.cancel()
+				self._reaper = None
+			for worker, freed in self._free:
+				worker.stop()
+			self._count -= len(self._free)
+			self._free = []
+			for owner in self._busy.keys():
+				self.cancel(owner)
+		finally:
+			self._cond.release()
+
+
+class NodeWorkerClient:
+	"""One owner's way into a NodeWorkerPool, with the calls of a NodeWorker."""
+
+	def __init__(self, pool, owner, priority):
+		self.pool = pool
+		self.owner = owner
+		self.priority = priority
+
+	def is_running(self):
+		return self.pool.is_running()
+
+	def cancel(self):
+		self.pool.cancel(self.owner)
+
+	def close(self):
+		self.pool.close(self.owner)
+
+	def request(self, op, code, options=None, on_item=None):
+		"""NodeWorker.request on a worker from the pool."""
+
+		worker = self.pool.acquire(self.owner, self.priority)
+		try:
+			return worker.request(op, code, options, on_item)
+		finally:
+			self.pool.release(self.owner, worker)
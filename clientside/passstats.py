@@ -0,0 +1,89 @@
+# Copyright 2011 Trent Richardson
+#
+# This file is part of Gedit Clientside Plugin.
+#
+# Gedit Clientside Plugin is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gedit Clientside Plugin is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gedit Clientside Plugin. If not, see <http://www.gnu.org/licenses/>.
+
+import time
+
+
+class PassStats:
+	"""
+	Wall time, input and output sizes and match counts for each pass of one
+	minifier run, in the order the passes first ran.  A pass that runs more
+	than once, once per chunk when streaming, adds up.  Matches counted while
+	a pass runs belong to the innermost pass.
+	"""
+
+	def __init__(self, minifier):
+		self.minifier = minifier
+		self.passes = []
+		self._by_name = {}
+		self._running = []
+
+	def _entry(self, name):
+		if name not in self._by_name:
+			entry = { 'name': name, 'seconds': 0.0, 'input': 0, 'output': 0, 'matches': 0, 'runs': 0 }
+			self._by_name[name] = entry
+			self.passes.append(entry)
+		return self._by_name[name]
+
+	def begin(self, name):
+		entry = self._entry(name)
+		if self._running:
+			entry['nested'] = True
+		self._running.append((entry, time.time()))
+
+	def end(self, input_size, output_size):
+		entry, start = self._running.pop()
+		entry['seconds'] += time.time() - start
+		entry['input'] += input_size
+		entry['output'] += output_size
+		entry['runs'] += 1
+
+	def count(self, matches):
+		if self._running:
+			self._running[-1][0]['matches'] += matches
+
+	def timed(self, name, func, text, *args):
+		"""func(text, *args) as the pass called name.  func returns text."""
+
+		self.begin(name)
+		try:
+			result = func(text, *args)
+		except:
+			self._running.pop()
+			raise
+		self.end(len(text), len(result))
+		return result
+
+	def total_seconds(self):
+		# nested passes are already part of the pass around them
+		return sum(entry['seconds'] for entry in self.passes if not entry.get('nested'))
+
+	def as_dict(self):
+		return { 'minifier': self.minifier, 'passes': [dict(entry) for entry in self.passes] }
+
+	def report(self):
+		"""The stats as a table of text."""
+
+		lines = [self.minifier, "%-34s %10s %10s %10s %8s" % ('pass', 'ms', 'in', 'out', 'matches')]
+		for entry in self.passes:
+			name = entry['name']
+			if entry.get('nested'):
+				name = '  ' + name
+			lines.append("%-34s %10.2f %10d %10d %8d" % (name, entry['seconds'] * 1000,
+				entry['input'], entry['output'], entry['matches']))
+		lines.append("%-34s %10.2f" % ('total', self.total_seconds() * 1000))
+		return '\n'.join(lines)
@@ -0,0 +1,121 @@
+# Copyright 2011 Trent Richardson
+#
+# This file is part of Gedit Clientside Plugin.
+#
+# Gedit Clientside Plugin is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gedit Clientside Plugin is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gedit Clientside Plugin. If not, see <http://www.gnu.org/licenses/>.
+
+# Block parallel gzip, the way pigz does it.  The input is cut into blocks
+# that are deflated on a pool of threads (zlib lets go of the GIL while it
+# compresses) and written out in order as one ordinary gzip member: every
+# block but the last ends with a sync flush, so the raw deflate streams
+# can simply be joined.  Anything that reads gzip, gzip -d or a browser,
+# reads the result.
+
+import os
+import time
+import zlib
+import struct
+import itertools
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+DEFAULT_BLOCK_SIZE = 256 * 1024
+
+
+def _deflate(args):
+	data, start, end, level, last = args
+
+	# raw deflate, the gzip header and trailer are written around the blocks
+	compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, 9)
+	out = compressor.compress(buffer(data, start, end - start))
+	if last:
+		return out + compressor.flush(zlib.Z_FINISH)
+	return out + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def _header(level, filename, mtime):
+	flags = 0
+	if filename:
+		flags = 8 # FNAME
+
+	extra = 0
+	if level == 9:
+		extra = 2
+	elif level == 1:
+		extra = 4
+
+	header = '\037\213\010' + chr(flags) + struct.pack('<L', long(mtime)) + chr(extra) + '\377'
+	if filename:
+		header += filename + '\000'
+	return header
+
+
+def write_gzip(outfile, data, level=9, threads=None, block_size=DEFAULT_BLOCK_SIZE, filename='', mtime=None, progress=None):
+	"""
+	Write data gzipped to the file object outfile.  threads defaults to the
+	number of cpus, progress(done, total) is called after each block is written.
+	"""
+
+	if threads is None or threads < 1:
+		threads = multiprocessing.cpu_count()
+	if mtime is None:
+		mtime = time.time()
+	if isinstance(filename, unicode):
+		filename = filename.encode('latin-1', 'replace')
+
+	total = len(data)
+	blocks = []
+	for start in range(0, total, block_size):
+		end = min(start + block_size, total)
+		blocks.append((data, start, end, level, end == total))
+	if not blocks:
+		blocks.append((data, 0, 0, level, True))
+
+	outfile.write(_header(level, filename, mtime))
+
+	if threads == 1 or len(blocks) == 1:
+		pool = None
+		deflated = (_deflate(block) for block in blocks)
+	else:
+		pool = ThreadPool(min(threads, len(blocks)))
+		deflated = pool.imap(_deflate, blocks)
+
+	try:
+		crc = 0
+		for block, out in itertools.izip(blocks, deflated):
+			data, start, end = block[:3]
+			outfile.write(out)
+			crc = zlib.crc32(buffer(data, start, end - start), crc)
+			if progress is not None:
+				progress(end, total)
+	finally:
+		if pool is not None:
+			pool.close()
+			pool.join()
+
+	outfile.write(struct.pack('<LL', crc & 0xffffffffL, total & 0xffffffffL))
+
+
+def compress_file(path, data, level=9, threads=None, progress=None):
+	"""gzip data into path, the name stored in the header is path's without .gz"""
+
+	name = os.path.basename(path)
+	if name.endswith('.gz'):
+		name = name[:-3]
+
+	f = open(path, 'wb')
+	try:
+		write_gzip(f, data, level, threads, filename=name, progress=progress)
+	finally:
+		f.close()
@@ -0,0 +1,207 @@
+# Copyright 2011 Trent Richardson
+#
+# This file is part of Gedit Clientside Plugin.
+#
+# Gedit Clientside Plugin is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gedit Clientside Plugin is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gedit Clientside Plugin. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import pickle
+import hashlib
+
+PLUGIN_DIR = os.path.split(__file__)[0]
+
+# the cache's directory under the user's cache directory, the plugin's own
+# directory is often not writable
+CACHE_NAME = "gedit-clientside"
+
+# the files an operation's output depends on, a change to any of them
+# (an upgraded engine) gives every entry for that operation a new key
+ENGINE_FILES = {
+	'minify_js': ['jsmin.py'],
+	'mangle_js': ['jsmangle.py'],
+	'minify_css': ['cssmin.py'],
+	'optimize_css': ['cssopt.py'],
+	'format_js': ['jsbeautify/beautify.js', 'jsbeautifier.py'],
+	'lint_js': ['jslint_node.js'],
+	'lint_css': ['csslint-node.js'],
+}
+
+_engine_versions = {}
+
+
+def user_cache_dir():
+	"""$XDG_CACHE_HOME/gedit-clientside, or ~/.cache/gedit-clientside without it."""
+
+	base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+	return os.path.join(base, CACHE_NAME)
+
+
+def engine_version(op):
+	"""A hash of the engine files behind op."""
+
+	if op not in _engine_versions:
+		h = hashlib.sha1()
+		for name in ENGINE_FILES.get(op, []):
+			try:
+				f = open(os.path.join(PLUGIN_DIR, name), 'rb')
+				h.update(f.read())
+				f.close()
+			except IOError:
+				h.update(name)
+		_engine_versions[op] = h.hexdigest()
+	return _engine_versions[op]
+
+
+class ResultCache:
+	"""
+	Minify, format and lint results on disk, one file per result named by the
+	hash of the operation, its engine version, its options and the input.
+	A hit touches the file, and when the cache grows past max_size the least
+	recently used files are removed.
+	"""
+
+	def __init__(self, directory=None, max_size=32 * 1024 * 1024):
+		self.directory = directory or user_cache_dir()
+		self.max_size = max_size
+		self.hits = 0
+		self.misses = 0
+		self._size = None
+
+	def key(self, op, code, options=None):
+		if isinstance(code, unicode):
+			code = code.encode('utf-8')
+
+		h = hashlib.sha1()
+		h.update(op + '\0' + engine_version(op) + '\0')
+		h.update(repr(sorted((options or {}).items())) + '\0')
+		h.update(code)
+		return h.hexdigest()
+
+	def _path(self, key):
+		return os.path.join(self.directory, key)
+
+	def get(self, key):
+		"""Returns (found, result)."""
+
+		path = self._path(key)
+		try:
+			f = open(path, 'rb')
+			try:
+				result = pickle.load(f)
+			finally:
+				f.close()
+			os.utime(path, None)
+		except (IOError, OSError, EOFError, pickle.UnpicklingError):
+			self.misses += 1
+			return False, None
+
+		self.hits += 1
+		return True, result
+
+	def put(self, key, result):
+		data = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+		path = self._path(key)
+		tmp_path = "%s.%d.tmp" % (path, os.getpid())
+
+		try:
+			# made with the first entry, nothing is created by only reading
+			if not os.path.isdir(self.directory):
+				os.makedirs(self.directory)
+
+			# written aside and renamed so a reader never sees half an entry
+			f = open(tmp_path, 'wb')
+			try:
+				f.write(data)
+			finally:
+				f.close()
+			os.rename(tmp_path, path)
+		except (IOError, OSError):
+			# the cache is only a shortcut, one that can't be written (a full
+			# disk, no permission) just misses every time
+			try:
+				os.remove(tmp_path)
+			except OSError:
+				pass
+			return
+
+		if self._size is None:
+			self.trim()
+		else:
+			self._size += len(data)
+			if self._size > self.max_size:
+				self.trim()
+
+	def run(self, op, code, options, func):
+		"""The cached result of op on code, func() computes it on a miss."""
+
+		key = self.key(op, code, options)
+		found, result = self.get(key)
+		if not found:
+			result = func()
+			self.put(key, result)
+		return result
+
+	def _entries(self):
+		entries = []
+		try:
+			names = os.listdir(self.directory)
+		except OSError:
+			return entries
+
+		for name in names:
+			if name.endswith('.tmp'):
+				continue
+			try:
+				st = os.stat(os.path.join(self.directory, name))
+			except OSError:
+				continue
+			entries.append((st.st_mtime, st.st_size, name))
+		return entries
+
+	def trim(self):
+		"""Remove least recently used entries until the cache fits in max_size."""
+
+		entries = self._entries()
+		entries.sort()
+		size = sum(e[1] for e in entries)
+
+		for mtime, entry_size, name in entries:
+			if size <= self.max_size:
+				break
+			try:
+				os.remove(os.path.join(self.directory, name))
+			except OSError:
+				continue
+			size -= entry_size
+
+		self._size = size
+
+	def clear(self):
+		for mtime, entry_size, name in self._entries():
+			try:
+				os.remove(os.path.join(self.directory, name))
+			except OSError:
+				pass
+		self._size = 0
+		self.hits = 0
+		self.misses = 0
+
+	def stats(self):
+		entries = self._entries()
+		return {
+			'entries': len(entries),
+			'size': sum(e[1] for e in entries),
+			'hits': self.hits,
+			'misses': self.misses,
+		}
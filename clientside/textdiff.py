@@ -0,0 +1,170 @@
+# Copyright 2011 Trent Richardson
+#
+# This file is part of Gedit Clientside Plugin.
+#
+# Gedit Clientside Plugin is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gedit Clientside Plugin is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gedit Clientside Plugin. If not, see <http://www.gnu.org/licenses/>.
+
+import bisect
+
+# past this many changed spans the changed middle is replaced whole, more
+# buffer edits would cost more than they save
+MAX_SPANS = 1000
+
+# how deep the line diff looks for matching lines inside a changed stretch
+MAX_DEPTH = 32
+
+
+def _prefix_length(a, b):
+	# the longest k with a[:k] == b[:k], by halving so slices are compared in C
+	lo, hi = 0, min(len(a), len(b))
+	while lo < hi:
+		mid = (lo + hi + 1) // 2
+		if a[lo:mid] == b[lo:mid]:
+			lo = mid
+		else:
+			hi = mid - 1
+	return lo
+
+
+def _suffix_length(a, b, limit):
+	lo, hi = 0, limit
+	la, lb = len(a), len(b)
+	while lo < hi:
+		mid = (lo + hi + 1) // 2
+		if a[la - mid:la - lo] == b[lb - mid:lb - lo]:
+			lo = mid
+		else:
+			hi = mid - 1
+	return lo
+
+
+def _unique_matches(a, alo, ahi, b, blo, bhi):
+	# the lines found exactly once on each side, as (i, j) pairs in order of i
+	counts = {}
+	for i in xrange(alo, ahi):
+		line = a[i]
+		counts[line] = line in counts and -1 or i
+	matches = {}
+	for j in xrange(blo, bhi):
+		line = b[j]
+		i = counts.get(line, -1)
+		if i >= 0:
+			if line in matches:
+				counts[line] = -1
+				del matches[line]
+			else:
+				matches[line] = (i, j)
+	return sorted(matches.values())
+
+
+def _longest_increasing(pairs):
+	# the longest run of pairs whose j also increases, by patience sorting
+	tails = []
+	tail_index = []
+	back = [None] * len(pairs)
+	for k, (i, j) in enumerate(pairs):
+		pos = bisect.bisect_left(tails, j)
+		if pos == len(tails):
+			tails.append(j)
+			tail_index.append(k)
+		else:
+			tails[pos] = j
+			tail_index[pos] = k
+		if pos:
+			back[k] = tail_index[pos - 1]
+
+	run = []
+	k = tail_index and tail_index[-1] or None
+	while k is not None:
+		run.append(pairs[k])
+		k = back[k]
+	run.reverse()
+	return run
+
+
+def _diff_lines(a, alo, ahi, b, blo, bhi, spans, depth):
+	"""
+	Patience diff of a[alo:ahi] and b[blo:bhi], appending (i1, i2, j1, j2)
+	for every stretch of a to replace with one of b.  Lines that appear once
+	on each side anchor the match and the stretches between them are
+	diffed the same way.
+	"""
+
+	while alo < ahi and blo < bhi and a[alo] == b[blo]:
+		alo += 1
+		blo += 1
+	while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+		ahi -= 1
+		bhi -= 1
+
+	if alo == ahi or blo == bhi:
+		if alo < ahi or blo < bhi:
+			spans.append((alo, ahi, blo, bhi))
+		return
+
+	anchors = depth < MAX_DEPTH and _longest_increasing(_unique_matches(a, alo, ahi, b, blo, bhi)) or []
+	if not anchors:
+		spans.append((alo, ahi, blo, bhi))
+		return
+
+	for i, j in anchors:
+		_diff_lines(a, alo, i, b, blo, j, spans, depth + 1)
+		alo, blo = i + 1, j + 1
+	_diff_lines(a, alo, ahi, b, blo, bhi, spans, depth + 1)
+
+
+def diff_spans(old, new):
+	"""
+	The changes that turn old into new as [(start, end, text), ...]: replace
+	old[start:end] with text.  The spans are in order and do not overlap, so
+	applying them from the last one back keeps the offsets of the others good.
+	Unchanged text at either end is trimmed first and the rest is compared a
+	line at a time.
+	"""
+
+	if old == new:
+		return []
+
+	prefix = _prefix_length(old, new)
+	suffix = _suffix_length(old, new, min(len(old), len(new)) - prefix)
+
+	# whole lines in the middle, so a line that only moved still matches
+	prefix = old.rfind('\n', 0, prefix) + 1
+	if suffix and old[len(old) - suffix - 1:len(old) - suffix] != '\n':
+		line_end = old.find('\n', len(old) - suffix)
+		if line_end < 0:
+			suffix = 0
+		else:
+			suffix = len(old) - line_end - 1
+
+	old_end = len(old) - suffix
+	new_end = len(new) - suffix
+	old_lines = old[prefix:old_end].splitlines(True)
+	new_lines = new[prefix:new_end].splitlines(True)
+
+	old_offsets = [prefix]
+	for line in old_lines:
+		old_offsets.append(old_offsets[-1] + len(line))
+	new_offsets = [prefix]
+	for line in new_lines:
+		new_offsets.append(new_offsets[-1] + len(line))
+
+	spans = []
+	_diff_lines(old_lines, 0, len(old_lines), new_lines, 0, len(new_lines), spans, 0)
+	spans = [(old_offsets[i1], old_offsets[i2], new_offsets[j1], new_offsets[j2]) for i1, i2, j1, j2 in spans]
+
+	if len(spans) > MAX_SPANS:
+		spans = [(spans[0][0], spans[-1][1], spans[0][2], spans[-1][3])]
+
+	return [(start, end, new[new_start:new_stop]) for start, end, new_start, new_stop in spans]
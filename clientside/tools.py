@@ -0,0 +1,566 @@
+# Copyright 2011 Trent Richardson
+#
+# This file is part of Gedit Clientside Plugin.
+#
+# Gedit Clientside Plugin is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# any later version.
+#
+# Gedit Clientside Plugin is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Gedit Clientside Plugin. If not, see <http://www.gnu.org/licenses/>.
+
+# The minify, format and lint tools behind the plugin's menu items.  Nothing
+# in here needs Gedit or Gtk, so the command line tool (cli.py) uses the same
+# code and the same settings as the plugin.
+
+from StringIO import StringIO
+from jsmin import jsmin_stream, jsmin_profile
+from cssmin import CSSMin
+from pgzip import compress_file
+from jsbeautifier import js_beautify
+from jsmangle import mangle, MANGLE_VERSION
+from cssopt import optimize, dedupe_sheets
+from resultcache import ResultCache
+
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import pickle
+import signal
+import threading
+import subprocess
+
+CONFIG_STORE = os.path.join(os.path.split(__file__)[0], "defaults.pkl")
+CLI_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli.py")
+
+# inside Gedit sys.executable is Gedit itself
+PYTHON = os.path.basename(sys.executable).startswith('python') and sys.executable or 'python'
+
+DEFAULT_SETTINGS = {
+	'replace_contents': 2, # 0=clipboard, 1=replace, 2=ask what to do
+	'scope_to_block': 'true', # with nothing selected, work on the block around the cursor
+	'nodejs': 'node',
+	'indent_size': '1',
+	'indent_char': '\t',
+	'braces_on_own_line': 'false',
+	'preserve_newlines': 'true',
+	'keep_array_indentation': 'true',
+	'space_after_anon_function': 'true',
+	'decompress': 'true',
+	'format_js_engine': 'auto', # 'python', 'node', or 'auto' to pick the faster for the file
+	'profile_minify': 'false', # time each minify pass, see Last Minify Timings
+	'mangle_js': 'false', # shorten the local names of functions when minifying js
+	'optimize_css': 'false', # merge rules and collapse shorthands when minifying css
+	'cache_size': 32 * 1024 * 1024, # bytes of minify, format and lint results kept on disk
+	'lint_as_you_type': 'false',
+	'lint_delay': 750, # milliseconds without an edit before linting
+	'lint_max_issues': 1000, # stop linting after this many issues, 0 for no limit
+	'gzip_level': 9,
+	'gzip_threads': 0, # 0 for one per cpu
+	'node_workers': 2, # node processes shared by all windows
+	'node_idle_timeout': 300, # seconds an unused node process is kept
+	'node_timeout': 30, # seconds a lint or format may run
+	'node_memory_limit': 512, # megabytes node may use
+	'node_max_output': 64 * 1024 * 1024, # bytes a lint or format may return
+}
+
+CHARSET_RE = re.compile(r'(@charset \".+\";)')
+
+JSLINT_OPTIONS = { 'browser': True, 'forin': True }
+CSSLINT_OPTIONS = None # None runs CSSLint's default rules, {} would run none
+
+
+def read_settings(config_store=CONFIG_STORE):
+	"""The plugin's saved settings, or the defaults if it has not saved any."""
+
+	settings = dict(DEFAULT_SETTINGS)
+	if os.path.exists(config_store):
+		pkl_file = open(config_store, 'rb')
+		settings.update(pickle.load(pkl_file))
+		pkl_file.close()
+	return settings
+
+
+def write_settings(settings, config_store=CONFIG_STORE):
+	output = open(config_store, 'wb')
+	pickle.dump(settings, output)
+	output.close()
+
+
+def node_limits(settings):
+	"""The NodeWorker limits from the settings, (timeout, memory_limit, max_output)."""
+
+	return settings['node_timeout'], settings['node_memory_limit'], settings['node_max_output']
+
+
+def minify_js(js, mangle_names=False):
+	outs = StringIO()
+
+	# newlines are dropped as the minifier writes instead of in one more
+	# pass over the whole result
+	jsmin_stream(StringIO(js), outs, keep_newlines=False)
+
+	if mangle_names:
+		return mangle(outs.getvalue())
+	return outs.getvalue()
+
+
+def mangle_report(minified, mangled):
+	"""What mangling minified js saved, before and after gzip, for the user."""
+
+	gzipped = len(zlib.compress(minified, 9)) - len(zlib.compress(mangled, 9))
+	return "Mangling saved %d bytes, %d bytes gzipped." % (len(minified) - len(mangled), gzipped)
+
+
+def minify_css(css, optimize_rules=False):
+	if optimize_rules:
+		return optimize(CSSMin().minify(css))[0]
+	return CSSMin().minify(css)
+
+
+def optimize_report(saved):
+	"""What each css optimization saved, for the user."""
+
+	return "Optimizing saved %d bytes: %s." % (sum([size for name, size in saved]),
+		", ".join(["%d on %s" % (size, name) for name, size in saved]))
+
+
+def minify_js_profile(js):
+	"""minify_js, returning (minified, stats) with the PassStats of the run."""
+
+	return jsmin_profile(js, keep_newlines=False)
+
+
+def minify_css_profile(css):
+	"""minify_css, returning (minified, stats) with the PassStats of the run."""
+
+	return CSSMin().profile(css)
+
+
+def format_css(css, settings):
+	braces_new_line = (settings['braces_on_own_line'] == 'true')
+	tab = settings['indent_char'] * int(settings['indent_size'])
+
+	return CSSMin().format(css, braces_new_line, tab)
+
+
+def minify_file(path, filter_type, mangle_names=False, optimize_rules=False):
+	"""
+	Read and minify one file of a batch, with mangle_names js gets its local
+	names shortened and with optimize_rules css gets its rules optimized.
+	Returns (charset, code), the css @charset rule is taken out of the code
+	so the bundle only gets one.
+	"""
+
+	f = open(path, 'r')
+	code = f.read()
+	f.close()
+
+	if filter_type != 'css':
+		return '', minify_js(code, mangle_names)
+
+	charset = ''
+	charsets = CHARSET_RE.findall(code)
+	if charsets:
+		charset = charsets[0]
+		code = CHARSET_RE.sub('', code)
+
+	return charset, minify_css(code, optimize_rules)
+
+
+def dedupe_batch(results):
+	"""
+	The css minify_file results of a batch with the rules a later file repeats
+	dropped, and the bytes that saved.
+	"""
+
+	sheets, saved = dedupe_sheets([code for charset, code in results])
+	return [(charset, code) for (charset, old), code in zip(results, sheets)], saved
+
+
+def dedupe_report(saved):
+	"""What dedupe_batch saved, for the user."""
+
+	return "Deduplicated %d bytes of rules repeated across files." % saved
+
+
+def join_batch(filenames, results):
+	"""
+	Bundle the minify_file results in the order of filenames.  A file with
+	nothing left, all its rules deduplicated, gets no banner.
+	"""
+
+	charset = ''
+	parts = []
+	for path, (file_charset, code) in zip(filenames, results):
+		if file_charset:
+			charset = file_charset
+		if not code.strip():
+			continue
+		parts.append('/* ' + os.path.basename(path) + ' */\n' + code + '\n\n')
+
+	if charset:
+		parts.insert(0, charset + '\n\n')
+
+	return ''.join(parts)
+
+
+class BatchMinify:
+	"""
+	Minify a batch of files with cli.py batch, in a process of its own that
+	spreads the files over a pool of processes.  mangle_js and optimize_css
+	are read from the settings in config_store.
+	"""
+
+	def __init__(self, filenames, config_store=CONFIG_STORE):
+		self.filenames = filenames
+		self.args = [PYTHON, CLI_SCRIPT, 'batch', '--quiet', '--settings', config_store] + list(filenames)
+		self._proc = None
+		self._killed = False
+		self._lock = threading.Lock()
+
+	def run(self):
+		"""
+		Yield (index, result, error) for each file as it is done, in no
+		particular order.  result is what minify_file returns and error the
+		message for a file that couldn't be minified, one of them is None.
+		"""
+
+		self._lock.acquire()
+		try:
+			if self._killed:
+				return
+			# its own process group, so a kill takes the pool with it
+			self._proc = subprocess.Popen(self.args, stdout=subprocess.PIPE, close_fds=True,
+				preexec_fn=getattr(os, 'setsid', None))
+		finally:
+			self._lock.release()
+
+		done = 0
+		try:
+			while True:
+				header = self._proc.stdout.readline()
+				if not header:
+					break
+				json_length, text_length = [int(n) for n in header.split()]
+				response = json.loads(self._proc.stdout.read(json_length))
+				code = self._proc.stdout.read(text_length)
+				done += 1
+				if response['error']:
+					yield response['index'], None, response['error']
+				else:
+					yield response['index'], (str(response['charset']), code), None
+		finally:
+			self._proc.stdout.close()
+			killed = self._killed
+			if done < len(self.filenames):
+				# the caller stopped early or cli.py died, the pool goes too
+				self.kill()
+			self._proc.wait()
+
+		if done < len(self.filenames) and not killed:
+			raise IOError("Batch minify stopped after %d of %d files" % (done, len(self.filenames)))
+
+	def kill(self):
+		"""Stop the batch from another thread, run() stops with what it has."""
+
+		self._lock.acquire()
+		try:
+			self._killed = True
+			if self._proc is None or self._proc.poll() is not None:
+				return
+			try:
+				if hasattr(os, 'killpg'):
+					os.killpg(self._proc.pid, signal.SIGKILL)
+				else:
+					self._proc.kill()
+			except OSError:
+				pass
+		finally:
+			self._lock.release()
+
+
+def min_path(path):
+	"""name.js -> name.min.js"""
+
+	base, ext = os.path.splitext(path)
+	return base + '.min' + ext
+
+
+def build_options(settings):
+	"""The settings a build's output depends on, see build."""
+
+	options = { 'mangle_js': settings['mangle_js'], 'optimize_css': settings['optimize_css'] }
+	if settings['mangle_js'] == 'true':
+		# a min file from an older mangler is rebuilt
+		options['mangle_version'] = MANGLE_VERSION
+	return options
+
+
+def _build_key(output, options, cache):
+	return cache.key('build', os.path.abspath(output), options)
+
+
+def is_up_to_date(output, inputs, options=None, cache=None):
+	"""
+	True if output and its .gz exist and are newer than every input.  With
+	options output must also have been built with them, builds are recorded
+	in cache (a ResultCache).
+	"""
+
+	try:
+		built = min(os.path.getmtime(output), os.path.getmtime(output + '.gz'))
+	except OSError:
+		return False
+
+	for path in inputs:
+		if os.path.getmtime(path) > built:
+			return False
+
+	if options is None:
+		return True
+
+	# a build with other options, or one the cache has forgotten, is stale
+	cache = cache or ResultCache()
+	found, mtime = cache.get(_build_key(output, options, cache))
+	return found and mtime == os.path.getmtime(output)
+
+
+def write_artifacts(output, code, level=9, threads=None):
+	"""Write code to output and output.gz.  Returns the gzipped size."""
+
+	f = open(output, 'wb')
+	f.write(code)
+	f.close()
+
+	compress_file(output + '.gz', code, level, threads)
+
+	return os.path.getsize(output + '.gz')
+
+
+def build(inputs, output, minify, level=9, threads=None, options=None, cache=None):
+	"""
+	Minify the inputs into output and output.gz, unless they are already newer
+	than the inputs and were built with options (see build_options and
+	is_up_to_date).  minify() returns the minified code.  Returns
+	(original, minified, gzipped, skipped) byte counts.
+	"""
+
+	original = sum(os.path.getsize(path) for path in inputs)
+
+	if is_up_to_date(output, inputs, options, cache):
+		return original, os.path.getsize(output), os.path.getsize(output + '.gz'), True
+
+	code = minify()
+	gzipped = write_artifacts(output, code, level, threads)
+
+	if options is not None:
+		cache = cache or ResultCache()
+		cache.put(_build_key(output, options, cache), os.path.getmtime(output))
+
+	return original, len(code), gzipped, False
+
+
+def build_report(output, sizes):
+	"""One line about a built artifact for the user."""
+
+	original, minified, gzipped, skipped = sizes
+	if skipped:
+		return "%s: up to date (%d -> %d -> %d bytes gzipped)" % (output, original, minified, gzipped)
+	return "%s: %d -> %d -> %d bytes gzipped" % (output, original, minified, gzipped)
+
+
+def beautify_options(settings):
+	"""JS-Beautify options for the given settings."""
+
+	return {
+		'indent_size': int(settings['indent_size']),
+		'indent_char': settings['indent_char'],
+		'preserve_newlines': settings['preserve_newlines'] == 'true',
+		'space_after_anon_function': settings['space_after_anon_function'] == 'true',
+		'keep_array_indentation': settings['keep_array_indentation'] == 'true',
+		'braces_on_own_line': settings['braces_on_own_line'] == 'true',
+	}
+
+
+class FormatEngines:
+	"""
+	Picks the in-process JS beautifier or node's for a file from its size and
+	how fast earlier runs were.  Python starts at once but formats slower,
+	node costs a round trip per request, and starting it, on top of a faster
+	formatter.  Every run's time updates the estimates.
+	"""
+
+	# starting estimates, bytes per second and seconds
+	PYTHON_RATE = 700 * 1024
+	NODE_RATE = 3 * 1024 * 1024
+	NODE_LATENCY = 0.005
+	NODE_STARTUP = 0.15
+
+	# inputs smaller than this say more about latency than rate
+	SMALL = 16 * 1024
+
+	# weight of the newest run in the estimates
+	SMOOTHING = 0.3
+
+	def __init__(self):
+		self.python_rate = self.PYTHON_RATE
+		self.node_rate = self.NODE_RATE
+		self.node_latency = self.NODE_LATENCY
+		self.node_startup = self.NODE_STARTUP
+
+	def estimate(self, engine, size, node_running=True):
+		"""Expected seconds for engine to format size bytes."""
+
+		if engine == 'python':
+			return float(size) / self.python_rate
+		seconds = self.node_latency + float(size) / self.node_rate
+		if not node_running:
+			seconds += self.node_startup
+		return seconds
+
+	def choose(self, size, node_running):
+		if self.estimate('python', size) <= self.estimate('node', size, node_running):
+			return 'python'
+		return 'node'
+
+	def _smooth(self, old, new):
+		return old + (new - old) * self.SMOOTHING
+
+	def record(self, engine, size, seconds, started=False):
+		"""Learn from a run, started when node had to be started for it."""
+
+		if engine == 'python':
+			if size >= self.SMALL and seconds > 0:
+				self.python_rate = self._smooth(self.python_rate, size / seconds)
+			return
+
+		if started:
+			startup = seconds - self.estimate('node', size)
+			self.node_startup = self._smooth(self.node_startup, max(startup, 0.0))
+		elif size < self.SMALL:
+			latency = seconds - float(size) / self.node_rate
+			self.node_latency = self._smooth(self.node_latency, max(latency, 0.0))
+		else:
+			working = seconds - self.node_latency
+			if working > 0:
+				self.node_rate = self._smooth(self.node_rate, size / working)
+
+
+FORMAT_ENGINES = FormatEngines()
+
+
+def format_js(js, settings, worker):
+	"""
+	Format js with JS-Beautify, in process or on the given NodeWorker as
+	settings['format_js_engine'] says.  Both give the same output.
+	"""
+
+	engine = settings['format_js_engine']
+	started = not worker.is_running()
+	if engine not in ('python', 'node'):
+		engine = FORMAT_ENGINES.choose(len(js), not started)
+
+	start = time.time()
+	if engine == 'python':
+		formatted = js_beautify(js, beautify_options(settings))
+	else:
+		formatted = worker.request('format_js', js, beautify_options(settings))
+	FORMAT_ENGINES.record(engine, len(js), time.time() - start, started and engine == 'node')
+
+	return formatted
+
+
+def lint_options(lint_type, settings):
+	"""The request options for linting 'js' or 'css' with the given settings."""
+
+	rules = CSSLINT_OPTIONS
+	if lint_type == 'js':
+		rules = JSLINT_OPTIONS
+
+	options = { 'max_issues': int(settings['lint_max_issues']) }
+	if rules is not None:
+		options['rules'] = rules
+	return options
+
+
+def _issue(raw):
+	# the format populate_bottom_tab expects
+	return {
+		'line': int(raw['line']),
+		'char': int(raw['character']),
+		'text': raw['reason'],
+		'severity': raw['severity'],
+		'rule': raw['rule'],
+		'evidence': raw['evidence'],
+	}
+
+
+def shift_issues(issues, line, char):
+	"""
+	The issues of a text that starts at line and char, counted from 0, of a
+	document as issues of the document.  Issues of the whole text, with no
+	line, stay as they are.
+	"""
+
+	shifted = []
+	for issue in issues:
+		issue = dict(issue)
+		if issue['line'] > 0:
+			if issue['line'] == 1:
+				issue['char'] += char
+			issue['line'] += line
+		shifted.append(issue)
+	return shifted
+
+
+def lint_js(js, worker, options=None, on_issue=None):
+	"""
+	Run JSLint on the given NodeWorker.  Returns [{'line', 'char', 'text',
+	'severity', 'rule', 'evidence'}, ...], on_issue is called with each issue
+	as JSLint finds it.
+	"""
+
+	issues = []
+
+	def collect(raw):
+		issue = _issue(raw)
+		issues.append(issue)
+		if on_issue is not None:
+			on_issue(issue)
+
+	worker.request('lint_js', js, options or lint_options('js', DEFAULT_SETTINGS), collect)
+
+	return issues
+
+
+def lint_css(css, worker, options=None, on_issue=None):
+	"""Run CSSLint on the given NodeWorker, like lint_js."""
+
+	issues = []
+	rollups = []
+
+	def collect(raw):
+		issue = _issue(raw)
+		if raw['rollup']:
+			rollups.append(issue)
+		else:
+			issues.append(issue)
+		if on_issue is not None:
+			on_issue(issue)
+
+	worker.request('lint_css', css, options or lint_options('css', DEFAULT_SETTINGS), collect)
+
+	# CSSLint's own order, by line with the whole file rollups at the bottom
+	issues.sort(key=lambda e: e['line'])
+
+	return issues + rollups
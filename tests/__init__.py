@@ -0,0 +1,17 @@
+# Unit tests, run from the top of the repository with
+#
+#     python -m unittest discover -s tests -t .
+#
+# The plugin's modules import each other by name, so clientside/ goes on the
+# path, and benchmarks/ for the generated corpora.  The tests that need node
+# are skipped when it is not installed.
+
+import os
+import sys
+from distutils.spawn import find_executable
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'clientside'))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+NODE = find_executable('node') or find_executable('nodejs')
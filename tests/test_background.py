@@ -0,0 +1,104 @@
+# BackgroundRunner with a queue standing in for the main loop: only the newest
+# job's result is delivered, and a running job is interrupted when a newer one
+# is submitted.
+
+import threading
+import unittest
+from Queue import Queue, Empty
+
+from background import BackgroundRunner, batched
+
+
+class RunnerTest(unittest.TestCase):
+
+	def setUp(self):
+		self.main_loop = Queue()
+		self.interrupted = threading.Event()
+		self.runner = BackgroundRunner(self.deliver, self.interrupted.set)
+		self.results = []
+
+	def deliver(self, func, *args):
+		self.main_loop.put((func, args))
+
+	def run_main_loop(self, until):
+		# call what the thread delivered until until() or a timeout
+		while not until():
+			try:
+				func, args = self.main_loop.get(timeout=5)
+			except Empty:
+				self.fail("nothing was delivered")
+			func(*args)
+
+	def callback(self, result, error):
+		self.results.append((result, error))
+
+	def test_result(self):
+		self.runner.submit(lambda: 42, self.callback)
+		self.run_main_loop(lambda: self.results)
+		self.assertEqual(self.results, [(42, None)])
+
+	def test_error(self):
+		self.runner.submit(lambda: 1 / 0, self.callback)
+		self.run_main_loop(lambda: self.results)
+		self.assertTrue(isinstance(self.results[0][1], ZeroDivisionError))
+
+	def test_newer_job_wins(self):
+		release = threading.Event()
+
+		def slow():
+			release.wait(5)
+			return 'old'
+
+		self.runner.submit(slow, self.callback)
+		self.runner.submit(lambda: 'waiting', self.callback)
+		self.runner.submit(lambda: 'new', self.callback)
+		# the running job is asked to stop, the waiting one is replaced
+		self.assertTrue(self.interrupted.wait(5))
+		release.set()
+		self.run_main_loop(lambda: self.results)
+		self.assertEqual(self.results, [('new', None)])
+
+	def test_cancel(self):
+		release = threading.Event()
+		done = threading.Event()
+
+		def job():
+			release.wait(5)
+			return 'cancelled'
+
+		self.runner.submit(job, self.callback)
+		self.runner.cancel()
+		release.set()
+		self.runner.submit(lambda: 'after', lambda result, error: done.set())
+		self.run_main_loop(done.is_set)
+		self.assertEqual(self.results, [])
+
+	def test_progress(self):
+		progress = []
+
+		def job(report):
+			for i in range(3):
+				report(i)
+			return 'done'
+
+		self.runner.submit(job, self.callback, progress.append)
+		self.run_main_loop(lambda: self.results)
+		self.assertEqual(progress, [0, 1, 2])
+		self.assertEqual(self.results, [('done', None)])
+
+
+class BatchedTest(unittest.TestCase):
+
+	def test_batched(self):
+		reports = []
+		add = batched(reports.append, 0)
+		add(1)
+		add(2)
+		self.assertEqual(reports, [[1], [2]])
+
+	def test_held_back(self):
+		reports = []
+		add = batched(reports.append, 3600)
+		for i in range(100):
+			add(i)
+		self.assertEqual(reports, [])
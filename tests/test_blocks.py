@@ -0,0 +1,80 @@
+# The top-level blocks of CSS and JS, and the block around an offset that
+# format, minify and lint are scoped to.
+
+import unittest
+
+from blocks import block_around, top_level_blocks
+from corpus import CORPORA, make_corpus
+from tools import shift_issues
+
+EXPECTED = [
+	('css', 'a { b: c; }\n\n/* c */\nd, e { f: g }\n@media x { h { i: j } }\n',
+		['a { b: c; }', '/* c */\nd, e { f: g }', '@media x { h { i: j } }']),
+	('css', '@import "a;b";\np { content: "}" }', ['@import "a;b";', 'p { content: "}" }']),
+	('css', '', []),
+	('js', 'var a = 1;\nfunction f() {\n  return {a: 1};\n}\nif (a) { b() } else { c() }\nx = /}/.test(y)\n',
+		['var a = 1;', 'function f() {\n  return {a: 1};\n}', 'if (a) { b() } else { c() }', 'x = /}/.test(y)']),
+	('js', 'do { a() } while (b);\nvar s = "{" + \'}\';\ntry { a } catch (e) { b } finally { c }\nz',
+		['do { a() } while (b);', 'var s = "{" + \'}\';', 'try { a } catch (e) { b } finally { c }', 'z']),
+	('js', 'var o = {\n a: 1\n}.a;\nvar f = function () {\n};\n// end',
+		['var o = {\n a: 1\n}.a;', 'var f = function () {\n};', '// end']),
+	('js', 'x = a / b; y = c / d;', ['x = a / b;', 'y = c / d;']),
+	('js', '   \n', []),
+]
+
+
+class TopLevelBlocksTest(unittest.TestCase):
+
+	def test_expected(self):
+		for lang, text, expected in EXPECTED:
+			self.assertEqual([text[start:end] for start, end in top_level_blocks(text, lang)], expected, repr(text))
+
+	def test_corpora(self):
+		for lang in sorted(CORPORA):
+			for name in sorted(CORPORA[lang]):
+				text = make_corpus(lang, name, 16 * 1024)
+				blocks = top_level_blocks(text, lang)
+				self.assertTrue(blocks, name)
+				# in order, and only whitespace left out
+				last = 0
+				for start, end in blocks:
+					self.assertTrue(last <= start < end, (lang, name, start, end))
+					self.assertEqual(text[last:start].strip(), '', (lang, name, start))
+					last = end
+				self.assertEqual(text[last:].strip(), '', (lang, name))
+
+	def test_until(self):
+		text = EXPECTED[3][1]
+		blocks = top_level_blocks(text, 'js')
+		for until in range(len(text) + 1):
+			some = top_level_blocks(text, 'js', until)
+			self.assertEqual(some, blocks[:len(some)])
+			self.assertTrue(some[-1][1] >= until or some == blocks, until)
+
+
+class BlockAroundTest(unittest.TestCase):
+
+	def test_offsets(self):
+		text = 'a { b: c; }\n\nd { e: f }\n'
+		for offset, expected in [(0, (0, 11)), (5, (0, 11)), (11, (0, 11)), (12, (13, 23)), (13, (13, 23)),
+				(len(text), (13, 23))]:
+			self.assertEqual(block_around(text, offset, 'css'), expected, offset)
+
+	def test_same_line(self):
+		# between two blocks on one line it is the one before
+		text = 'var a = 1;   var b = 2;'
+		self.assertEqual(block_around(text, 11, 'js'), (0, 10))
+
+	def test_no_blocks(self):
+		self.assertEqual(block_around('', 0, 'js'), None)
+		self.assertEqual(block_around('   ', 1, 'css'), None)
+
+
+class ShiftIssuesTest(unittest.TestCase):
+
+	def test_shift(self):
+		issues = [{ 'line': 1, 'char': 2 }, { 'line': 3, 'char': 4 }, { 'line': 0, 'char': 0 }]
+		self.assertEqual(shift_issues(issues, 10, 6),
+			[{ 'line': 11, 'char': 8 }, { 'line': 13, 'char': 4 }, { 'line': 0, 'char': 0 }])
+		# the issues passed in are left alone
+		self.assertEqual(issues[0], { 'line': 1, 'char': 2 })
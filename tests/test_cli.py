@@ -0,0 +1,189 @@
+# The cli commands on files in a temporary directory, with the default
+# settings.
+
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from StringIO import StringIO
+
+import cli
+from resultcache import ResultCache
+
+
+class CLITest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.stdout = sys.stdout
+		self.stderr = sys.stderr
+		sys.stdout = StringIO()
+		sys.stderr = StringIO()
+		# builds are recorded here instead of in the plugin's cache
+		cache = os.path.join(self.directory, 'cache')
+		cli.ResultCache = lambda max_size: ResultCache(cache, max_size)
+
+	def tearDown(self):
+		cli.ResultCache = ResultCache
+		sys.stdout = self.stdout
+		sys.stderr = self.stderr
+		shutil.rmtree(self.directory)
+
+	def path(self, name):
+		return os.path.join(self.directory, name)
+
+	def write(self, name, text):
+		cli._write(self.path(name), text)
+		return self.path(name)
+
+	def run_cli(self, *args):
+		# no settings file, so the defaults
+		settings = self.path('missing.pkl')
+		return cli.main(['-q', '-j', '1', '-s', settings] + list(args))
+
+
+class MinifyTest(CLITest):
+
+	def test_minify(self):
+		self.write('a.js', 'var a = 1;\n')
+		self.write('b.css', 'b { color: red; }\n')
+		self.assertEqual(self.run_cli('minify', self.directory), 0)
+		self.assertEqual(cli._read(self.path('a.min.js')), 'var a=1;')
+		self.assertEqual(cli._read(self.path('b.min.css')), 'b{color:red}')
+
+	def test_js_that_minifies_to_nothing(self):
+		# used to fall through to the css minifier
+		self.write('a.js', '// nothing but a comment\n')
+		self.assertEqual(self.run_cli('minify', self.directory), 0)
+		self.assertEqual(cli._read(self.path('a.min.js')), '')
+
+	def test_output_dir(self):
+		path = self.write('a.js', 'var a = 1;\n')
+		self.assertEqual(self.run_cli('minify', '-o', self.path('out'), path), 0)
+		self.assertEqual(cli._read(self.path(os.path.join('out', 'a.min.js'))), 'var a=1;')
+
+	def test_min_files_skipped(self):
+		self.write('a.min.js', 'var a = 1;\n')
+		self.assertEqual(self.run_cli('minify', self.directory), 0)
+		self.assertFalse(os.path.exists(self.path('a.min.min.js')))
+
+	def test_missing_file(self):
+		self.assertEqual(self.run_cli('minify', self.path('missing.js')), 2)
+
+	def test_broken_files(self):
+		# each is reported and counted, the good file is still minified
+		self.write('a.js', 'var a = "open;\n')
+		self.write('b.js', 'var b = 1; /* open\n')
+		self.write('c.js', 'var c = 1;\n')
+		self.assertEqual(self.run_cli('minify', self.directory), 2)
+		self.assertEqual(sys.stderr.getvalue().splitlines(), [
+			'%s: error: Unterminated string literal' % self.path('a.js'),
+			'%s: error: Unterminated comment' % self.path('b.js'),
+		])
+		self.assertEqual(cli._read(self.path('c.min.js')), 'var c=1;')
+
+	def test_broken_files_in_a_pool(self):
+		self.write('a.js', 'var a = /open\n')
+		self.write('b.js', 'var b = 1;\n')
+		self.assertEqual(cli.main(['-q', '-j', '2', '-s', self.path('missing.pkl'), 'minify', self.directory]), 2)
+		self.assertTrue('Unterminated regular expression' in sys.stderr.getvalue())
+		self.assertEqual(cli._read(self.path('b.min.js')), 'var b=1;')
+
+
+class GzipTest(CLITest):
+
+	def test_gzip(self):
+		path = self.write('a.js', 'var a = 1;\n' * 100)
+		self.assertEqual(self.run_cli('gzip', path), 0)
+		f = gzip.open(path + '.gz')
+		try:
+			self.assertEqual(f.read(), 'var a = 1;\n' * 100)
+		finally:
+			f.close()
+
+
+class FormatTest(CLITest):
+
+	def test_format_css(self):
+		path = self.write('a.css', 'a{b:c;d:e}')
+		self.assertEqual(self.run_cli('format', path), 0)
+		self.assertEqual(cli._read(path), 'a{\n\tb:c;\n\td:e\n}')
+
+
+class BuildTest(CLITest):
+
+	def gunzip(self, name):
+		f = gzip.open(self.path(name))
+		try:
+			return f.read()
+		finally:
+			f.close()
+
+	def test_build(self):
+		self.write('a.js', 'var a = 1;\n')
+		self.assertEqual(self.run_cli('build', self.directory), 0)
+		self.assertEqual(cli._read(self.path('a.min.js')), 'var a=1;')
+		self.assertEqual(self.gunzip('a.min.js.gz'), 'var a=1;')
+
+		sys.stdout = StringIO()
+		self.assertEqual(self.run_cli('build', self.directory), 0)
+		self.assertTrue('up to date' in sys.stdout.getvalue())
+
+	def test_js_that_minifies_to_nothing(self):
+		# used to fall through to the css minifier
+		self.write('a.js', '// nothing but a comment\n')
+		self.assertEqual(self.run_cli('build', self.directory), 0)
+		self.assertEqual(cli._read(self.path('a.min.js')), '')
+
+	def test_broken_bundle(self):
+		self.write('a.js', 'var a = "open;\n')
+		bundle = self.path('all.min.js')
+		self.assertEqual(self.run_cli('build', '-b', bundle, self.directory), 2)
+		self.assertTrue('Unterminated string literal' in sys.stderr.getvalue())
+		self.assertFalse(os.path.exists(bundle))
+
+	def test_bundle(self):
+		self.write('a.css', 'a { color: red; }\n')
+		self.write('b.css', 'b { color: blue; }\n')
+		self.write('c.js', 'var c = 1;\n')
+		bundle = self.path('all.min.css')
+		self.assertEqual(self.run_cli('build', '-b', bundle, self.directory), 0)
+		code = cli._read(bundle)
+		self.assertTrue(code.index('a{color:red}') < code.index('b{color:blue}'))
+		self.assertFalse('var' in code)
+		self.assertEqual(self.gunzip('all.min.css.gz'), code)
+
+
+class BatchTest(CLITest):
+
+	def frames(self):
+		# the (index, charset, code, error) of each frame batch wrote
+		out = StringIO(sys.stdout.getvalue())
+		frames = []
+		header = out.readline()
+		while header:
+			json_length, text_length = [int(n) for n in header.split()]
+			response = json.loads(out.read(json_length))
+			frames.append((response['index'], response['charset'], out.read(text_length), response['error']))
+			header = out.readline()
+		return sorted(frames)
+
+	def test_batch(self):
+		self.write('a.css', '@charset "utf-8";\na { color: #ffffff; }\n')
+		self.write('b.js', 'var b = "open;\n')
+		self.write('c.js', 'var c = 1;\n')
+		self.assertEqual(self.run_cli('batch', self.directory), 2)
+		self.assertEqual(self.frames(), [
+			(0, '@charset "utf-8";', 'a{color:#fff}', None),
+			(1, '', '', 'Unterminated string literal'),
+			(2, '', 'var c=1;', None),
+		])
+
+	def test_batch_in_a_pool(self):
+		for i in range(4):
+			self.write('%d.js' % i, 'var a%d = 1;\n' % i)
+		self.assertEqual(cli.main(['-q', '-j', '2', '-s', self.path('missing.pkl'), 'batch', self.directory]), 0)
+		self.assertEqual([frame[:3] for frame in self.frames()], [(i, '', 'var a%d=1;' % i) for i in range(4)])
@@ -0,0 +1,33 @@
+# The benchmark corpora: the same name and size give the same text, and the
+# minifiers agree on every one of them.
+
+import unittest
+
+from corpus import CORPORA, make_corpus, parse_size
+from cssmin import CSSMin
+from jsmin import jsmin
+
+
+class CorpusTest(unittest.TestCase):
+
+	def test_deterministic(self):
+		for lang in CORPORA:
+			for name in CORPORA[lang]:
+				text = make_corpus(lang, name, 4096)
+				self.assertTrue(len(text) >= 4096)
+				self.assertEqual(make_corpus(lang, name, 4096), text)
+
+	def test_parse_size(self):
+		self.assertEqual(parse_size('1K'), 1024)
+		self.assertEqual(parse_size('1.5m'), 1536 * 1024)
+		self.assertEqual(parse_size(' 100 '), 100)
+
+	def test_js_engines(self):
+		for name in CORPORA['js']:
+			js = make_corpus('js', name, 16384)
+			self.assertEqual(jsmin(js, 'block'), jsmin(js, 'char'), name)
+
+	def test_css_stable(self):
+		for name in CORPORA['css']:
+			css = CSSMin().minify(make_corpus('css', name, 16384))
+			self.assertEqual(CSSMin().minify(css), css, name)
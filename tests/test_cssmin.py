@@ -0,0 +1,102 @@
+# CSSMin output, pinned to what the original regex passes produced before
+# the comment, pseudo class and color passes were made linear, and
+# minify_stream against minify.
+
+import random
+import unittest
+from StringIO import StringIO
+
+from cssmin import CSSMin
+
+EXPECTED = [
+	('', ''),
+	('/* only a comment */', ''),
+	('a { color: red; }', 'a{color:red}'),
+	('a{color:red;;}\n\n\nb{}', 'a{color:red}b{}'),
+	('p { margin: 0px 0em 0% 0in; padding: 0.50em 0 0 0; }', 'p{margin:0;padding:.50em 0 0 0}'),
+	('p { background-position: 0 0; border: none; outline: 0 0 0 0 }',
+		'p{background-position:0 0;border:none;outline:0 0 0 0}'),
+	('/*! keep me */ a { b: c }', '/*!keep me */ a{b:c}'),
+	('a { x: 1 } /* \\*/ b { y: 2 } /* */ c { z: 3 }', 'a{x:1}/* \\*/ b{y:2}/* */ c{z:3}'),
+	('div > p + ul ~ li { color: #aabbcc; }', 'div>p+ul ~ li{color:#abc}'),
+	('@media screen and (max-width: 100px) { a { color: #AABBCC } }',
+		'@media screen and (max-width:100px){a{color:#ABC}}'),
+	('@charset "utf-8"; a { font: 12px/1.5 "Helvetica Neue", arial; }',
+		'@charset "utf-8";a{font:12px/1.5 "Helvetica Neue",arial}'),
+	('a::before { content: "  spaced  :  out  "; }', 'a::before{content:" spaced:out "}'),
+	('.a { filter: progid:DXImageTransform.Microsoft.Alpha(Opacity=80); }',
+		'.a{filter:progid:DXImageTransform.Microsoft.Alpha(Opacity=80)}'),
+	('ul li:first-child a:not(.x) { color: red }', 'ul li:first-child a:not(.x){color:red}'),
+	('a {\n\tmargin : 0 ;\r\n}\r\n', 'a{margin:0}'),
+	('a:hover, a:focus { color : #FFFFFF ; background : rgb(255, 0, 0) }',
+		'a:hover,a:focus{color:#FFF;background:#f00}'),
+	('a { color: rgb(0,0,0); background: #ffffff url(a.png) no-repeat 0 0; }',
+		'a{color:#000;background:#fff url(a.png) no-repeat 0 0}'),
+]
+
+
+def random_sheet(seed, size):
+	# the samples joined with whitespace and comments, no @charset
+	rand = random.Random(seed)
+	parts = []
+	length = 0
+	while length < size:
+		css = rand.choice(EXPECTED)[0]
+		if css.startswith('@charset'):
+			continue
+		parts.append(css + rand.choice(['', ' ', '\n\n', '\t/* between */\n']))
+		length += len(parts[-1])
+	return ''.join(parts)
+
+
+class MinifyTest(unittest.TestCase):
+
+	def test_expected(self):
+		for css, expected in EXPECTED:
+			self.assertEqual(CSSMin().minify(css), expected, repr(css))
+
+	def test_rgb(self):
+		self.assertEqual(CSSMin().minify('a { color: rgb(255, 0, 0); background: rgb(0,0,0) }'),
+			'a{color:#f00;background:#000}')
+
+	def test_minified_is_stable(self):
+		for css, expected in EXPECTED:
+			self.assertEqual(CSSMin().minify(expected), expected, repr(expected))
+
+	def test_unterminated_preserved_comment(self):
+		# used to loop forever
+		self.assertEqual(CSSMin().minify('a { b: c } /*! open'), 'a{b:c}/*!open')
+
+	def test_many_comments_and_pseudo_classes(self):
+		css = 'a:hover { b: c } /* x */ ' * 5000
+		self.assertEqual(CSSMin().minify(css), 'a:hover{b:c}' * 5000)
+
+
+class StreamTest(unittest.TestCase):
+
+	def stream(self, css, chunk_size, wrap=None):
+		outs = StringIO()
+		CSSMin().minify_stream(StringIO(css), outs, wrap, chunk_size)
+		return outs.getvalue()
+
+	def test_samples(self):
+		for css, expected in EXPECTED:
+			# a @charset is only moved to the start of the chunk it is in
+			if css.startswith('@charset'):
+				continue
+			for size in (1, 2, 5, 64, 65536):
+				self.assertEqual(self.stream(css, size), expected, "%r at %d" % (css, size))
+
+	def test_random_sheets(self):
+		for seed in range(5):
+			css = random_sheet(seed, 32 * 1024)
+			for size in (100, 4096):
+				self.assertEqual(self.stream(css, size), CSSMin().minify(css), "%d at %d" % (seed, size))
+
+	def test_wrapped(self):
+		css = random_sheet(0, 16 * 1024)
+		self.assertEqual(self.stream(css, 512, 80), CSSMin().minify(css, 80))
+
+	def test_comment_across_chunks(self):
+		css = 'a { b: c } /* a comment that is longer than a chunk */ d { e: f } /*! kept */ g { h: i }'
+		self.assertEqual(self.stream(css, 3), CSSMin().minify(css))
@@ -0,0 +1,167 @@
+# The structural CSS optimizations and the deduplication of bundles.  Besides
+# the expected output of each, random stylesheets are optimized and
+# deduplicated and must still give every element the same declarations.
+
+import random
+import re
+import unittest
+
+from corpus import CORPORA, make_corpus
+from cssmin import CSSMin
+from cssopt import PASSES, dedupe_sheets, optimize
+
+EXPECTED = [
+	# colors
+	('a{color:#ffffff;background:white}', 'a{color:#fff;background:#fff}'),
+	('a{color:#ff0000}', 'a{color:red}'),
+	# shorthands
+	('a{margin-top:0;margin-right:1px;margin-bottom:0;margin-left:1px}', 'a{margin:0 1px}'),
+	('a{border-top-width:1px;border-right-width:1px;border-bottom-width:1px;border-left-width:1px}',
+		'a{border-width:1px}'),
+	('a{padding-top:1px;padding-right:2px;padding-bottom:3px}', 'a{padding-top:1px;padding-right:2px;padding-bottom:3px}'),
+	('a{margin-top:1px;margin-right:1px;margin-bottom:1px;margin-left:inherit}',
+		'a{margin-top:1px;margin-right:1px;margin-bottom:1px;margin-left:inherit}'),
+	('a{margin-top:1px!important;margin-right:1px;margin-bottom:1px;margin-left:1px}',
+		'a{margin-top:1px!important;margin-right:1px;margin-bottom:1px;margin-left:1px}'),
+	('a{margin:0;margin-top:1px}', 'a{margin:0;margin-top:1px}'),
+	# duplicate rules, the last copy is kept
+	('a{color:red}b{color:blue}a{color:red}', 'b{color:blue}a{color:red}'),
+	('@media print{a{color:red}}@media print{a{color:red}}', '@media print{a{color:red}}'),
+	# merges
+	('a{color:red}b{color:red}', 'a,b{color:red}'),
+	('a{color:red}a{margin:0}', 'a{color:red;margin:0}'),
+	('a:hover{color:red}b{color:red}', 'a:hover,b{color:red}'),
+	('a{color:red}b{color:red;margin:0}c{color:red}', 'a{color:red}b{color:red;margin:0}c{color:red}'),
+	('a{color:red}@media print{b{color:red}}', 'a{color:red}@media print{b{color:red}}'),
+	# a browser that does not know one selector of a list drops the whole rule
+	('a:-moz-focusring{color:red}b{color:red}', 'a:-moz-focusring{color:red}b{color:red}'),
+	('a::selection{color:red}b{color:red}', 'a::selection{color:red}b{color:red}'),
+	('a:is(.x){color:red}b{color:red}', 'a:is(.x){color:red}b{color:red}'),
+	('b:focus-visible{color:red}a:first-child{color:red}', 'b:focus-visible{color:red}a:first-child{color:red}'),
+	('a:first-child{color:red}b::before{color:red}', 'a:first-child,b::before{color:red}'),
+	('a[title=":x"]{color:red}b{color:red}', 'a[title=":x"],b{color:red}'),
+	# css the optimizer can't read is handed back
+	('a{b:c;', 'a{b:c;'),
+	('', ''),
+]
+
+SELECTORS = ['a', 'b', 'i', 'p']
+DECLARATIONS = {
+	'color': ['red', '#f00', '#ff0000', 'blue', 'white', '#fff'],
+	'margin': ['0', '1px 2px', '1px 2px 3px'],
+	'margin-top': ['0', '1px', '2px'],
+	'margin-right': ['0', '1px', '2px'],
+	'margin-bottom': ['0', '1px', '2px'],
+	'margin-left': ['0', '1px', '2px'],
+	'padding-top': ['0', '1px'],
+	'padding-right': ['0', '1px'],
+	'padding-bottom': ['0', '1px'],
+	'padding-left': ['0', '1px'],
+}
+SIDES = ('top', 'right', 'bottom', 'left')
+COLORS = { 'red': '#ff0000', 'blue': '#0000ff', 'white': '#ffffff' }
+
+
+def random_sheet(rand):
+	rules = []
+	for i in range(rand.randint(1, 8)):
+		selectors = rand.sample(SELECTORS, rand.randint(1, 2))
+		declarations = []
+		for j in range(rand.randint(1, 5)):
+			name = rand.choice(sorted(DECLARATIONS))
+			declarations.append('%s:%s' % (name, rand.choice(DECLARATIONS[name])))
+		rules.append('%s{%s}' % (','.join(selectors), ';'.join(declarations)))
+	return ''.join(rules)
+
+
+def normalize(name, value):
+	if name != 'color':
+		return value
+	value = COLORS.get(value, value)
+	if len(value) == 4:
+		value = '#' + ''.join([c * 2 for c in value[1:]])
+	return value
+
+
+def sides(values):
+	# top, right, bottom and left from one to four values
+	top = values[0]
+	right = values[1:2] and values[1] or top
+	bottom = values[2:3] and values[2] or top
+	left = values[3:4] and values[3] or right
+	return top, right, bottom, left
+
+
+def cascade(css):
+	"""The declarations of each element, for sheets of type selectors only."""
+
+	elements = {}
+	for selectors, body in re.findall(r'([^{}]+)\{([^{}]*)\}', css):
+		for selector in selectors.split(','):
+			element = elements.setdefault(selector, {})
+			for declaration in body.split(';'):
+				name, value = declaration.split(':')
+				if name in ('margin', 'padding'):
+					for side, side_value in zip(SIDES, sides(value.split())):
+						element[name + '-' + side] = side_value
+				else:
+					element[name] = normalize(name, value)
+	return elements
+
+
+class OptimizeTest(unittest.TestCase):
+
+	def test_expected(self):
+		for css, expected in EXPECTED:
+			self.assertEqual(optimize(css)[0], expected, repr(css))
+
+	def test_saved(self):
+		css, saved = optimize('a{color:#ffffff}b{color:#ffffff}')
+		self.assertEqual(saved, [('colors', 6), ('shorthands', 0), ('duplicate rules', 0),
+			('merged selectors', 0), ('merged declarations', 11)])
+		self.assertEqual([name for func, name in PASSES], [name for name, size in saved])
+
+	def test_random_sheets(self):
+		rand = random.Random(3)
+		for i in range(1000):
+			css = random_sheet(rand)
+			optimized, saved = optimize(css)
+			self.assertEqual(cascade(optimized), cascade(css), "%s -> %s" % (css, optimized))
+			self.assertEqual(len(css) - len(optimized), sum([size for name, size in saved]))
+
+	def test_corpora(self):
+		for name in sorted(CORPORA['css']):
+			minified = CSSMin().minify(make_corpus('css', name, 16 * 1024))
+			optimized = optimize(minified)[0]
+			self.assertTrue(len(optimized) <= len(minified), name)
+			self.assertEqual(optimize(optimized)[0], optimized, name)
+
+
+class DedupeSheetsTest(unittest.TestCase):
+
+	def test_last_copy_kept(self):
+		sheets = ['a{color:red}b{x:y}', 'a{color:red}', 'c{z:w}']
+		self.assertEqual(dedupe_sheets(sheets), (['b{x:y}', 'a{color:red}', 'c{z:w}'], 12))
+
+	def test_emptied_sheet(self):
+		self.assertEqual(dedupe_sheets(['a{color:red}', 'a{color:red}']), (['', 'a{color:red}'], 12))
+
+	def test_within_a_sheet(self):
+		self.assertEqual(dedupe_sheets(['a{b:c}a{b:c}', 'd{e:f}']), (['a{b:c}', 'd{e:f}'], 6))
+
+	def test_media(self):
+		sheets = ['@media print{a{b:c}}', '@media print{a{b:c}}a{b:c}']
+		self.assertEqual(dedupe_sheets(sheets), (['', '@media print{a{b:c}}a{b:c}'], 20))
+
+	def test_unreadable_sheet(self):
+		sheets = ['a{b:c', 'a{b:c}']
+		self.assertEqual(dedupe_sheets(sheets), (['a{b:c', 'a{b:c}'], 0))
+
+	def test_random_sheets(self):
+		# the bundle still gives every element the same declarations
+		rand = random.Random(4)
+		for i in range(300):
+			sheets = [random_sheet(rand) for j in range(rand.randint(1, 4))]
+			deduped, saved = dedupe_sheets(sheets)
+			self.assertEqual(cascade(''.join(deduped)), cascade(''.join(sheets)), sheets)
+			self.assertEqual(len(''.join(sheets)) - len(''.join(deduped)), saved)
@@ -0,0 +1,97 @@
+# The in-process JS beautifier against node running jsbeautify/beautify.js,
+# which it was ported from, and the choice between the two.
+
+import unittest
+
+from tests import NODE
+from corpus import CORPORA, make_corpus
+from jsbeautifier import js_beautify
+from jsmin import jsmin
+from nodeworker import NodeWorker
+from tools import DEFAULT_SETTINGS, FormatEngines, beautify_options, node_limits
+
+SAMPLES = [
+	'',
+	'a=1;b=2',
+	'function f(a,b){if(a){return b}else if(b){return a}else{return null}}',
+	'var o={a:1,"b":[1,2,[3,4]],c:function(){return this.a}};',
+	'switch(x){case 1:y();break;case "two":default:z()}',
+	'for(var i=0;i<10;i++){while(j--){do{k()}while(k)}}',
+	'var re=/ab+c/gi,d=a/b/c,s="a\\"b",t=\'c\\\'d\';',
+	'x=a?b:c?d:e;y=!a&&b||c;z=typeof a==="undefined";',
+	'try{a()}catch(e){b(e)}finally{c()}',
+	'(function(){var a=[];a.push(1)})();new Foo(1,2).bar();',
+	'// a comment\nvar a=1; /* another */ var b=2;\n\n\nvar c=3;',
+	'var a = [\n        1, 2,\n    3\n];',
+	'label:for(;;){continue label}',
+	'if(a)b();else c();',
+	'return;throw new Error("x")',
+	'a = b ? function(){ return 1 } : { c: [ ] };',
+]
+
+OPTIONS = [
+	beautify_options(DEFAULT_SETTINGS),
+	beautify_options(dict(DEFAULT_SETTINGS, indent_char=' ', indent_size='4', braces_on_own_line='true')),
+	beautify_options(dict(DEFAULT_SETTINGS, preserve_newlines='false', keep_array_indentation='false',
+		space_after_anon_function='false')),
+]
+
+
+class BeautifyTest(unittest.TestCase):
+
+	def test_output(self):
+		options = beautify_options(DEFAULT_SETTINGS)
+		self.assertEqual(js_beautify('', options), '')
+		self.assertEqual(js_beautify('a=1;b=2', options), 'a = 1;\nb = 2')
+		self.assertEqual(js_beautify('if(a){b()}', options), 'if (a) {\n\tb()\n}')
+		self.assertEqual(js_beautify('if(a){b()}', OPTIONS[1]), 'if (a)\n{\n    b()\n}')
+
+	def test_default_options(self):
+		self.assertEqual(js_beautify('if(a){b()}'), 'if (a) {\n    b()\n}')
+
+
+@unittest.skipUnless(NODE, "node is not installed")
+class NodeEquivalenceTest(unittest.TestCase):
+
+	def setUp(self):
+		self.worker = NodeWorker(NODE, *node_limits(DEFAULT_SETTINGS))
+
+	def tearDown(self):
+		self.worker.stop()
+
+	def assertSame(self, js, options, name):
+		self.assertEqual(js_beautify(js, options), self.worker.request('format_js', js, options), name)
+
+	def test_samples(self):
+		for options in OPTIONS:
+			for js in SAMPLES:
+				self.assertSame(js, options, repr(js))
+
+	def test_corpora(self):
+		for options in OPTIONS:
+			for name in sorted(CORPORA['js']):
+				js = make_corpus('js', name, 16 * 1024)
+				self.assertSame(js, options, name)
+				# and unminifying
+				self.assertSame(jsmin(js), options, name + " minified")
+
+
+class FormatEnginesTest(unittest.TestCase):
+
+	def test_choose(self):
+		engines = FormatEngines()
+		# small files are quicker in process, large ones once node is running
+		self.assertEqual(engines.choose(1024, True), 'python')
+		self.assertEqual(engines.choose(4 * 1024 * 1024, True), 'node')
+		self.assertEqual(engines.choose(64 * 1024, False), 'python')
+
+	def test_record(self):
+		engines = FormatEngines()
+		engines.record('python', 1024 * 1024, 0.1)
+		self.assertTrue(engines.python_rate > FormatEngines.PYTHON_RATE)
+		engines.record('node', 100, 1.0)
+		self.assertTrue(engines.node_latency > FormatEngines.NODE_LATENCY)
+		# a small python run says nothing about its rate
+		rate = engines.python_rate
+		engines.record('python', 100, 1.0)
+		self.assertEqual(engines.python_rate, rate)
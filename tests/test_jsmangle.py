@@ -0,0 +1,103 @@
+# Mangled JS against the JS it came from.  The programs are run in node, when
+# it is on the path, and must print the same.
+
+import re
+import subprocess
+import unittest
+
+from tests import NODE
+from jsmangle import KEYWORDS, mangle, short_name
+from jsmin import jsmin
+
+# enough locals that the two letter names, do, if and in among them, are used
+MANY_LOCALS = 'function many(seed) {\n%s\n\treturn [%s].join(",");\n}\nconsole.log(many(3));\n' % (
+	'\n'.join(['\tvar local%d = seed * %d;' % (i, i) for i in range(900)]),
+	', '.join(['local%d' % i for i in range(900)]))
+
+PROGRAMS = [
+	'function add(first, second) { var total = first + second; return total; }\nconsole.log(add(1, 2));',
+	'var counter = (function () { var count = 0; return function (step) { count += step; return count; }; })();\n'
+		'counter(2); console.log(counter(3));',
+	'var g = 1; function f(param) { try { missing(); } catch (err) { return err.name + param + g; } }\n'
+		'console.log(f("x"));',
+	'function outer(value) { function inner(other) { return value + other; } return inner(value); }\n'
+		'console.log(outer(20));',
+	'function shadow(a) { var b = a; (function (a) { b += a; })(10); return [a, b]; }\nconsole.log(shadow(1));',
+	'function args(first) { return arguments.length + first; }\nconsole.log(args(1, 2, 3));',
+	'function hoisted() { return later(); function later() { var x = 5; return x * 2; } }\n'
+		'console.log(hoisted());',
+	'function evil(code) { var secret = 42; return eval(code); }\nconsole.log(evil("secret + 1"));',
+	'function props(object) { var key, out = []; for (key in object) { out.push(key + object[key]); } return out; }\n'
+		'console.log(props({ a: 1, b: 2 }));',
+	'function re(text) { var pattern = /a\\/b/g; return text.replace(pattern, "x"); }\nconsole.log(re("a/b a/b"));',
+	'var globalName = 3; function usesGlobal(local) { return globalName + local; }\nconsole.log(usesGlobal(4));',
+	'function labels(limit) { var found = 0; outer: for (var i = 0; i < limit; i++) { for (var j = 0; j < i; j++) {'
+		' if (j === 2) { continue outer; } found++; } } return found; }\nconsole.log(labels(6));',
+	# a regex after else or do, not a division
+	'function f(x){var y=x;if(x)return 1;else /y/.test("y")&&(y=2);return y}console.log(f(0))',
+	'function g(x){var y=x;do /y/.test("y")&&(y+=1);while(y<3);return y+this/2/x}console.log(g(1))',
+	MANY_LOCALS,
+]
+
+
+def run_node(js):
+	proc = subprocess.Popen([NODE], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+	out, err = proc.communicate(js)
+	return proc.returncode, out, err
+
+
+class ShortNameTest(unittest.TestCase):
+
+	def test_names(self):
+		self.assertEqual([short_name(n) for n in (0, 1, 25, 26, 53, 54, 55)], ['a', 'b', 'z', 'A', '_', 'aa', 'ba'])
+
+	def test_unique(self):
+		names = [short_name(n) for n in range(54 * 64 * 2)]
+		self.assertEqual(len(set(names)), len(names))
+
+
+class MangleTest(unittest.TestCase):
+
+	def test_locals(self):
+		self.assertEqual(mangle(jsmin(PROGRAMS[0])), 'function add(a,b){var c=a+b;return c;}\nconsole.log(add(1,2));')
+
+	def test_globals_kept(self):
+		js = jsmin('var globalName = 3; function usesGlobal(local) { return globalName + local + other; }')
+		self.assertEqual(mangle(js), 'var globalName=3;function usesGlobal(a){return globalName+a+other;}')
+
+	def test_eval_kept(self):
+		js = jsmin(PROGRAMS[7])
+		self.assertEqual(mangle(js), js)
+
+	def test_no_keywords(self):
+		names = re.findall(r'\bvar ([\w$]+)=', mangle(jsmin(MANY_LOCALS)))
+		self.assertEqual(len(names), 900)
+		self.assertEqual([name for name in names if name in KEYWORDS], [])
+
+	def test_regex_after_keyword(self):
+		self.assertEqual(mangle('function f(x){var y=x;if(x)return 1;else/y/.test(y);return y}'),
+			'function f(a){var b=a;if(a)return 1;else/y/.test(b);return b}')
+		# but a property named like one divides
+		self.assertEqual(mangle('function f(x){var y=x;return x.do/y/2}'), 'function f(a){var b=a;return a.do/b/2}')
+
+	def test_unreadable(self):
+		for js in ('function (', 'let a = 1;', 'var f = (a) => a;'):
+			self.assertEqual(mangle(js), js)
+
+	def test_unicode(self):
+		js = jsmin('function greet(name) { var hello = "h\xc3\xa9llo "; return hello + name; }')
+		self.assertEqual(mangle(js), 'function greet(b){var a="h\xc3\xa9llo ";return a+b;}')
+		self.assertEqual(mangle(js.decode('utf-8')), mangle(js).decode('utf-8'))
+
+
+@unittest.skipUnless(NODE, "node is not installed")
+class BehaviourTest(unittest.TestCase):
+
+	def test_programs(self):
+		for js in PROGRAMS:
+			minified = jsmin(js)
+			mangled = mangle(minified)
+			expected = run_node(minified)
+			self.assertEqual(expected[0], 0, expected[2])
+			self.assertEqual(run_node(mangled), expected, mangled)
+			self.assertTrue(len(mangled) <= len(minified))
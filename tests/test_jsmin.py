@@ -0,0 +1,119 @@
+# The block engine of JavascriptMinify against the original character at a
+# time engine, and jsmin_stream against jsmin.
+
+import random
+import unittest
+from StringIO import StringIO
+
+from jsmin import JavascriptMinify, UnterminatedComment, UnterminatedStringLiteral, UnterminatedRegularExpression
+from jsmin import jsmin, jsmin_stream
+
+SAMPLES = [
+	'',
+	'\n\n\n',
+	'// only a comment\n',
+	'/* only a comment */',
+	'var a = 1;\nvar b = 2;\n',
+	'var  a\t=\t"some  string";  // trailing\n',
+	"var s = 'it\\'s', t = \"say \\\"hi\\\"\";\n",
+	'x = a + ++b; y = a - -b; z = a + +b; w = a - --b;\n',
+	'var re = /[/\\]]+/g, d = a / b / c;\n',
+	'if (x) { return /a*b/.test(y); }\n',
+	'f(/=/, a(/\\//));\nx = [/a/, /b/];\n',
+	'a\n++b\nc\n--d\n',
+	'function f() {\n\treturn\n\t\tx;\n}\n',
+	'var a = b\n(function () {})()\n',
+	'/* a */ /* b */ x /* c */ = /* d */ 1;\n',
+	'x = "/* not a comment */"; y = \'// nor this\';\n',
+	'label:\nfor (;;) { break label; }\n',
+	'a = {\n  "b": [1, 2,\n  3],\n  c: function ( d ) { return d } }\n',
+	'\r\nvar crlf = 1;\r\n\r\nvar more = 2;\r\n',
+	'var \x01ctrl = 1;\n',
+	'x = "a b" + \'c  d\' ; /* it\'s "quoted" */ y = f( "e" ) // "f\n( g )\n',
+	'var s = "one \\\n two", t = \'/* \\\' // */\';\n',
+	'a = b\\/**/c; d = e\\//f\ng = "h"/**/\n"i"\n',
+]
+
+
+def random_js(seed, size):
+	# the samples cut and spliced together, unterminated pieces dropped
+	rand = random.Random(seed)
+	parts = []
+	length = 0
+	while length < size:
+		js = rand.choice(SAMPLES)
+		if rand.random() < 0.3:
+			js = js.replace(';', ';\n' * rand.randint(1, 3))
+		try:
+			char_minify(js)
+		except Exception:
+			continue
+		parts.append(js)
+		length += len(js)
+	return ''.join(parts)
+
+
+def char_minify(js):
+	outs = StringIO()
+	JavascriptMinify('char').minify(StringIO(js), outs)
+	return outs.getvalue()
+
+
+def block_minify(js, block_size=None):
+	outs = StringIO()
+	minifier = JavascriptMinify('block')
+	if block_size is not None:
+		minifier.block_size = block_size
+	minifier.minify(StringIO(js), outs)
+	return outs.getvalue()
+
+
+class EngineTest(unittest.TestCase):
+
+	def test_samples(self):
+		for js in SAMPLES:
+			self.assertEqual(block_minify(js), char_minify(js), repr(js))
+
+	def test_small_blocks(self):
+		# every token straddles a block boundary at one size or another
+		for js in SAMPLES:
+			expected = char_minify(js)
+			for size in (1, 2, 3, 7, 16):
+				self.assertEqual(block_minify(js, size), expected, "%r at %d" % (js, size))
+
+	def test_random_programs(self):
+		for seed in range(10):
+			js = random_js(seed, 16 * 1024)
+			self.assertEqual(block_minify(js), char_minify(js), seed)
+			self.assertEqual(block_minify(js, 1000), char_minify(js), seed)
+
+	def test_errors(self):
+		for js, error in [
+				('a = 1; /* open', UnterminatedComment),
+				('a = "open;\n', UnterminatedStringLiteral),
+				('a = (/open;\n', UnterminatedRegularExpression)]:
+			self.assertRaises(error, char_minify, js)
+			self.assertRaises(error, block_minify, js)
+
+	def test_output(self):
+		self.assertEqual(jsmin('var a = 1;\nvar b = 2;\n'), 'var a=1;var b=2;')
+		self.assertEqual(jsmin('// only a comment\n'), '')
+		self.assertEqual(jsmin('a\n++b\n'), 'a\n++b')
+
+	def test_unknown_engine(self):
+		self.assertRaises(ValueError, JavascriptMinify, 'tokens')
+
+
+class StreamTest(unittest.TestCase):
+
+	def test_stream_matches_jsmin(self):
+		for js in SAMPLES:
+			outs = StringIO()
+			jsmin_stream(StringIO(js), outs)
+			self.assertEqual(outs.getvalue(), jsmin(js), repr(js))
+
+	def test_without_newlines(self):
+		for js in SAMPLES:
+			outs = StringIO()
+			jsmin_stream(StringIO(js), outs, keep_newlines=False)
+			self.assertEqual(outs.getvalue(), jsmin(js).replace('\n', ''), repr(js))
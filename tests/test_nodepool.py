@@ -0,0 +1,114 @@
+# NodeWorkerPool scheduling.  Workers only start node on their first request,
+# so most of these hand workers out and take them back without running any.
+
+import threading
+import time
+import unittest
+
+from tests import NODE
+from nodeworker import NodeWorkerPool, NodeWorkerCancelled, PRIORITY_ACTIVE, PRIORITY_BACKGROUND
+
+
+class PoolTest(unittest.TestCase):
+
+	def setUp(self):
+		self.pool = NodeWorkerPool('node', size=1, idle_timeout=0)
+		self.order = []
+		self.errors = []
+
+	def tearDown(self):
+		self.pool.stop()
+
+	def waiter(self, owner, priority=PRIORITY_ACTIVE):
+		# acquire on a thread, then note the owner and give the worker back
+		def run():
+			try:
+				worker = self.pool.acquire(owner, priority)
+			except NodeWorkerCancelled, err:
+				self.errors.append((owner, err))
+				return
+			self.order.append(owner)
+			self.pool.release(owner, worker)
+
+		thread = threading.Thread(target=run)
+		thread.start()
+		# until it waits its turn
+		while not [entry for entry in self.pool._waiting if entry[2] == owner]:
+			time.sleep(0.001)
+		return thread
+
+	def test_reuse(self):
+		worker = self.pool.acquire('a', PRIORITY_ACTIVE)
+		self.pool.release('a', worker)
+		self.assertTrue(self.pool.acquire('b', PRIORITY_ACTIVE) is worker)
+
+	def test_priority(self):
+		worker = self.pool.acquire('a', PRIORITY_ACTIVE)
+		threads = [self.waiter('background', PRIORITY_BACKGROUND), self.waiter('active')]
+		self.pool.release('a', worker)
+		for thread in threads:
+			thread.join()
+		self.assertEqual(self.order, ['active', 'background'])
+
+	def test_served_longest_ago(self):
+		worker = self.pool.acquire('a', PRIORITY_ACTIVE)
+		threads = [self.waiter('a'), self.waiter('b')]
+		self.pool.release('a', worker)
+		for thread in threads:
+			thread.join()
+		self.assertEqual(self.order, ['b', 'a'])
+
+	def test_cancel_waiting(self):
+		worker = self.pool.acquire('a', PRIORITY_ACTIVE)
+		threads = [self.waiter('b'), self.waiter('c')]
+		self.pool.cancel('b')
+		threads[0].join()
+		self.assertEqual([owner for owner, err in self.errors], ['b'])
+		self.pool.release('a', worker)
+		threads[1].join()
+		self.assertEqual(self.order, ['c'])
+
+	def test_reap(self):
+		self.pool.idle_timeout = 0.01
+		self.pool.release('a', self.pool.acquire('a', PRIORITY_ACTIVE))
+		deadline = time.time() + 5
+		while self.pool._count and time.time() < deadline:
+			time.sleep(0.01)
+		self.assertEqual((self.pool._count, self.pool._free), (0, []))
+
+
+@unittest.skipUnless(NODE, "node is not installed")
+class ClientTest(unittest.TestCase):
+
+	def setUp(self):
+		self.pool = NodeWorkerPool(NODE, size=2)
+
+	def tearDown(self):
+		self.pool.stop()
+
+	def test_request(self):
+		client = self.pool.client('a')
+		self.assertEqual(client.request('format_js', 'a=1'), 'a = 1')
+		self.assertTrue(client.is_running())
+		self.assertEqual(self.pool.client('b').request('format_js', 'b=2'), 'b = 2')
+		self.assertEqual(self.pool._count, 1)
+
+	def test_cancel_one_owner(self):
+		# as lint as you type cuts its own request short, a menu request goes on
+		lint = self.pool.client('lint')
+		errors = []
+
+		def run():
+			try:
+				lint.request('format_js', 'if(a){b()}' * 200000)
+			except NodeWorkerCancelled, err:
+				errors.append(err)
+
+		thread = threading.Thread(target=run)
+		thread.start()
+		while not [worker for worker in self.pool._busy.get('lint', []) if worker.is_running()]:
+			time.sleep(0.001)
+		lint.cancel()
+		self.assertEqual(self.pool.client('menu').request('format_js', 'a=1'), 'a = 1')
+		thread.join()
+		self.assertEqual(len(errors), 1)
@@ -0,0 +1,98 @@
+# NodeWorker requests on a real node process.
+
+import threading
+import time
+import unittest
+
+from tests import NODE
+from nodeworker import NodeWorker, NodeWorkerError, NodeWorkerCancelled, NodeWorkerLimitError
+
+
+@unittest.skipUnless(NODE, "node is not installed")
+class NodeWorkerTest(unittest.TestCase):
+
+	def setUp(self):
+		self.worker = NodeWorker(NODE)
+
+	def tearDown(self):
+		self.worker.stop()
+
+	def test_format(self):
+		self.assertEqual(self.worker.request('format_js', 'if(a){b()}', { 'indent_size': 1, 'indent_char': '\t' }),
+			'if (a) {\n\tb()\n}')
+
+	def test_text(self):
+		# quotes, backslashes and utf-8 come back byte for byte
+		code = 'a="\xc3\xa9\\"\\n"'
+		self.assertEqual(self.worker.request('format_js', code), 'a = ' + code[2:])
+		self.assertEqual(self.worker.request('format_js', code.decode('utf-8')), 'a = ' + code[2:])
+
+	def test_started_once(self):
+		self.worker.request('format_js', 'a=1')
+		proc = self.worker._proc
+		self.worker.request('format_js', 'b=2')
+		self.assertTrue(self.worker._proc is proc)
+
+	def test_restart(self):
+		self.worker.request('format_js', 'a=1')
+		self.worker._proc.kill()
+		self.worker._proc.wait()
+		self.assertEqual(self.worker.request('format_js', 'a=1'), 'a = 1')
+
+	def test_unknown_op(self):
+		self.assertRaises(NodeWorkerError, self.worker.request, 'minify', 'a=1')
+		# the worker survives a failed request
+		self.assertEqual(self.worker.request('format_js', 'a=1'), 'a = 1')
+
+	def test_cancel(self):
+		def cancel():
+			# once the request is in flight
+			while not (self.worker._lock.locked() and self.worker.is_running()):
+				time.sleep(0.001)
+			self.worker.cancel()
+
+		thread = threading.Thread(target=cancel)
+		thread.start()
+		self.assertRaises(NodeWorkerCancelled, self.worker.request, 'format_js', 'if(a){b()}' * 200000)
+		thread.join()
+		# the next request gets a fresh worker
+		self.assertEqual(self.worker.request('format_js', 'a=1'), 'a = 1')
+
+	def test_cancel_idle(self):
+		self.worker.request('format_js', 'a=1')
+		proc = self.worker._proc
+		self.worker.cancel()
+		# nothing was in flight, the process is kept
+		self.assertTrue(self.worker._proc is proc and self.worker.is_running())
+
+	def test_missing_node(self):
+		worker = NodeWorker('/nonexistent/node')
+		self.assertRaises(NodeWorkerError, worker.request, 'format_js', 'a=1')
+
+
+@unittest.skipUnless(NODE, "node is not installed")
+class LimitTest(unittest.TestCase):
+
+	def tearDown(self):
+		self.worker.stop()
+
+	def test_timeout(self):
+		self.worker = NodeWorker(NODE, timeout=0.05)
+		self.assertRaises(NodeWorkerLimitError, self.worker.request, 'format_js', 'if(a){b()}' * 200000)
+		self.assertFalse(self.worker.is_running())
+		self.worker.timeout = None
+		self.assertEqual(self.worker.request('format_js', 'a=1'), 'a = 1')
+
+	def test_max_output(self):
+		self.worker = NodeWorker(NODE, max_output=100)
+		self.assertEqual(self.worker.request('format_js', 'a=1'), 'a = 1')
+		self.assertRaises(NodeWorkerLimitError, self.worker.request, 'format_js', 'a=1;' * 100)
+
+	def test_max_output_items(self):
+		# every issue fits, the lot of them doesn't
+		self.worker = NodeWorker(NODE, max_output=2000)
+		items = []
+		self.assertEqual(self.worker.request('lint_css', 'a{}\n' * 3, None, items.append), { 'count': 3 })
+		self.assertEqual(len(items), 3)
+		self.assertRaises(NodeWorkerLimitError, self.worker.request, 'lint_css', 'a{}\n' * 50, None, items.append)
+		self.assertFalse(self.worker.is_running())
@@ -0,0 +1,58 @@
+# PassStats, and the profiled runs of CSSMin and jsmin against their
+# unprofiled output.
+
+import unittest
+
+from passstats import PassStats
+from cssmin import CSSMin
+from jsmin import jsmin, jsmin_profile
+
+CSS = '/* a */ a { color: #ffffff; } b:first-letter { margin: 0px 0px 0px 0px; }'
+JS = 'function f(a) {\n  return a + 1; // one more\n}\n'
+
+
+class PassStatsTest(unittest.TestCase):
+
+	def test_timed(self):
+		stats = PassStats('test')
+		self.assertEqual(stats.timed('upper', lambda text: text.upper(), 'abc'), 'ABC')
+		stats.timed('upper', lambda text: text[1:], 'abc')
+		entry = stats.passes[0]
+		self.assertEqual((entry['runs'], entry['input'], entry['output']), (2, 6, 5))
+
+	def test_nested(self):
+		stats = PassStats('test')
+		stats.begin('outer')
+		stats.begin('inner')
+		stats.count(3)
+		stats.end(1, 1)
+		stats.end(2, 2)
+		outer, inner = stats.passes
+		self.assertEqual((outer['matches'], inner['matches']), (0, 3))
+		self.assertTrue(inner['nested'] and not outer.get('nested'))
+		self.assertEqual(stats.total_seconds(), outer['seconds'])
+
+	def test_failed_pass(self):
+		stats = PassStats('test')
+		self.assertRaises(ZeroDivisionError, stats.timed, 'fails', lambda text: 1 / 0, 'abc')
+		stats.begin('next')
+		stats.end(0, 0)
+		self.assertFalse(stats.passes[1].get('nested'))
+
+
+class ProfileTest(unittest.TestCase):
+
+	def test_cssmin(self):
+		css, stats = CSSMin().profile(CSS)
+		self.assertEqual(css, CSSMin().minify(CSS))
+		self.assertEqual(stats.minifier, 'CSSMin')
+		self.assertTrue(len(stats.passes) > 1)
+		self.assertEqual(stats.passes[0]['input'], len(CSS))
+		self.assertTrue(sum(entry['matches'] for entry in stats.passes) > 0)
+		self.assertTrue('total' in stats.report())
+
+	def test_jsmin(self):
+		for engine in ('char', 'block'):
+			js, stats = jsmin_profile(JS, engine)
+			self.assertEqual(js, jsmin(JS))
+			self.assertTrue(stats.passes)
@@ -0,0 +1,98 @@
+# The block-parallel gzip writer against zlib and the gzip module, with one
+# thread and several, and blocks of every size.
+
+import gzip
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import zlib
+from StringIO import StringIO
+
+from pgzip import write_gzip, compress_file
+
+
+def sample(size, seed=0):
+	# compressible, but not so much that every block looks the same
+	rand = random.Random(seed)
+	words = ['var', 'function', 'return', '{', '}', ';', 'color', '#fff', ' ', '\n']
+	parts = []
+	length = 0
+	while length < size:
+		word = rand.choice(words) + str(rand.randint(0, 99))
+		parts.append(word)
+		length += len(word)
+	return ''.join(parts)[:size]
+
+
+def gzipped(data, **options):
+	out = StringIO()
+	write_gzip(out, data, **options)
+	return out.getvalue()
+
+
+def gunzip(data):
+	return gzip.GzipFile(fileobj=StringIO(data)).read()
+
+
+class WriteGzipTest(unittest.TestCase):
+
+	def test_round_trip(self):
+		for size in (0, 1, 100, 4096, 100000):
+			data = sample(size)
+			for threads in (1, 4):
+				for block_size in (1024, 65536):
+					out = gzipped(data, threads=threads, block_size=block_size, mtime=0)
+					self.assertEqual(gunzip(out), data, "%d bytes, %d threads, %d block" % (size, threads, block_size))
+
+	def test_threads_do_not_change_output(self):
+		data = sample(300000)
+		one = gzipped(data, threads=1, block_size=32768, mtime=0)
+		self.assertEqual(gzipped(data, threads=4, block_size=32768, mtime=0), one)
+
+	def test_one_block_matches_zlib(self):
+		data = sample(10000)
+		out = gzipped(data, level=6, threads=1, mtime=0)
+		# a 10 byte header, the raw deflate stream, then the crc and size
+		compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS, 9)
+		self.assertEqual(out[10:-8], compressor.compress(data) + compressor.flush())
+
+	def test_levels(self):
+		data = sample(50000)
+		for level in range(10):
+			self.assertEqual(gunzip(gzipped(data, level=level, block_size=8192)), data)
+
+	def test_header(self):
+		out = gzipped('abc', level=9, filename='a.js', mtime=12345)
+		header = gzip.GzipFile(fileobj=StringIO(out))
+		self.assertEqual(header.read(), 'abc')
+		self.assertEqual(header.mtime, 12345)
+		self.assertEqual(ord(out[8]), 2) # slowest compression
+
+	def test_progress(self):
+		calls = []
+		gzipped(sample(10000), block_size=4096, progress=lambda done, total: calls.append((done, total)))
+		self.assertEqual(calls, [(4096, 10000), (8192, 10000), (10000, 10000)])
+
+
+class CompressFileTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def test_compress_file(self):
+		path = os.path.join(self.directory, 'a.min.js.gz')
+		data = sample(20000)
+		compress_file(path, data, 9, 2)
+		f = open(path, 'rb')
+		try:
+			out = f.read()
+		finally:
+			f.close()
+		self.assertEqual(gunzip(out), data)
+		# the name stored is the file's without .gz
+		self.assertEqual(out[10:19], 'a.min.js\000')
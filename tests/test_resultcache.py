@@ -0,0 +1,97 @@
+# ResultCache in a temporary directory: hits, misses, keys and trimming, and
+# a cache that can't be written.
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from resultcache import ResultCache, user_cache_dir
+
+
+class ResultCacheTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.cache = ResultCache(os.path.join(self.directory, 'cache'))
+		self.computed = 0
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def compute(self):
+		self.computed += 1
+		return 'a{b:c}'
+
+	def test_hit(self):
+		self.assertEqual(self.cache.run('minify_css', 'a { b: c }', {}, self.compute), 'a{b:c}')
+		self.assertEqual(self.cache.run('minify_css', 'a { b: c }', {}, self.compute), 'a{b:c}')
+		self.assertEqual(self.computed, 1)
+		self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+	def test_keys(self):
+		key = self.cache.key('minify_css', 'a { b: c }')
+		self.assertNotEqual(key, self.cache.key('format_css', 'a { b: c }'))
+		self.assertNotEqual(key, self.cache.key('minify_css', 'a { b: d }'))
+		self.assertNotEqual(key, self.cache.key('minify_css', 'a { b: c }', { 'indent': 2 }))
+		self.assertEqual(self.cache.key('minify_css', u'a { b: c }'), key)
+
+	def test_trim(self):
+		self.cache.max_size = 0
+		self.cache.run('minify_css', 'a', {}, self.compute)
+		self.assertEqual(self.cache.stats()['entries'], 0)
+
+	def test_least_recently_used(self):
+		first = self.cache.key('minify_css', 'first')
+		second = self.cache.key('minify_css', 'second')
+		self.cache.put(first, 'x' * 100)
+		self.cache.put(second, 'y' * 100)
+		past = time.time() - 60
+		os.utime(os.path.join(self.cache.directory, first), (past, past))
+		self.cache.max_size = self.cache.stats()['size'] - 1
+		self.cache.trim()
+		self.assertEqual(self.cache.get(first), (False, None))
+		self.assertEqual(self.cache.get(second), (True, 'y' * 100))
+
+	def test_created_lazily(self):
+		self.assertEqual(self.cache.get(self.cache.key('minify_css', 'a')), (False, None))
+		self.assertFalse(os.path.exists(self.cache.directory))
+		self.cache.run('minify_css', 'a', {}, self.compute)
+		self.assertTrue(os.path.isdir(self.cache.directory))
+
+	def test_unwritable(self):
+		# a file where the directory should be
+		blocker = os.path.join(self.directory, 'file')
+		open(blocker, 'w').close()
+		cache = ResultCache(os.path.join(blocker, 'cache'))
+		self.assertEqual(cache.run('minify_css', 'a', {}, self.compute), 'a{b:c}')
+		self.assertEqual(cache.run('minify_css', 'a', {}, self.compute), 'a{b:c}')
+		self.assertEqual(self.computed, 2)
+		self.assertEqual((cache.hits, cache.misses), (0, 2))
+		self.assertEqual(cache.stats()['entries'], 0)
+
+	def test_clear(self):
+		self.cache.run('minify_css', 'a', {}, self.compute)
+		self.cache.clear()
+		self.assertEqual(self.cache.stats(), { 'entries': 0, 'size': 0, 'hits': 0, 'misses': 0 })
+
+
+class CacheDirTest(unittest.TestCase):
+
+	def setUp(self):
+		self.environ = dict(os.environ)
+
+	def tearDown(self):
+		os.environ.clear()
+		os.environ.update(self.environ)
+
+	def test_xdg_cache_home(self):
+		os.environ['XDG_CACHE_HOME'] = '/tmp/xdg-cache'
+		self.assertEqual(user_cache_dir(), '/tmp/xdg-cache/gedit-clientside')
+		self.assertEqual(ResultCache().directory, '/tmp/xdg-cache/gedit-clientside')
+
+	def test_home(self):
+		os.environ.pop('XDG_CACHE_HOME', None)
+		os.environ['HOME'] = '/home/someone'
+		self.assertEqual(user_cache_dir(), '/home/someone/.cache/gedit-clientside')
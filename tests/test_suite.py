@@ -0,0 +1,25 @@
+# The benchmark suite's entry points time the engine they are named for.
+
+import unittest
+
+from tests import NODE
+from suite import ENTRIES, make_entry
+
+
+class EntryTest(unittest.TestCase):
+
+	def test_beautify_python(self):
+		func, worker = make_entry('beautify-python', None)
+		self.assertEqual(worker, None)
+		self.assertEqual(func('if(a){b()}'), 'if (a) {\n\tb()\n}')
+		self.assertEqual(ENTRIES['beautify-python'], 'js')
+
+	@unittest.skipUnless(NODE, "node is not installed")
+	def test_beautify_node(self):
+		# a small file would go to the in-process port if the engine was left to choose
+		func, worker = make_entry('beautify', None)
+		try:
+			self.assertEqual(func('if(a){b()}'), 'if (a) {\n\tb()\n}')
+			self.assertTrue(worker.is_running())
+		finally:
+			worker.stop()
@@ -0,0 +1,83 @@
+# diff_spans on random edits: applying the spans to the old text always gives
+# the new one, and unchanged text is left alone.
+
+import random
+import unittest
+
+from textdiff import MAX_SPANS, diff_spans
+
+LINES = ['var a = 1;\n', 'function f() {\n', '\treturn a;\n', '}\n', '\n', 'b { color: red; }\n', '// x\n']
+
+
+def apply(old, spans):
+	# from the last span back, as the editor does
+	for start, end, text in reversed(spans):
+		old = old[:start] + text + old[end:]
+	return old
+
+
+def random_text(rand, lines):
+	return ''.join(rand.choice(LINES) for i in range(lines))
+
+
+def random_edit(rand, text):
+	for i in range(rand.randint(1, 5)):
+		at = rand.randint(0, len(text))
+		end = min(len(text), at + rand.randint(0, 20))
+		if rand.random() < 0.5:
+			text = text[:at] + rand.choice(LINES + ['x', '', ';']) + text[end:]
+		else:
+			text = text[:at] + text[end:]
+	return text
+
+
+class DiffSpansTest(unittest.TestCase):
+
+	def check(self, old, new):
+		spans = diff_spans(old, new)
+		self.assertEqual(apply(old, spans), new, "%r -> %r" % (old, new))
+		last = 0
+		for start, end, text in spans:
+			self.assertTrue(last <= start <= end <= len(old), spans)
+			last = end
+		return spans
+
+	def test_same(self):
+		self.assertEqual(diff_spans('abc\n', 'abc\n'), [])
+		self.assertEqual(diff_spans('', ''), [])
+
+	def test_edges(self):
+		for old, new in [('', 'a'), ('a', ''), ('a\nb', 'a\nc'), ('a\n', 'a\n\n'), ('x\ny\nz', 'z\ny\nx'),
+				('no newline', 'no newlines'), ('a\r\nb\r\n', 'a\nb\n')]:
+			self.check(old, new)
+
+	def test_random_edits(self):
+		rand = random.Random(1)
+		for i in range(500):
+			old = random_text(rand, rand.randint(0, 40))
+			self.check(old, random_edit(rand, old))
+
+	def test_unrelated_texts(self):
+		rand = random.Random(2)
+		for i in range(100):
+			self.check(random_text(rand, rand.randint(0, 30)), random_text(rand, rand.randint(0, 30)))
+
+	def test_small_change_is_small(self):
+		old = ''.join('line %d\n' % i for i in range(1000))
+		new = old.replace('line 500\n', 'line five hundred\n')
+		spans = self.check(old, new)
+		self.assertEqual(len(spans), 1)
+		start, end, text = spans[0]
+		self.assertTrue(end - start <= len('line 500\n'), spans)
+
+	def test_moved_line(self):
+		old = ''.join('line %d\n' % i for i in range(100))
+		new = old.replace('line 10\n', '').replace('line 90\n', 'line 90\nline 10\n')
+		spans = self.check(old, new)
+		self.assertEqual(sum(end - start for start, end, text in spans), len('line 10\n'))
+
+	def test_many_changes(self):
+		old = ''.join('line %d\n' % i for i in range(MAX_SPANS * 4))
+		new = old.replace('line', 'LINE')
+		spans = self.check(old, new)
+		self.assertTrue(len(spans) <= MAX_SPANS)
@@ -0,0 +1,220 @@
+# The settings and helpers of tools.py.
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from tests import NODE
+from nodeworker import NodeWorker
+from resultcache import ResultCache
+from jsmangle import MANGLE_VERSION
+
+from tools import DEFAULT_SETTINGS, JSLINT_OPTIONS, read_settings, write_settings
+from tools import minify_js, minify_css, format_css, lint_options, lint_css
+from tools import minify_file, join_batch, dedupe_batch, build, build_options, BatchMinify
+
+
+class SettingsTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.path = os.path.join(self.directory, 'defaults.pkl')
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def test_defaults(self):
+		self.assertEqual(read_settings(self.path), DEFAULT_SETTINGS)
+
+	def test_saved(self):
+		write_settings({ 'nodejs': 'nodejs' }, self.path)
+		settings = read_settings(self.path)
+		self.assertEqual(settings['nodejs'], 'nodejs')
+		# settings saved by an older version get the new ones' defaults
+		self.assertEqual(settings['indent_char'], DEFAULT_SETTINGS['indent_char'])
+
+
+class MinifyTest(unittest.TestCase):
+
+	def test_minify_js(self):
+		# without the newlines jsmin keeps
+		self.assertEqual(minify_js('var a = 1\nvar b = 2\n'), 'var a=1var b=2')
+
+	def test_minify_css(self):
+		self.assertEqual(minify_css('a { color: #ffffff; }'), 'a{color:#fff}')
+
+	def test_format_css(self):
+		settings = dict(DEFAULT_SETTINGS, indent_char=' ', indent_size='2', braces_on_own_line='true')
+		self.assertEqual(format_css('a{b:c}', settings), 'a\n{\n  b:c\n}')
+
+
+class LintOptionsTest(unittest.TestCase):
+
+	def test_js_rules(self):
+		self.assertEqual(lint_options('js', DEFAULT_SETTINGS)['rules'], JSLINT_OPTIONS)
+
+	def test_css_default_rules(self):
+		# an empty ruleset would have CSSLint run no rules at all
+		self.assertFalse('rules' in lint_options('css', DEFAULT_SETTINGS))
+
+	def test_max_issues(self):
+		settings = dict(DEFAULT_SETTINGS, lint_max_issues='7')
+		self.assertEqual(lint_options('css', settings)['max_issues'], 7)
+
+
+class BatchTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def test_minify_file(self):
+		path = os.path.join(self.directory, 'a.css')
+		f = open(path, 'w')
+		f.write('@charset "utf-8";\na { color: #ffffff; }\n')
+		f.close()
+		self.assertEqual(minify_file(path, 'css'), ('@charset "utf-8";', 'a{color:#fff}'))
+
+	def test_join(self):
+		results = [('', 'a{b:c}'), ('@charset "utf-8";', 'd{e:f}')]
+		self.assertEqual(join_batch(['x/one.css', 'x/two.css'], results),
+			'@charset "utf-8";\n\n/* one.css */\na{b:c}\n\n/* two.css */\nd{e:f}\n\n')
+
+	def test_dedupe(self):
+		results, saved = dedupe_batch([('', 'a{b:c}d{e:f}'), ('@charset "utf-8";', 'a{b:c}')])
+		self.assertEqual(results, [('', 'd{e:f}'), ('@charset "utf-8";', 'a{b:c}')])
+		self.assertEqual(saved, 6)
+
+	def test_emptied_file(self):
+		# a file with every rule repeated later gets no banner
+		results, saved = dedupe_batch([('', 'a{b:c}'), ('', 'a{b:c}')])
+		self.assertEqual(join_batch(['one.css', 'two.css'], results), '/* two.css */\na{b:c}\n\n')
+
+	def write(self, name, text):
+		path = os.path.join(self.directory, name)
+		f = open(path, 'w')
+		f.write(text)
+		f.close()
+		return path
+
+	def test_process(self):
+		settings = os.path.join(self.directory, 'defaults.pkl')
+		write_settings(dict(DEFAULT_SETTINGS, mangle_js='true'), settings)
+		paths = [
+			self.write('a.js', 'function f(value) { return value; }\n'),
+			self.write('b.js', 'var b = "open;\n'),
+			self.write('c.css', '@charset "utf-8";\na { color: #ffffff; }\n'),
+		]
+		self.assertEqual(sorted(BatchMinify(paths, settings).run()), [
+			(0, ('', 'function f(a){return a;}'), None),
+			(1, None, 'Unterminated string literal'),
+			(2, ('@charset "utf-8";', 'a{color:#fff}'), None),
+		])
+
+	def test_kill(self):
+		paths = [self.write('%d.js' % i, 'var a = 1;\n' * 20000) for i in range(8)]
+		batch = BatchMinify(paths, os.path.join(self.directory, 'missing.pkl'))
+		items = []
+		for item in batch.run():
+			items.append(item)
+			batch.kill()
+		# what was already written may still come through, but no error
+		self.assertTrue(1 <= len(items) <= len(paths))
+		self.assertTrue(batch._proc.poll() is not None)
+
+		# killed before it started
+		batch = BatchMinify(paths)
+		batch.kill()
+		self.assertEqual(list(batch.run()), [])
+
+	def test_died(self):
+		batch = BatchMinify([self.write('a.js', 'var a = 1;\n')])
+		batch.args = [sys.executable, '-c', 'import sys; sys.exit(3)']
+		self.assertRaises(IOError, list, batch.run())
+
+
+class BuildTest(unittest.TestCase):
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+		self.cache = ResultCache(os.path.join(self.directory, 'cache'))
+		self.input = os.path.join(self.directory, 'a.js')
+		self.output = os.path.join(self.directory, 'a.min.js')
+		f = open(self.input, 'wb')
+		f.write('var a = 1;\n')
+		f.close()
+		# older than anything built from it
+		past = time.time() - 60
+		os.utime(self.input, (past, past))
+		self.minified = 0
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def minify(self):
+		self.minified += 1
+		return 'var a=1;'
+
+	def build(self, settings):
+		return build([self.input], self.output, self.minify, options=build_options(settings), cache=self.cache)
+
+	def test_settings_change(self):
+		self.build(DEFAULT_SETTINGS)
+		self.assertTrue(self.build(DEFAULT_SETTINGS)[3])
+		self.assertFalse(self.build(dict(DEFAULT_SETTINGS, mangle_js='true'))[3])
+		self.assertFalse(self.build(dict(DEFAULT_SETTINGS, optimize_css='true'))[3])
+		self.assertEqual(self.minified, 3)
+
+	def test_mangler_version(self):
+		# a fixed mangler rebuilds what an older one made
+		self.assertEqual(build_options(dict(DEFAULT_SETTINGS, mangle_js='true'))['mangle_version'], MANGLE_VERSION)
+		self.assertFalse('mangle_version' in build_options(DEFAULT_SETTINGS))
+
+	def test_forgotten_build(self):
+		self.build(DEFAULT_SETTINGS)
+		shutil.rmtree(self.cache.directory)
+		self.assertFalse(self.build(DEFAULT_SETTINGS)[3])
+
+
+@unittest.skipUnless(NODE, "node is not installed")
+class LintCSSTest(unittest.TestCase):
+
+	CSS = 'b { }\na { }\nc { }\n'
+	EMPTY_RULES = { 'empty-rules': 1 }
+
+	def setUp(self):
+		self.worker = NodeWorker(NODE)
+
+	def tearDown(self):
+		self.worker.stop()
+
+	def test_default_rules(self):
+		issues = lint_css('b { }\n', self.worker)
+		self.assertEqual([issue['rule'] for issue in issues], ['empty-rules'])
+		self.assertEqual(lint_css('b { color: red; }\n', self.worker), [])
+
+	def test_on_issue(self):
+		streamed = []
+		issues = lint_css(self.CSS, self.worker, { 'rules': self.EMPTY_RULES, 'max_issues': 0 }, streamed.append)
+		self.assertEqual([issue['evidence'] for issue in issues], ['b { }', 'a { }', 'c { }'])
+		self.assertEqual(streamed, issues)
+		self.assertEqual(issues[0]['rule'], 'empty-rules')
+
+	def test_max_issues(self):
+		issues = lint_css(self.CSS, self.worker, { 'rules': self.EMPTY_RULES, 'max_issues': 2 })
+		self.assertEqual([issue['severity'] for issue in issues], ['warning', 'warning', 'info'])
+		self.assertEqual(issues[2]['text'], 'info: Stopped after 2 issues.')
+
+	def test_on_issue_fails(self):
+		def fail(issue):
+			raise KeyError(issue['rule'])
+
+		self.assertRaises(KeyError, lint_css, self.CSS, self.worker, { 'rules': self.EMPTY_RULES, 'max_issues': 0 }, fail)
+		# the rest of that response was not read, the next request starts afresh
+		self.assertFalse(self.worker.is_running())
+		self.assertEqual(len(lint_css(self.CSS, self.worker, { 'rules': self.EMPTY_RULES, 'max_issues': 0 })), 3)